@@ -1,3 +1,16 @@
 from django.contrib import admin
+from .models import DailyShipmentRollup, RollupWatermark
 
-# Register your models here.
+
+@admin.register(DailyShipmentRollup)
+class DailyShipmentRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'warehouse', 'status', 'priority', 'cargo_type', 'shipments', 'delivered')
+    list_filter = ('status', 'priority')
+    date_hierarchy = 'day'
+    raw_id_fields = ('warehouse', 'cargo_type')
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('name', 'value', 'refreshed_at')
+    readonly_fields = ('value', 'refreshed_at')
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analytics'
+    verbose_name = 'Аналитика'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
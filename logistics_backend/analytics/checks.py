@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Кэши, которые не видны другим процессам
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_dashboard_cache(app_configs, **kwargs):
+    """manage.py check --deploy: снимок дашборда сбрасывается и
+    пересчитывается одним процессом только при общем кэше"""
+    if settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS:
+        return []
+    return [Warning(
+        'Кэш по умолчанию локален для процесса: снимок /api/dashboard/ '
+        'пересчитывается в каждом воркере, а изменения из других воркеров '
+        'видны только через DASHBOARD_CACHE_TTL.',
+        hint='Укажите Redis или Memcached через CACHE_BACKEND и CACHE_LOCATION.',
+        id='analytics.W001',
+    )]
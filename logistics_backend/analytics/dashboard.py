@@ -0,0 +1,84 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from cargo.models import Shipment
+from cargo.stats import shipment_stats
+from vehicles.models import Vehicle
+from vehicles.stats import vehicle_stats
+from warehouses.models import Warehouse
+from warehouses.stats import warehouse_stats
+
+VERSION_KEY = 'dashboard:version'
+SNAPSHOT_KEY = 'dashboard:snapshot:{version}'
+LOCK_KEY = 'dashboard:lock:{version}'
+# Сколько ждать снимок, который пересчитывает другой процесс
+WAIT_TIMEOUT = 5
+WAIT_INTERVAL = 0.05
+
+_build_lock = threading.Lock()
+
+
+def build_snapshot():
+    return {
+        'shipments': shipment_stats(Shipment.objects.all()),
+        'vehicles': vehicle_stats(Vehicle.objects.all()),
+        'warehouses': warehouse_stats(Warehouse.objects.all()),
+        'generated_at': timezone.now(),
+    }
+
+
+def current_version():
+    cache.add(VERSION_KEY, 1, timeout=None)
+    return cache.get(VERSION_KEY, 1)
+
+
+def invalidate_snapshot():
+    """Снимок хранится под ключом с номером версии, поэтому расчет, начатый
+    до изменения данных, не перезапишет уже сброшенный снимок"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, timeout=None)
+
+
+def get_snapshot():
+    """Возвращает снимок из кэша; при промахе его пересчитывает только один
+    поток, остальные ждут результат.
+
+    Между процессами версия, снимок и блокировка пересчета общие только при
+    общем кэше (Redis, Memcached). С LocMemCache у каждого воркера свой
+    снимок: изменение из другого воркера видно через DASHBOARD_CACHE_TTL, а
+    промах пересчитывает каждый воркер (проверка analytics.W001)."""
+    version = current_version()
+    snapshot_key = SNAPSHOT_KEY.format(version=version)
+
+    snapshot = cache.get(snapshot_key)
+    if snapshot is not None:
+        return snapshot
+
+    with _build_lock:
+        snapshot = cache.get(snapshot_key)
+        if snapshot is not None:
+            return snapshot
+
+        lock_key = LOCK_KEY.format(version=version)
+        if cache.add(lock_key, 1, timeout=WAIT_TIMEOUT):
+            try:
+                snapshot = build_snapshot()
+                cache.set(snapshot_key, snapshot, timeout=settings.DASHBOARD_CACHE_TTL)
+            finally:
+                cache.delete(lock_key)
+            return snapshot
+
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            snapshot = cache.get(snapshot_key)
+            if snapshot is not None:
+                return snapshot
+
+        return build_snapshot()
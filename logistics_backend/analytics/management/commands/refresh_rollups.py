@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает дневные итоги по поставкам, измененным с прошлого запуска. '
+        'Рассчитан на запуск по расписанию (cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Построить итоги заново по всем поставкам')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = refresh_rollups(full=options['full'])
+        days = 'все дни' if result['days'] is None else f"дней: {result['days']}"
+        self.stdout.write(self.style.SUCCESS(
+            f"Итоги обновлены: поставок {result['shipments']}, {days}, строк итогов {result['rollups']} "
+            f"за {time.perf_counter() - started:.1f} с"
+        ))
@@ -0,0 +1,74 @@
+# Generated by Django 5.1 on 2026-10-17 23:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('cargo', '0004_shipment_shipment_status_departure_idx_and_more'),
+        ('warehouses', '0002_alter_warehouse_contact_person'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RolledUpShipment',
+            fields=[
+                ('shipment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='cargo.shipment', verbose_name='Поставка')),
+                ('day', models.DateField(verbose_name='День отправления')),
+            ],
+            options={
+                'verbose_name': 'Поставка в итогах',
+                'verbose_name_plural': 'Поставки в итогах',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Итоги')),
+                ('value', models.DateTimeField(blank=True, null=True, verbose_name='Учтены изменения до')),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True, verbose_name='Последний пересчет')),
+            ],
+            options={
+                'verbose_name': 'Отметка пересчета итогов',
+                'verbose_name_plural': 'Отметки пересчета итогов',
+            },
+        ),
+        migrations.CreateModel(
+            name='StaleRollupDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='День отправления')),
+            ],
+            options={
+                'verbose_name': 'Устаревший день итогов',
+                'verbose_name_plural': 'Устаревшие дни итогов',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyShipmentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День отправления')),
+                ('status', models.CharField(choices=[('PLANNED', 'Запланирована'), ('ASSIGNED', 'Назначена'), ('IN_TRANSIT', 'В пути'), ('AT_WAREHOUSE', 'На складе'), ('UNLOADING', 'Разгрузка'), ('COMPLETED', 'Завершена'), ('CANCELLED', 'Отменена'), ('DELAYED', 'Задержана')], max_length=20, verbose_name='Статус')),
+                ('priority', models.CharField(choices=[('LOW', 'Низкий'), ('MEDIUM', 'Средний'), ('HIGH', 'Высокий'), ('URGENT', 'Срочный')], max_length=10, verbose_name='Приоритет')),
+                ('shipments', models.PositiveIntegerField(verbose_name='Поставок')),
+                ('total_weight', models.DecimalField(decimal_places=2, max_digits=16, verbose_name='Общий вес (т)')),
+                ('total_volume', models.DecimalField(decimal_places=2, max_digits=16, verbose_name='Общий объем (м³)')),
+                ('delivered', models.PositiveIntegerField(verbose_name='Доставлено')),
+                ('delivery_seconds', models.FloatField(verbose_name='Суммарное время доставки (с)')),
+                ('cargo_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cargo.cargotype', verbose_name='Тип груза')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='warehouses.warehouse', verbose_name='Склад отправления')),
+            ],
+            options={
+                'verbose_name': 'Дневной итог по поставкам',
+                'verbose_name_plural': 'Дневные итоги по поставкам',
+                'indexes': [models.Index(fields=['warehouse', 'day'], name='daily_rollup_warehouse_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'warehouse', 'status', 'priority', 'cargo_type'), name='daily_rollup_unique_key')],
+            },
+        ),
+    ]
@@ -1,3 +1,87 @@
 from django.db import models
 
-# Create your models here.
+from cargo.models import CargoType, Shipment
+from warehouses.models import Warehouse
+
+
+class DailyShipmentRollup(models.Model):
+    """Поставки, сгруппированные по дню планового отправления, складу
+    отправления, статусу, приоритету и типу груза. Пересчитывается
+    analytics.rollups целыми днями; отчеты читают только эту таблицу."""
+    day = models.DateField(verbose_name='День отправления')
+    warehouse = models.ForeignKey(
+        Warehouse,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Склад отправления'
+    )
+    status = models.CharField(max_length=20, choices=Shipment.STATUS_CHOICES, verbose_name='Статус')
+    priority = models.CharField(max_length=10, choices=Shipment.PRIORITY_CHOICES, verbose_name='Приоритет')
+    cargo_type = models.ForeignKey(
+        CargoType,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Тип груза'
+    )
+    shipments = models.PositiveIntegerField(verbose_name='Поставок')
+    total_weight = models.DecimalField(max_digits=16, decimal_places=2, verbose_name='Общий вес (т)')
+    total_volume = models.DecimalField(max_digits=16, decimal_places=2, verbose_name='Общий объем (м³)')
+    delivered = models.PositiveIntegerField(verbose_name='Доставлено')
+    delivery_seconds = models.FloatField(verbose_name='Суммарное время доставки (с)')
+
+    class Meta:
+        verbose_name = 'Дневной итог по поставкам'
+        verbose_name_plural = 'Дневные итоги по поставкам'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'warehouse', 'status', 'priority', 'cargo_type'], name='daily_rollup_unique_key'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['warehouse', 'day'], name='daily_rollup_warehouse_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} склад #{self.warehouse_id} {self.status}/{self.priority}"
+
+
+class RolledUpShipment(models.Model):
+    """День, в итоги которого поставка попала при последнем пересчете: при
+    переносе отправления на другой день пересчитывается и старый день"""
+    shipment = models.OneToOneField(
+        Shipment,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='Поставка'
+    )
+    day = models.DateField(verbose_name='День отправления')
+
+    class Meta:
+        verbose_name = 'Поставка в итогах'
+        verbose_name_plural = 'Поставки в итогах'
+
+
+class StaleRollupDay(models.Model):
+    """День, итоги которого нужно пересчитать, хотя измененных поставок в
+    нем нет (поставка удалена)"""
+    day = models.DateField(unique=True, verbose_name='День отправления')
+
+    class Meta:
+        verbose_name = 'Устаревший день итогов'
+        verbose_name_plural = 'Устаревшие дни итогов'
+
+
+class RollupWatermark(models.Model):
+    """Отметка инкрементального пересчета: поставки с updated_at не позже
+    value уже учтены в итогах"""
+    name = models.CharField(max_length=50, unique=True, verbose_name='Итоги')
+    value = models.DateTimeField(null=True, blank=True, verbose_name='Учтены изменения до')
+    refreshed_at = models.DateTimeField(null=True, blank=True, verbose_name='Последний пересчет')
+
+    class Meta:
+        verbose_name = 'Отметка пересчета итогов'
+        verbose_name_plural = 'Отметки пересчета итогов'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,70 @@
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncQuarter, TruncYear
+
+from .models import DailyShipmentRollup, RollupWatermark
+from .rollups import WATERMARK
+
+PERIODS = {
+    'day': TruncDay,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+    'year': TruncYear,
+}
+# Параметр group_by -> поле итогов
+GROUPS = {
+    'warehouse': 'warehouse_id',
+    'status': 'status',
+    'priority': 'priority',
+    'cargo_type': 'cargo_type_id',
+}
+
+
+def scope_rollups(queryset, date_from=None, date_to=None, warehouse=None):
+    """Как cargo.stats.scope_shipments, но склад - только склад отправления:
+    итоги хранятся по нему"""
+    if date_from:
+        queryset = queryset.filter(day__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(day__lte=date_to)
+    if warehouse:
+        queryset = queryset.filter(warehouse_id=warehouse)
+    return queryset
+
+
+def shipment_report(period='month', group_by=None, **scope):
+    """Поставки по периодам (и по group_by внутри периода) одним GROUP BY
+    по дневным итогам; таблица поставок не читается"""
+    fields = ['period'] + ([GROUPS[group_by]] if group_by else [])
+    rows = scope_rollups(DailyShipmentRollup.objects.all(), **scope).annotate(
+        period=PERIODS[period]('day')
+    ).values(*fields).annotate(
+        shipment_count=Sum('shipments'),
+        weight_sum=Sum('total_weight'),
+        volume_sum=Sum('total_volume'),
+        delivered_count=Sum('delivered'),
+        delivery_seconds_sum=Sum('delivery_seconds'),
+    ).order_by(*fields)
+
+    results = []
+    for row in rows:
+        item = {'period': row['period']}
+        if group_by:
+            item[group_by] = row[GROUPS[group_by]]
+        item.update({
+            'shipments': row['shipment_count'],
+            'total_weight': float(row['weight_sum']),
+            'total_volume': float(row['volume_sum']),
+            'delivered': row['delivered_count'],
+            'avg_delivery_time_seconds': (
+                row['delivery_seconds_sum'] / row['delivered_count'] if row['delivered_count'] else None
+            ),
+        })
+        results.append(item)
+
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).values_list('refreshed_at', flat=True).first()
+    return {
+        'period': period,
+        'group_by': group_by,
+        'refreshed_at': watermark,
+        'results': results,
+    }
@@ -0,0 +1,153 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from cargo.models import Shipment
+from cargo.stats import DELIVERED, DELIVERY_TIME, day_start
+from .models import DailyShipmentRollup, RolledUpShipment, RollupWatermark, StaleRollupDay
+
+WATERMARK = 'shipments'
+# День в часовом поясе проекта, как в day_start
+DEPARTURE_DAY = TruncDate('planned_departure')
+# Дней на один агрегирующий запрос: условие по дням не разрастается
+DAYS_PER_QUERY = 200
+BATCH_SIZE = 1000
+
+
+def day_ranges(days):
+    """Подряд идущие дни -> полуоткрытые диапазоны [начало, конец) по
+    planned_departure, чтобы запрос использовал индекс"""
+    ranges = []
+    for day in sorted(days):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return [(day_start(start), day_start(end)) for start, end in ranges]
+
+
+def aggregate_days(queryset):
+    rows = queryset.annotate(day=DEPARTURE_DAY).values(
+        'day', 'origin_warehouse_id', 'status', 'priority', 'cargo_type_id'
+    ).annotate(
+        shipment_count=Count('id'),
+        weight_sum=Sum('weight'),
+        volume_sum=Sum('volume'),
+        delivered_count=Count('id', filter=DELIVERED),
+        delivery_time=Sum(DELIVERY_TIME, filter=DELIVERED),
+    ).order_by()
+    return [
+        DailyShipmentRollup(
+            day=row['day'], warehouse_id=row['origin_warehouse_id'], status=row['status'],
+            priority=row['priority'], cargo_type_id=row['cargo_type_id'],
+            shipments=row['shipment_count'], total_weight=row['weight_sum'], total_volume=row['volume_sum'],
+            delivered=row['delivered_count'],
+            delivery_seconds=row['delivery_time'].total_seconds() if row['delivery_time'] else 0.0,
+        )
+        for row in rows
+    ]
+
+
+def rebuild_days(days):
+    """Пересчитывает итоги дней целиком одним GROUP BY по поставкам этих
+    дней. Пересчет идемпотентен, поэтому повторная обработка дня безопасна."""
+    days = sorted(days)
+    rollups = 0
+    for start in range(0, len(days), DAYS_PER_QUERY):
+        chunk = days[start:start + DAYS_PER_QUERY]
+        condition = Q()
+        for begin, end in day_ranges(chunk):
+            condition |= Q(planned_departure__gte=begin, planned_departure__lt=end)
+        DailyShipmentRollup.objects.filter(day__in=chunk).delete()
+        created = DailyShipmentRollup.objects.bulk_create(
+            aggregate_days(Shipment.objects.filter(condition)), batch_size=BATCH_SIZE
+        )
+        rollups += len(created)
+    return rollups
+
+
+def rebuild_all():
+    DailyShipmentRollup.objects.all().delete()
+    RolledUpShipment.objects.all().delete()
+    StaleRollupDay.objects.all().delete()
+    rollups = len(DailyShipmentRollup.objects.bulk_create(
+        aggregate_days(Shipment.objects.all()), batch_size=BATCH_SIZE
+    ))
+
+    shipments = 0
+    latest = None
+    batch = []
+    for pk, day, updated_at in Shipment.objects.annotate(day=DEPARTURE_DAY).values_list(
+        'id', 'day', 'updated_at'
+    ).order_by().iterator(chunk_size=BATCH_SIZE):
+        batch.append(RolledUpShipment(shipment_id=pk, day=day))
+        latest = updated_at if latest is None else max(latest, updated_at)
+        if len(batch) == BATCH_SIZE:
+            RolledUpShipment.objects.bulk_create(batch)
+            shipments += len(batch)
+            batch = []
+    RolledUpShipment.objects.bulk_create(batch)
+    shipments += len(batch)
+    return {'shipments': shipments, 'days': None, 'rollups': rollups}, latest
+
+
+def changed_shipments(since):
+    """(id, день, updated_at) поставок, измененных после since; выборка идет
+    по индексу shipment_updated_idx, а не по всей таблице"""
+    return Shipment.objects.filter(updated_at__gt=since).annotate(day=DEPARTURE_DAY).values_list(
+        'id', 'day', 'updated_at'
+    ).order_by()
+
+
+def refresh_changed(since):
+    """Пересчитывает дни поставок с updated_at после since: новый день
+    каждой поставки, день из прошлого пересчета (отправление перенесено)
+    и дни удаленных поставок"""
+    changed = list(changed_shipments(since))
+    days = {row[1] for row in changed}
+    for start in range(0, len(changed), BATCH_SIZE):
+        days.update(RolledUpShipment.objects.filter(
+            shipment_id__in=[row[0] for row in changed[start:start + BATCH_SIZE]]
+        ).values_list('day', flat=True))
+    stale = list(StaleRollupDay.objects.values_list('pk', 'day'))
+    days.update(row[1] for row in stale)
+
+    rollups = rebuild_days(days)
+    RolledUpShipment.objects.bulk_create(
+        [RolledUpShipment(shipment_id=pk, day=day) for pk, day, _ in changed],
+        batch_size=BATCH_SIZE, update_conflicts=True, unique_fields=['shipment'], update_fields=['day']
+    )
+    StaleRollupDay.objects.filter(pk__in=[row[0] for row in stale]).delete()
+    latest = max((row[2] for row in changed), default=None)
+    return {'shipments': len(changed), 'days': len(days), 'rollups': rollups}, latest
+
+
+def refresh_rollups(full=False):
+    """Инкрементальный пересчет итогов по отметке updated_at; при full или
+    первом запуске итоги строятся заново. Поставки, измененные в пределах
+    ANALYTICS_ROLLUP_LAG_SECONDS до отметки, обрабатываются повторно:
+    транзакция, начатая раньше, могла зафиксировать более ранний updated_at
+    уже после прошлого пересчета.
+    Возвращает {'shipments', 'days', 'rollups'}; days - None при полном."""
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        if full or watermark.value is None:
+            result, latest = rebuild_all()
+        else:
+            result, latest = refresh_changed(
+                watermark.value - timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG_SECONDS)
+            )
+
+        if latest is not None and (watermark.value is None or latest > watermark.value):
+            watermark.value = latest
+        watermark.refreshed_at = timezone.now()
+        watermark.save()
+    return result
+
+
+def mark_stale(days):
+    StaleRollupDay.objects.bulk_create([StaleRollupDay(day=day) for day in days], ignore_conflicts=True)
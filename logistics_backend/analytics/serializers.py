@@ -0,0 +1,9 @@
+from rest_framework import serializers
+
+from cargo.serializers import ShipmentScopeSerializer
+from .reports import GROUPS, PERIODS
+
+
+class ShipmentReportSerializer(ShipmentScopeSerializer):
+    period = serializers.ChoiceField(choices=list(PERIODS), default='month')
+    group_by = serializers.ChoiceField(choices=list(GROUPS), required=False)
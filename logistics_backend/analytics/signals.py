@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from cargo.models import Shipment
+from core.signals import bulk_changed
+from vehicles.models import Vehicle
+from warehouses.models import Warehouse
+
+from .dashboard import invalidate_snapshot
+from .rollups import mark_stale
+
+
+@receiver([post_save, post_delete, bulk_changed], sender=Shipment)
+@receiver([post_save, post_delete, bulk_changed], sender=Vehicle)
+@receiver([post_save, post_delete, bulk_changed], sender=Warehouse)
+def invalidate_dashboard(sender, **kwargs):
+    invalidate_snapshot()
+
+
+@receiver(post_delete, sender=Shipment)
+def mark_rollup_day_stale(sender, instance, **kwargs):
+    mark_stale([timezone.localdate(instance.planned_departure)])
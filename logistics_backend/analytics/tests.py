@@ -1,3 +1,199 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cargo.models import CargoType, Shipment
+from core.models import User
+from core.signals import bulk_changed
+from core.testing import PerformanceTestCase
+from vehicles.models import Vehicle
+from warehouses.models import Warehouse
+from .checks import check_dashboard_cache
+from .dashboard import current_version, get_snapshot
+from .models import DailyShipmentRollup, RollupWatermark
+from .rollups import refresh_rollups
+
+
+class DashboardPerformanceTests(PerformanceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_dashboard(self):
+        self.assertWithinBudget('dashboard', 'get', '/api/dashboard/')
+
+    def test_dashboard_cached(self):
+        self.client.get('/api/dashboard/')
+        self.assertWithinBudget('dashboard-cached', 'get', '/api/dashboard/')
+
+
+class DashboardInvalidationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def create_warehouse(self, index):
+        return Warehouse.objects.create(name=f'Склад {index}', address=f'Адрес {index}', capacity=1000)
+
+    def test_save_bumps_snapshot_version(self):
+        version = current_version()
+        warehouse = self.create_warehouse(1)
+        self.assertEqual(current_version(), version + 1)
+        warehouse.capacity = 2000
+        warehouse.save()
+        self.assertEqual(current_version(), version + 2)
+        warehouse.delete()
+        self.assertEqual(current_version(), version + 3)
+
+    def test_bulk_changed_bumps_snapshot_version(self):
+        version = current_version()
+        bulk_changed.send(sender=Vehicle, pks=[1, 2], fields=['status'])
+        bulk_changed.send(sender=Shipment, pks=None, fields=None)
+        self.assertEqual(current_version(), version + 2)
+
+    def test_snapshot_is_rebuilt_after_change(self):
+        self.create_warehouse(1)
+        self.assertEqual(get_snapshot()['warehouses']['total_warehouses'], 1)
+        with self.assertNumQueries(0):
+            get_snapshot()
+        self.create_warehouse(2)
+        self.assertEqual(get_snapshot()['warehouses']['total_warehouses'], 2)
+
+    def test_local_cache_is_reported(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([message.id for message in check_dashboard_cache(None)], ['analytics.W001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(check_dashboard_cache(None), [])
+
+
+def rollup_rows():
+    return sorted(DailyShipmentRollup.objects.values_list(
+        'day', 'warehouse_id', 'status', 'priority', 'cargo_type_id',
+        'shipments', 'total_weight', 'total_volume', 'delivered', 'delivery_seconds'
+    ))
+
+
+class RollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        cls.warehouses = [
+            Warehouse.objects.create(name=f'Склад {index}', address=f'Адрес {index}', capacity=1000)
+            for index in range(2)
+        ]
+        cls.cargo_type = CargoType.objects.create(name='Паллеты')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+
+    def create(self, day, weight=5, status='PLANNED', hours=None, origin=0):
+        departure = timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=10))
+        return Shipment.objects.create(
+            cargo_type=self.cargo_type, weight=weight, volume=10,
+            origin_warehouse=self.warehouses[origin], destination_warehouse=self.warehouses[1 - origin],
+            planned_departure=departure, planned_arrival=departure + timedelta(hours=24),
+            actual_departure=departure if hours else None,
+            actual_arrival=departure + timedelta(hours=hours) if hours else None,
+            status=status, created_by=self.manager
+        )
+
+    def assertMatchesFullRebuild(self):
+        incremental = rollup_rows()
+        refresh_rollups(full=True)
+        self.assertEqual(incremental, rollup_rows())
+
+    def test_rollups_sum_shipments(self):
+        self.create(date(2026, 1, 10), weight=5, status='COMPLETED', hours=10)
+        self.create(date(2026, 1, 10), weight=7, status='COMPLETED', hours=20)
+        self.create(date(2026, 1, 10), weight=3)
+        self.create(date(2026, 2, 1), weight=4, origin=1)
+        refresh_rollups()
+
+        completed = DailyShipmentRollup.objects.get(day=date(2026, 1, 10), status='COMPLETED')
+        self.assertEqual(completed.shipments, 2)
+        self.assertEqual(completed.total_weight, 12)
+        self.assertEqual(completed.delivered, 2)
+        self.assertEqual(completed.delivery_seconds, 30 * 3600)
+        self.assertEqual(DailyShipmentRollup.objects.count(), 3)
+
+    @override_settings(ANALYTICS_ROLLUP_LAG_SECONDS=0)
+    def test_incremental_refresh_handles_changes_moves_and_deletes(self):
+        moved = self.create(date(2026, 1, 10))
+        deleted = self.create(date(2026, 1, 11))
+        self.create(date(2026, 1, 12))
+        refresh_rollups()
+
+        moved.planned_departure += timedelta(days=20)
+        moved.planned_arrival += timedelta(days=20)
+        moved.status = 'IN_TRANSIT'
+        moved.save()
+        deleted.delete()
+        self.create(date(2026, 1, 12), weight=8)
+        result = refresh_rollups()
+
+        self.assertEqual(result['shipments'], 2)
+        # Старый и новый день перенесенной поставки, день удаленной и новой
+        self.assertEqual(result['days'], 4)
+        self.assertFalse(DailyShipmentRollup.objects.filter(day__in=[date(2026, 1, 10), date(2026, 1, 11)]).exists())
+        self.assertEqual(DailyShipmentRollup.objects.get(day=date(2026, 1, 12)).shipments, 2)
+        self.assertMatchesFullRebuild()
+
+    def test_refresh_skips_rows_before_watermark(self):
+        self.create(date(2026, 1, 10))
+        refresh_rollups()
+        RollupWatermark.objects.update(value=timezone.now() + timedelta(hours=1))
+        self.create(date(2026, 1, 10))
+
+        self.assertEqual(refresh_rollups()['shipments'], 0)
+        self.assertEqual(DailyShipmentRollup.objects.get().shipments, 1)
+
+    def test_report_by_month_and_status(self):
+        self.create(date(2026, 1, 10), weight=5, status='COMPLETED', hours=10)
+        self.create(date(2026, 1, 20), weight=7, status='COMPLETED', hours=20)
+        self.create(date(2026, 4, 1), weight=3, origin=1)
+        refresh_rollups()
+
+        response = self.client.get('/api/analytics/shipments/', {'period': 'quarter'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['period'], row['shipments'], row['total_weight']) for row in response.data['results']],
+            [(date(2026, 1, 1), 2, 12.0), (date(2026, 4, 1), 1, 3.0)]
+        )
+        self.assertEqual(response.data['results'][0]['avg_delivery_time_seconds'], 15 * 3600)
+        self.assertIsNotNone(response.data['refreshed_at'])
+
+        response = self.client.get('/api/analytics/shipments/', {
+            'group_by': 'status', 'date_to': '2026-03-31', 'warehouse': self.warehouses[0].pk
+        })
+        self.assertEqual(
+            [(row['period'], row['status'], row['shipments']) for row in response.data['results']],
+            [(date(2026, 1, 1), 'COMPLETED', 2)]
+        )
+
+    def test_report_validates_parameters(self):
+        response = self.client.get('/api/analytics/shipments/', {'period': 'week'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('period', response.data)
+
+
+class AnalyticsPerformanceTests(PerformanceTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        refresh_rollups()
+
+    def test_shipment_report(self):
+        self.assertWithinBudget('analytics-shipments', 'get', '/api/analytics/shipments/', {'period': 'quarter'})
+
+    def test_shipment_report_grouped(self):
+        self.assertWithinBudget(
+            'analytics-shipments-grouped', 'get', '/api/analytics/shipments/',
+            {'period': 'month', 'group_by': 'cargo_type'}
+        )
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .views import ShipmentReportView
+
+urlpatterns = [
+    path('shipments/', ShipmentReportView.as_view(), name='analytics-shipments'),
+]
@@ -1,3 +1,29 @@
-from django.shortcuts import render
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from .dashboard import get_snapshot
+from .reports import shipment_report
+from .serializers import ShipmentReportSerializer
+
+
+class DashboardView(APIView):
+    """Сводка для дашборда: поставки, транспорт и склады одним ответом
+    из кэшированного снимка (DASHBOARD_CACHE_TTL)"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(get_snapshot())
+
+
+class ShipmentReportView(APIView):
+    """Отчет по поставкам за период из дневных итогов (analytics.rollups).
+    Параметры: period (day, month, quarter, year), group_by (warehouse,
+    status, priority, cargo_type), date_from, date_to, warehouse (склад
+    отправления). Данные актуальны на момент refreshed_at."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        serializer = ShipmentReportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return Response(shipment_report(**serializer.validated_data))
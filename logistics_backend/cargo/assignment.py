@@ -0,0 +1,97 @@
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from core.signals import bulk_changed
+from vehicles.assignment import RESERVATION_FIELDS, VEHICLE_UNAVAILABLE, AssignmentConflict, reserve_vehicles
+from vehicles.models import Driver, Vehicle
+from .models import Shipment
+
+# Статусы, из которых поставку можно назначить
+ASSIGNABLE_STATUSES = ['PLANNED']
+
+# Поля поставки, которые меняет назначение
+ASSIGNMENT_FIELDS = ['status', 'assigned_vehicle', 'assigned_driver', 'assigned_by', 'updated_at']
+
+# Наибольшее число назначений в одном запросе
+MAX_BATCH_ASSIGNMENTS = 500
+
+CONCURRENT_CHANGE = 'Поставка или транспорт изменены параллельным назначением, повторите запрос'
+
+
+def find_conflicts(assignments, shipments, vehicles, drivers, shared_vehicles=False):
+    """Проверка пачки назначений по заблокированным строкам"""
+    conflicts = []
+    used_shipments = set()
+    used_vehicles = set()
+    for index, assignment in enumerate(assignments):
+        shipment = shipments.get(assignment['shipment_id'])
+        vehicle = vehicles.get(assignment['vehicle_id'])
+        driver = drivers.get(assignment['driver_id'])
+
+        if shipment is None or vehicle is None or driver is None:
+            error = 'Поставка, транспорт или водитель не найдены'
+        elif shipment.status not in ASSIGNABLE_STATUSES or shipment.pk in used_shipments:
+            error = 'Поставка уже назначена'
+        elif (
+            not vehicle.is_active or vehicle.status != 'AVAILABLE'
+            or (vehicle.pk in used_vehicles and not shared_vehicles)
+        ):
+            error = VEHICLE_UNAVAILABLE
+        elif driver.vehicle_id != vehicle.pk:
+            error = 'Водитель не привязан к указанному транспортному средству'
+        else:
+            used_shipments.add(shipment.pk)
+            used_vehicles.add(vehicle.pk)
+            continue
+        conflicts.append({'index': index, 'error': error})
+    return conflicts
+
+
+def assign_shipments(assignments, user, shared_vehicles=False):
+    """Назначает поставкам транспорт и водителей одной транзакцией.
+
+    assignments - список {'shipment_id', 'vehicle_id', 'driver_id'}.
+    Назначаются либо все, либо ни одно: при конфликте выбрасывается
+    AssignmentConflict со списком всех конфликтующих элементов.
+    shared_vehicles разрешает одному ТС в пачке везти несколько поставок
+    (консолидированная загрузка).
+
+    Строки поставок, ТС и водителей блокируются select_for_update, а
+    статусы меняются условными UPDATE (поставка - только из PLANNED, ТС -
+    только из AVAILABLE). Если между проверкой и записью их успел занять
+    параллельный запрос (на базах без блокировки строк), число обновленных
+    строк не совпадет и транзакция откатится."""
+    shipment_ids = [assignment['shipment_id'] for assignment in assignments]
+    vehicle_ids = [assignment['vehicle_id'] for assignment in assignments]
+    now = timezone.now()
+
+    with transaction.atomic():
+        shipments = Shipment.objects.select_for_update().only('id', 'status').in_bulk(shipment_ids)
+        vehicles = Vehicle.objects.select_for_update().only('id', 'status', 'is_active').in_bulk(vehicle_ids)
+        drivers = Driver.objects.select_for_update().only('id', 'vehicle_id').in_bulk(
+            [assignment['driver_id'] for assignment in assignments]
+        )
+        conflicts = find_conflicts(assignments, shipments, vehicles, drivers, shared_vehicles)
+        if conflicts:
+            raise AssignmentConflict(conflicts)
+
+        claimed = Shipment.objects.filter(pk__in=shipment_ids, status__in=ASSIGNABLE_STATUSES).update(
+            status='ASSIGNED',
+            assigned_vehicle=Case(*[
+                When(pk=assignment['shipment_id'], then=Value(assignment['vehicle_id']))
+                for assignment in assignments
+            ]),
+            assigned_driver=Case(*[
+                When(pk=assignment['shipment_id'], then=Value(assignment['driver_id']))
+                for assignment in assignments
+            ]),
+            assigned_by=user,
+            updated_at=now
+        )
+        if claimed != len(shipment_ids):
+            raise AssignmentConflict([{'index': None, 'error': CONCURRENT_CHANGE}])
+        reserve_vehicles(vehicle_ids, now)
+
+    bulk_changed.send(sender=Shipment, pks=shipment_ids, fields=ASSIGNMENT_FIELDS)
+    bulk_changed.send(sender=Vehicle, pks=vehicle_ids, fields=RESERVATION_FIELDS)
@@ -0,0 +1,109 @@
+from django.db import transaction
+from rest_framework import status
+
+from core.signals import bulk_changed
+from vehicles.models import Driver, Vehicle
+from warehouses.models import Warehouse
+from .models import CargoType, Shipment
+from .serializers import BulkShipmentItemSerializer
+
+# Наибольшее число поставок в одном запросе
+MAX_BULK_ITEMS = 1000
+
+# Поле элемента -> модель, по которой проверяется id
+RELATED_MODELS = {
+    'cargo_type': CargoType,
+    'origin_warehouse': Warehouse,
+    'destination_warehouse': Warehouse,
+    'assigned_vehicle': Vehicle,
+    'assigned_driver': Driver,
+}
+
+
+class ShipmentBulkCreator:
+    """Массовое создание поставок.
+
+    Каждый элемент проверяется сериализатором без обращений к БД, затем
+    связанные объекты загружаются одним in_bulk на модель, и все прошедшие
+    проверку поставки записываются одним bulk_create в одной транзакции.
+    Ошибочные элементы не мешают создать остальные."""
+
+    def __init__(self, user):
+        self.user = user
+
+    def validate_items(self, items):
+        """Возвращает (validated_data или None, errors) для каждого элемента"""
+        results = []
+        for item in items:
+            serializer = BulkShipmentItemSerializer(data=item)
+            if serializer.is_valid():
+                results.append((serializer.validated_data, None))
+            else:
+                results.append((None, serializer.errors))
+        return results
+
+    def load_related(self, validated_items):
+        """По одному запросу на модель: {модель: {id: объект}}"""
+        ids = {model: set() for model in RELATED_MODELS.values()}
+        for data in validated_items:
+            for field, model in RELATED_MODELS.items():
+                if data.get(field):
+                    ids[model].add(data[field])
+        return {
+            model: model.objects.in_bulk(model_ids) if model_ids else {}
+            for model, model_ids in ids.items()
+        }
+
+    def build_shipment(self, data, related):
+        """Shipment из проверенных данных или (None, errors). Повторяет
+        проверки Shipment.clean, но по уже загруженным объектам"""
+        errors = {}
+        values = dict(data)
+        for field, model in RELATED_MODELS.items():
+            pk = data.get(field)
+            if pk is None:
+                continue
+            instance = related[model].get(pk)
+            if instance is None:
+                errors[field] = [f'Объект с id {pk} не найден']
+            values[field] = instance
+
+        vehicle = values.get('assigned_vehicle')
+        driver = values.get('assigned_driver')
+        if not errors and vehicle and driver and driver.vehicle_id != vehicle.pk:
+            errors['assigned_driver'] = ['Водитель не привязан к назначенному транспортному средству']
+
+        if errors:
+            return None, errors
+        return Shipment(created_by=self.user, **values), None
+
+    def create(self, items):
+        validated = self.validate_items(items)
+        related = self.load_related(data for data, _ in validated if data is not None)
+
+        results = []
+        shipments = []
+        for index, (data, errors) in enumerate(validated):
+            if data is not None:
+                shipment, errors = self.build_shipment(data, related)
+            if errors:
+                results.append({'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': errors})
+                continue
+            results.append({'index': index, 'status': status.HTTP_201_CREATED})
+            shipments.append(shipment)
+
+        if shipments:
+            with transaction.atomic():
+                Shipment.objects.bulk_create(shipments)
+            bulk_changed.send(sender=Shipment, pks=[shipment.pk for shipment in shipments])
+
+        created = iter(shipments)
+        for result in results:
+            if result['status'] == status.HTTP_201_CREATED:
+                result['id'] = next(created).pk
+
+        return {
+            'created': len(shipments),
+            'failed': len(results) - len(shipments),
+            'results': results,
+        }
@@ -0,0 +1,37 @@
+# Generated by Django 5.1 on 2026-10-17 22:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cargo', '0003_delete_loadingrequest'),
+        ('vehicles', '0007_vehicleimportjob_mode_and_more'),
+        ('warehouses', '0002_alter_warehouse_contact_person'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['status', 'planned_departure'], name='shipment_status_departure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['origin_warehouse', 'status'], name='shipment_origin_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['destination_warehouse', 'status'], name='shipment_dest_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['assigned_driver', 'status'], name='shipment_driver_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['created_at'], name='shipment_created_idx'),
+        ),
+    ]
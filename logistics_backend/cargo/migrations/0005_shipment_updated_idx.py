@@ -0,0 +1,21 @@
+# Generated by Django 5.1 on 2026-10-18 00:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cargo', '0004_shipment_shipment_status_departure_idx_and_more'),
+        ('vehicles', '0010_vehicle_normalized_plate_unique'),
+        ('warehouses', '0002_alter_warehouse_contact_person'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['updated_at'], name='shipment_updated_idx'),
+        ),
+    ]
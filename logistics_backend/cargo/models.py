@@ -1,6 +1,7 @@
 from django.db import models
 from django.core.exceptions import ValidationError
 from core.models import User
+from core.validation import SaveValidationMixin
 from warehouses.models import Warehouse
 from vehicles.models import Vehicle, Driver
 
@@ -59,7 +60,7 @@ class CargoType(models.Model):
             })
 
 
-class Shipment(models.Model):
+class Shipment(SaveValidationMixin, models.Model):
     STATUS_CHOICES = (
         ('PLANNED', 'Запланирована'),
         ('ASSIGNED', 'Назначена'),
@@ -148,27 +149,41 @@ class Shipment(models.Model):
         verbose_name = 'Поставка'
         verbose_name_plural = 'Поставки'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'planned_departure'], name='shipment_status_departure_idx'),
+            models.Index(fields=['origin_warehouse', 'status'], name='shipment_origin_status_idx'),
+            models.Index(fields=['destination_warehouse', 'status'], name='shipment_dest_status_idx'),
+            models.Index(fields=['assigned_driver', 'status'], name='shipment_driver_status_idx'),
+            models.Index(fields=['created_at'], name='shipment_created_idx'),
+            # Инкрементальный пересчет итогов (analytics.rollups) по отметке updated_at
+            models.Index(fields=['updated_at'], name='shipment_updated_idx'),
+        ]
+
+    def validate_written(self, fields):
+        if self.writes(fields, 'planned_departure', 'planned_arrival'):
+            if self.planned_arrival and self.planned_departure and self.planned_arrival <= self.planned_departure:
+                raise ValidationError({
+                    'planned_arrival': 'Время прибытия должно быть позже времени отправления'
+                })
 
-    def clean(self):
-        if self.planned_arrival <= self.planned_departure:
-            raise ValidationError({
-                'planned_arrival': 'Время прибытия должно быть позже времени отправления'
-            })
-
-        if self.origin_warehouse == self.destination_warehouse:
-            raise ValidationError({
-                'destination_warehouse': 'Склад назначения не может совпадать со складом отправления'
-            })
-
-        if self.assigned_vehicle and self.assigned_driver:
-            if self.assigned_driver.vehicle != self.assigned_vehicle:
+        if self.writes(fields, 'origin_warehouse', 'origin_warehouse_id', 'destination_warehouse', 'destination_warehouse_id'):
+            if self.origin_warehouse_id and self.origin_warehouse_id == self.destination_warehouse_id:
                 raise ValidationError({
-                    'assigned_driver': 'Водитель не привязан к назначенному транспортному средству'
+                    'destination_warehouse': 'Склад назначения не может совпадать со складом отправления'
                 })
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
+        if self.writes(fields, 'assigned_vehicle', 'assigned_vehicle_id', 'assigned_driver', 'assigned_driver_id'):
+            if self.assigned_vehicle_id and self.assigned_driver_id:
+                if self.get_driver_vehicle_id() != self.assigned_vehicle_id:
+                    raise ValidationError({
+                        'assigned_driver': 'Водитель не привязан к назначенному транспортному средству'
+                    })
+
+    def get_driver_vehicle_id(self):
+        """vehicle_id назначенного водителя; запрос - только если водитель не загружен"""
+        if Shipment.assigned_driver.is_cached(self):
+            return self.assigned_driver.vehicle_id
+        return Driver.objects.filter(pk=self.assigned_driver_id).values_list('vehicle_id', flat=True).first()
 
     def __str__(self):
         return f"Поставка #{self.id} - {self.cargo_type.name}"
@@ -2,7 +2,7 @@ from rest_framework import serializers
 from .models import CargoType, Shipment
 from warehouses.serializers import WarehouseSerializer
 from vehicles.serializers import VehicleSerializer, DriverSerializer
-from core.serializers import UserProfileSerializer
+from core.serializers import DynamicFieldsMixin, UserProfileSerializer
 
 
 class CargoTypeSerializer(serializers.ModelSerializer):
@@ -16,29 +16,49 @@ class CargoTypeSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class ShipmentSerializer(serializers.ModelSerializer):
-    cargo_type_details = CargoTypeSerializer(source='cargo_type', read_only=True)
-    origin_warehouse_details = WarehouseSerializer(source='origin_warehouse', read_only=True)
-    destination_warehouse_details = WarehouseSerializer(source='destination_warehouse', read_only=True)
-    assigned_vehicle_details = VehicleSerializer(source='assigned_vehicle', read_only=True)
-    assigned_driver_details = DriverSerializer(source='assigned_driver', read_only=True)
-    created_by_details = UserProfileSerializer(source='created_by', read_only=True)
-    assigned_by_details = UserProfileSerializer(source='assigned_by', read_only=True)
+def validate_route(data):
+    """Общие проверки маршрута поставки: время и склады. Склады сравниваются
+    как объекты или как id, поэтому подходит и для BulkShipmentItemSerializer"""
+    if data.get('planned_arrival') and data.get('planned_departure'):
+        if data['planned_arrival'] <= data['planned_departure']:
+            raise serializers.ValidationError({
+                'planned_arrival': 'Время прибытия должно быть позже времени отправления'
+            })
+
+    if data.get('origin_warehouse') and data.get('destination_warehouse'):
+        if data['origin_warehouse'] == data['destination_warehouse']:
+            raise serializers.ValidationError({
+                'destination_warehouse': 'Склад назначения не может совпадать со складом отправления'
+            })
+
+    return data
+
+
+class ShipmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     duration = serializers.SerializerMethodField()
     is_delayed = serializers.SerializerMethodField()
 
     class Meta:
         model = Shipment
         fields = [
-            'id', 'cargo_type', 'cargo_type_details', 'weight', 'volume', 'description',
-            'origin_warehouse', 'origin_warehouse_details', 'destination_warehouse', 'destination_warehouse_details',
+            'id', 'cargo_type', 'weight', 'volume', 'description',
+            'origin_warehouse', 'destination_warehouse',
             'planned_departure', 'planned_arrival', 'actual_departure', 'actual_arrival',
-            'assigned_vehicle', 'assigned_vehicle_details', 'assigned_driver', 'assigned_driver_details',
-            'status', 'priority', 'created_by', 'created_by_details', 'assigned_by', 'assigned_by_details',
+            'assigned_vehicle', 'assigned_driver',
+            'status', 'priority', 'created_by', 'assigned_by',
             'special_instructions', 'delay_reason', 'duration', 'is_delayed',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        expandable_fields = {
+            'cargo_type': CargoTypeSerializer,
+            'origin_warehouse': WarehouseSerializer,
+            'destination_warehouse': WarehouseSerializer,
+            'assigned_vehicle': VehicleSerializer,
+            'assigned_driver': DriverSerializer,
+            'created_by': UserProfileSerializer,
+            'assigned_by': UserProfileSerializer,
+        }
 
     def get_duration(self, obj):
         duration = obj.calculate_duration()
@@ -50,19 +70,30 @@ class ShipmentSerializer(serializers.ModelSerializer):
         return obj.is_delayed()
 
     def validate(self, data):
-        if data.get('planned_arrival') and data.get('planned_departure'):
-            if data['planned_arrival'] <= data['planned_departure']:
-                raise serializers.ValidationError({
-                    'planned_arrival': 'Время прибытия должно быть позже времени отправления'
-                })
+        return validate_route(data)
+
 
-        if data.get('origin_warehouse') and data.get('destination_warehouse'):
-            if data['origin_warehouse'] == data['destination_warehouse']:
-                raise serializers.ValidationError({
-                    'destination_warehouse': 'Склад назначения не может совпадать со складом отправления'
-                })
+class BulkShipmentItemSerializer(serializers.ModelSerializer):
+    """Элемент массового создания поставок. Связи принимаются как id и не
+    проверяются по одной: ShipmentBulkCreator загружает их пачкой"""
+    cargo_type = serializers.IntegerField(min_value=1)
+    origin_warehouse = serializers.IntegerField(min_value=1)
+    destination_warehouse = serializers.IntegerField(min_value=1)
+    assigned_vehicle = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    assigned_driver = serializers.IntegerField(min_value=1, required=False, allow_null=True)
 
-        return data
+    class Meta:
+        model = Shipment
+        fields = [
+            'cargo_type', 'weight', 'volume', 'description',
+            'origin_warehouse', 'destination_warehouse',
+            'planned_departure', 'planned_arrival',
+            'assigned_vehicle', 'assigned_driver',
+            'status', 'priority', 'special_instructions'
+        ]
+
+    def validate(self, data):
+        return validate_route(data)
 
 
 class AssignShipmentSerializer(serializers.Serializer):
@@ -70,25 +101,42 @@ class AssignShipmentSerializer(serializers.Serializer):
     driver_id = serializers.IntegerField()
 
     def validate(self, attrs):
+        """Экипаж проверяется одним запросом по водителю: ТС водителя
+        существует по внешнему ключу. Занятость и статусы проверяет
+        assign_shipments под блокировкой."""
         from vehicles.models import Vehicle, Driver
 
-        try:
-            vehicle = Vehicle.objects.get(id=attrs['vehicle_id'])
-            driver = Driver.objects.get(id=attrs['driver_id'])
-        except (Vehicle.DoesNotExist, Driver.DoesNotExist):
-            raise serializers.ValidationError("Транспорт или водитель не найдены")
-
-        if driver.vehicle != vehicle:
+        driver = Driver.objects.filter(id=attrs['driver_id']).values_list('vehicle_id').first()
+        if driver is None or driver[0] != attrs['vehicle_id']:
+            if driver is None or not Vehicle.objects.filter(id=attrs['vehicle_id']).exists():
+                raise serializers.ValidationError("Транспорт или водитель не найдены")
             raise serializers.ValidationError("Водитель не привязан к указанному транспортному средству")
-
-        attrs['vehicle'] = vehicle
-        attrs['driver'] = driver
         return attrs
 
 
+class ShipmentAssignmentSerializer(serializers.Serializer):
+    """Элемент пакетного назначения; объекты проверяются в assign_shipments"""
+    shipment_id = serializers.IntegerField(min_value=1)
+    vehicle_id = serializers.IntegerField(min_value=1)
+    driver_id = serializers.IntegerField(min_value=1)
+
+
 class UpdateShipmentStatusSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=Shipment.STATUS_CHOICES)
     notes = serializers.CharField(required=False, allow_blank=True)
 
     def validate_status(self, value):
-        return value
\ No newline at end of file
+        return value
+
+
+class ShipmentScopeSerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    warehouse = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, attrs):
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError({
+                'date_to': 'Конец периода не может быть раньше начала'
+            })
+        return attrs
\ No newline at end of file
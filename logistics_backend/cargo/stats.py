@@ -0,0 +1,91 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Avg, BooleanField, Count, DurationField, ExpressionWrapper, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import Shipment
+
+DELIVERY_TIME = ExpressionWrapper(
+    F('actual_arrival') - F('actual_departure'),
+    output_field=DurationField()
+)
+DELIVERED = Q(status='COMPLETED', actual_departure__isnull=False, actual_arrival__isnull=False)
+INACTIVE_STATUSES = ['COMPLETED', 'CANCELLED']
+PERCENTILES = (50, 90, 95)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def scope_shipments(queryset, date_from=None, date_to=None, warehouse=None):
+    """Ограничивает поставки окном по плановому отправлению [date_from, date_to]
+    (включительно по дням) и складом отправления или назначения"""
+    if date_from:
+        queryset = queryset.filter(planned_departure__gte=day_start(date_from))
+    if date_to:
+        queryset = queryset.filter(planned_departure__lt=day_start(date_to + timedelta(days=1)))
+    if warehouse:
+        queryset = queryset.filter(
+            Q(origin_warehouse_id=warehouse) | Q(destination_warehouse_id=warehouse)
+        )
+    return queryset
+
+
+def delivery_time_percentiles(queryset):
+    """Перцентили времени доставки одним запросом: строки нумеруются оконной
+    функцией, число строк считается окном того же запроса, из базы
+    забираются только значения на нужных позициях. Позиции и число строк
+    берутся из одного снимка, поэтому поставка, доставленная между
+    запросами статистики, их не рассогласует."""
+    wanted = Q()
+    for p in PERCENTILES:
+        # Метод ближайшего ранга: ceil(p·rows/100), деление целочисленное
+        wanted |= Q(position=(F('rows') * p + 99) / 100)
+    rows = queryset.filter(DELIVERED).order_by().annotate(
+        position=Window(RowNumber(), order_by=DELIVERY_TIME.asc()),
+        rows=Window(Count('id')),
+        delivery_time=DELIVERY_TIME
+    ).annotate(
+        wanted=ExpressionWrapper(wanted, output_field=BooleanField())
+    ).filter(wanted=True).values_list('position', 'rows', 'delivery_time')
+
+    values = {}
+    total = 0
+    for position, total, delivery_time in rows:
+        values[position] = delivery_time
+    return {
+        f'p{p}': values[(total * p + 99) // 100].total_seconds() if total else None
+        for p in PERCENTILES
+    }
+
+
+def shipment_stats(queryset):
+    aggregates = {
+        'total_shipments': Count('id'),
+        'active_shipments': Count('id', filter=~Q(status__in=INACTIVE_STATUSES)),
+        'avg_delivery_time': Avg(DELIVERY_TIME, filter=DELIVERED),
+    }
+    for value, _ in Shipment.STATUS_CHOICES:
+        aggregates[f'status_{value}'] = Count('id', filter=Q(status=value))
+    for value, _ in Shipment.PRIORITY_CHOICES:
+        aggregates[f'priority_{value}'] = Count('id', filter=Q(priority=value))
+
+    result = queryset.order_by().aggregate(**aggregates)
+    avg_delivery_time = result['avg_delivery_time']
+
+    return {
+        'status_stats': [
+            {'status': value, 'count': result[f'status_{value}']}
+            for value, _ in Shipment.STATUS_CHOICES
+        ],
+        'priority_stats': [
+            {'priority': value, 'count': result[f'priority_{value}']}
+            for value, _ in Shipment.PRIORITY_CHOICES
+        ],
+        'total_shipments': result['total_shipments'],
+        'active_shipments': result['active_shipments'],
+        'avg_delivery_time_seconds': avg_delivery_time.total_seconds() if avg_delivery_time is not None else None,
+        'delivery_time_percentiles_seconds': delivery_time_percentiles(queryset),
+    }
@@ -1,3 +1,647 @@
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from analytics.rollups import changed_shipments
+from core.models import User
+from core.signals import bulk_changed
+from core.testing import PerformanceTestCase
+from search.query import search_ids
+from vehicles.models import Driver, Vehicle
+from warehouses.models import Warehouse
+from .models import CargoType, Shipment
+from .stats import delivery_time_percentiles, shipment_stats
+from .views import ShipmentViewSet
+
+
+class ShipmentListQueryPlanTests(TestCase):
+    """Частые фильтры списка поставок должны искать по индексу, а не
+    сканировать таблицу в миллион строк"""
+    ROWS = 1_000_000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        for index in range(20):
+            User.objects.create_user(f'user{index}', password='x', role='DISPATCHER')
+        cls.driver_user = User.objects.create_user('driver', password='x', role='DRIVER')
+        cls.driver = Driver.objects.create(
+            user=cls.driver_user, license_number='77 00 000000', license_category='C',
+            license_expiry='2030-01-01', phone_number='79990000000'
+        )
+        cls.warehouses = Warehouse.objects.bulk_create([
+            Warehouse(name=f'Склад {index}', address=f'Адрес {index}', capacity=1000)
+            for index in range(50)
+        ])
+        cargo_types = CargoType.objects.bulk_create([
+            CargoType(name=f'Груз {index}') for index in range(20)
+        ])
+        statuses = [value for value, _ in Shipment.STATUS_CHOICES]
+
+        status_case = ' '.join(
+            f"WHEN {position} THEN '{value}'" for position, value in enumerate(statuses)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                WITH RECURSIVE seq(n) AS (
+                    SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < %s
+                )
+                INSERT INTO cargo_shipment (
+                    cargo_type_id, weight, volume, description,
+                    origin_warehouse_id, destination_warehouse_id,
+                    planned_departure, planned_arrival, status, priority,
+                    assigned_driver_id, created_by_id,
+                    special_instructions, delay_reason, created_at, updated_at
+                )
+                SELECT
+                    %s + n %% 20, 1, 1, '',
+                    %s + n %% 50, %s + (n + 1) %% 50,
+                    datetime('2024-01-01', '+' || (n %% 525600) || ' minutes'),
+                    datetime('2024-01-01', '+' || (n %% 525600 + 600) || ' minutes'),
+                    CASE n %% """ + str(len(statuses)) + " " + status_case + """ END,
+                    'MEDIUM',
+                    CASE WHEN n %% 1000 = 0 THEN %s END,
+                    %s, '', '',
+                    datetime('2024-01-01', '+' || n || ' seconds'),
+                    datetime('2024-01-01', '+' || n || ' seconds')
+                FROM seq
+            """, [
+                cls.ROWS, cargo_types[0].pk, cls.warehouses[0].pk, cls.warehouses[0].pk,
+                cls.driver.pk, cls.manager.pk
+            ])
+
+    def list_queryset(self, user, **params):
+        request = APIRequestFactory().get('/api/cargo/shipments/', params)
+        force_authenticate(request, user=user)
+        view = ShipmentViewSet(action_map={'get': 'list'}, format_kwarg=None, kwargs={})
+        view.request = view.initialize_request(request)
+        return view.get_queryset()[:20]
+
+    def assertSearchesIndex(self, queryset, *index_names):
+        """План ищет по одному из указанных индексов и не сканирует таблицу"""
+        plan = queryset.explain()
+        self.assertNotRegex(plan, r'SCAN cargo_shipment\b', plan)
+        self.assertTrue(any(
+            f'SEARCH cargo_shipment USING INDEX {index_name}' in plan for index_name in index_names
+        ), plan)
+
+    def test_rollup_watermark_filter(self):
+        self.assertSearchesIndex(
+            changed_shipments(timezone.make_aware(datetime(2024, 1, 12))), 'shipment_updated_idx'
+        )
+
+    def test_seeded_rows(self):
+        self.assertEqual(Shipment.objects.count(), self.ROWS)
+
+    def test_status_filter(self):
+        self.assertSearchesIndex(
+            self.list_queryset(self.manager, status='PLANNED'),
+            'shipment_status_departure_idx'
+        )
+
+    def test_status_and_date_range_filter(self):
+        self.assertSearchesIndex(
+            self.list_queryset(self.manager, status='PLANNED', date_from='2024-03-01', date_to='2024-03-07'),
+            'shipment_status_departure_idx'
+        )
+
+    def test_warehouse_filter(self):
+        self.assertSearchesIndex(
+            self.list_queryset(self.manager, warehouse=self.warehouses[3].pk),
+            'shipment_origin_status_idx', 'cargo_shipment_origin_warehouse_id'
+        )
+
+    def test_warehouse_and_status_filter(self):
+        self.assertSearchesIndex(
+            self.list_queryset(self.manager, warehouse=self.warehouses[3].pk, status='DELAYED'),
+            'shipment_origin_status_idx', 'shipment_dest_status_idx', 'shipment_status_departure_idx'
+        )
+
+    def test_driver_sees_own_shipments(self):
+        self.assertSearchesIndex(
+            self.list_queryset(self.driver_user, status='ASSIGNED'),
+            'shipment_driver_status_idx'
+        )
+
+    def test_date_range_is_half_open(self):
+        shipments = list(self.list_queryset(self.manager, date_from='2024-03-01', date_to='2024-03-01'))
+        self.assertEqual(len(shipments), 20)
+        for shipment in shipments:
+            self.assertEqual(timezone.localtime(shipment.planned_departure).date(), date(2024, 3, 1))
+
+
+class ShipmentSaveValidationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        cls.origin = Warehouse.objects.create(name='Склад 1', address='Адрес 1', capacity=1000)
+        cls.destination = Warehouse.objects.create(name='Склад 2', address='Адрес 2', capacity=1000)
+        cls.vehicle = Vehicle.objects.create(license_plate='А123ВС77', model='КАМАЗ 65115', capacity=20, volume=80)
+        cls.other_vehicle = Vehicle.objects.create(license_plate='В456ОР50', model='Volvo FH', capacity=20, volume=80)
+        cls.driver = Driver.objects.create(
+            user=User.objects.create_user('driver', password='x', role='DRIVER'),
+            license_number='77 00 000000', license_category='C', license_expiry='2030-01-01',
+            phone_number='79990000000', vehicle=cls.vehicle
+        )
+        departure = timezone.now()
+        cls.shipment = Shipment.objects.create(
+            cargo_type=CargoType.objects.create(name='Щебень'), weight=1, volume=1,
+            origin_warehouse=cls.origin, destination_warehouse=cls.destination,
+            planned_departure=departure, planned_arrival=departure + timedelta(hours=6),
+            created_by=cls.manager
+        )
+
+    def get_shipment(self):
+        return Shipment.objects.get(pk=self.shipment.pk)
+
+    def test_status_update_is_single_query(self):
+        shipment = self.get_shipment()
+        shipment.status = 'IN_TRANSIT'
+        with self.assertNumQueries(1):
+            shipment.save(update_fields=['status', 'updated_at'])
+
+    def test_invalid_written_field(self):
+        shipment = self.get_shipment()
+        shipment.status = 'LOST'
+        with self.assertRaises(ValidationError) as context:
+            shipment.save(update_fields=['status'])
+        self.assertIn('status', context.exception.message_dict)
+
+    def test_route_is_checked_by_ids(self):
+        shipment = self.get_shipment()
+        shipment.destination_warehouse_id = self.origin.pk
+        with self.assertNumQueries(0), self.assertRaises(ValidationError) as context:
+            shipment.save(update_fields=['destination_warehouse'])
+        self.assertIn('destination_warehouse', context.exception.message_dict)
+
+    def test_crew_is_checked(self):
+        shipment = self.get_shipment()
+        shipment.assigned_vehicle_id = self.other_vehicle.pk
+        shipment.assigned_driver_id = self.driver.pk
+        with self.assertRaises(ValidationError) as context:
+            shipment.save(update_fields=['assigned_vehicle', 'assigned_driver'])
+        self.assertIn('assigned_driver', context.exception.message_dict)
+
+        shipment.assigned_vehicle = self.vehicle
+        shipment.assigned_driver = self.driver
+        with self.assertNumQueries(1):
+            shipment.save(update_fields=['assigned_vehicle', 'assigned_driver'])
+
+
+class ShipmentFieldsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        origin = Warehouse.objects.create(name='Склад 1', address='Адрес 1', capacity=1000)
+        destination = Warehouse.objects.create(name='Склад 2', address='Адрес 2', capacity=1000)
+        vehicle = Vehicle.objects.create(
+            license_plate='А123ВС77', model='КАМАЗ 65115', capacity=20, volume=80, current_warehouse=origin
+        )
+        driver = Driver.objects.create(
+            user=User.objects.create_user('driver', password='x', role='DRIVER'),
+            license_number='77 00 000000', license_category='C', license_expiry='2030-01-01',
+            phone_number='79990000000', vehicle=vehicle
+        )
+        departure = timezone.now()
+        cls.shipment = Shipment.objects.create(
+            cargo_type=CargoType.objects.create(name='Щебень'), weight=1, volume=1,
+            origin_warehouse=origin, destination_warehouse=destination,
+            planned_departure=departure, planned_arrival=departure + timedelta(hours=6),
+            assigned_vehicle=vehicle, assigned_driver=driver, status='ASSIGNED', created_by=cls.manager
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+        self.url = f'/api/cargo/shipments/{self.shipment.pk}/'
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data, queries
+
+    def joins(self, queries):
+        return sum(query['sql'].count(' JOIN ') for query in queries)
+
+    def test_details_are_returned_by_default(self):
+        data, _ = self.get(self.url, {})
+        self.assertEqual(data['assigned_driver_details']['vehicle_details']['current_warehouse_details']['name'], 'Склад 1')
+        self.assertEqual(data['created_by_details']['username'], 'manager')
+
+    def test_empty_expand_returns_flat_ids(self):
+        data, flat = self.get(self.url, {'expand': ''})
+        self.assertEqual(data['assigned_driver'], self.shipment.assigned_driver_id)
+        self.assertFalse([name for name in data if name.endswith('_details')])
+
+        _, expanded = self.get(self.url, {})
+        self.assertEqual(self.joins(flat), 0)
+        self.assertGreater(self.joins(expanded), 0)
+
+    def test_expand_selects_only_requested_relations(self):
+        data, queries = self.get(self.url, {'expand': 'assigned_driver.vehicle'})
+        self.assertEqual([name for name in data if name.endswith('_details')], ['assigned_driver_details'])
+        self.assertEqual(data['assigned_driver_details']['vehicle_details']['current_warehouse'], self.shipment.origin_warehouse_id)
+        self.assertNotIn('current_warehouse_details', data['assigned_driver_details']['vehicle_details'])
+        self.assertEqual(self.joins(queries), 2)
+
+    def test_list_query_count_does_not_depend_on_rows(self):
+        _, one = self.get('/api/cargo/shipments/', {'fields': 'id,status'})
+        for _ in range(3):
+            shipment = Shipment.objects.get(pk=self.shipment.pk)
+            shipment.pk = None
+            shipment.save()
+        data, many = self.get('/api/cargo/shipments/', {'fields': 'id,status'})
+        self.assertEqual(len(data['results']), 4)
+        self.assertEqual(len(many), len(one))
+
+    def test_fields_limit_payload(self):
+        data, queries = self.get(self.url, {'fields': 'id,status'})
+        self.assertEqual(set(data), {'id', 'status'})
+        self.assertEqual(self.joins(queries), 0)
+
+        data, _ = self.get(self.url, {'fields': 'id,cargo_type_details'})
+        self.assertEqual(set(data), {'id', 'cargo_type_details'})
+        self.assertEqual(data['cargo_type_details']['name'], 'Щебень')
+
+    def test_fields_do_not_limit_writes(self):
+        response = self.client.patch(f'{self.url}?fields=id', {'description': 'Навалом'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['description'], 'Навалом')
+        self.assertEqual(Shipment.objects.get(pk=self.shipment.pk).description, 'Навалом')
+
+        response = self.client.post('/api/cargo/shipments/?fields=id', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('origin_warehouse', response.data)
+
+    def test_list_not_modified_does_not_join_relations(self):
+        url = '/api/cargo/shipments/'
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(self.joins(queries), 0)
+
+    def test_list_etag_follows_related_changes(self):
+        url = '/api/cargo/shipments/'
+        etag = self.client.get(url)['ETag']
+        warehouse = self.shipment.origin_warehouse
+        warehouse.name = 'Склад 1 (новый)'
+        with self.captureOnCommitCallbacks(execute=True):
+            warehouse.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['origin_warehouse_details']['name'], 'Склад 1 (новый)')
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_changed.send(sender=User, pks=[self.manager.pk], fields=['first_name'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # Без раскрытия связей изменения их моделей ETag не меняют
+        etag = self.client.get(url, {'expand': ''})['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            warehouse.save()
+        self.assertEqual(self.client.get(url, {'expand': ''}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class ShipmentStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        cls.origin = Warehouse.objects.create(name='Склад 1', address='Адрес 1', capacity=1000)
+        cls.destination = Warehouse.objects.create(name='Склад 2', address='Адрес 2', capacity=1000)
+        cls.cargo_type = CargoType.objects.create(name='Щебень')
+
+    def create_delivered(self, hours):
+        departure = timezone.now() - timedelta(days=1)
+        Shipment.objects.bulk_create([
+            Shipment(
+                cargo_type=self.cargo_type, weight=1, volume=1,
+                origin_warehouse=self.origin, destination_warehouse=self.destination,
+                planned_departure=departure, planned_arrival=departure + timedelta(hours=12),
+                actual_departure=departure, actual_arrival=departure + timedelta(hours=value),
+                status='COMPLETED', created_by=self.manager
+            )
+            for value in hours
+        ])
+
+    def test_percentiles_in_one_query(self):
+        self.create_delivered(range(10, 0, -1))
+        with self.assertNumQueries(1):
+            percentiles = delivery_time_percentiles(Shipment.objects.all())
+        self.assertEqual(percentiles, {'p50': 5 * 3600, 'p90': 9 * 3600, 'p95': 10 * 3600})
+
+    def test_no_delivered_shipments(self):
+        self.assertEqual(delivery_time_percentiles(Shipment.objects.all()), {'p50': None, 'p90': None, 'p95': None})
+        self.assertIsNone(shipment_stats(Shipment.objects.all())['avg_delivery_time_seconds'])
+
+    def test_zero_delivery_time_is_kept(self):
+        self.create_delivered([0, 0])
+        stats = shipment_stats(Shipment.objects.all())
+        self.assertEqual(stats['avg_delivery_time_seconds'], 0)
+        self.assertEqual(stats['delivery_time_percentiles_seconds']['p50'], 0)
+
+
+class ShipmentAssignmentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        origin = Warehouse.objects.create(name='Склад 1', address='Адрес 1', capacity=1000)
+        destination = Warehouse.objects.create(name='Склад 2', address='Адрес 2', capacity=1000)
+        cargo_type = CargoType.objects.create(name='Щебень')
+        cls.crews = []
+        for index in range(3):
+            vehicle = Vehicle.objects.create(
+                license_plate=f'А{index:03d}ВС77', model='КАМАЗ 65115', capacity=20, volume=80
+            )
+            driver = Driver.objects.create(
+                user=User.objects.create_user(f'driver{index}', password='x', role='DRIVER'),
+                license_number=f'77 00 00000{index}', license_category='C', license_expiry='2030-01-01',
+                phone_number='79990000000', vehicle=vehicle
+            )
+            cls.crews.append((vehicle, driver))
+        departure = timezone.now()
+        cls.shipments = [
+            Shipment.objects.create(
+                cargo_type=cargo_type, weight=1, volume=1,
+                origin_warehouse=origin, destination_warehouse=destination,
+                planned_departure=departure, planned_arrival=departure + timedelta(hours=6),
+                created_by=cls.manager
+            )
+            for _ in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+
+    def assign(self, shipment, crew):
+        vehicle, driver = crew
+        return self.client.post(
+            f'/api/cargo/shipments/{shipment.pk}/assign/', {'vehicle_id': vehicle.pk, 'driver_id': driver.pk}
+        )
+
+    def batch_assign(self, pairs):
+        return self.client.post('/api/cargo/shipments/batch-assign/', [
+            {'shipment_id': shipment.pk, 'vehicle_id': crew[0].pk, 'driver_id': crew[1].pk}
+            for shipment, crew in pairs
+        ], format='json')
+
+    def assertAssigned(self, shipment, crew):
+        shipment.refresh_from_db()
+        self.assertEqual(shipment.status, 'ASSIGNED')
+        self.assertEqual((shipment.assigned_vehicle_id, shipment.assigned_driver_id), (crew[0].pk, crew[1].pk))
+        self.assertEqual(shipment.assigned_by, self.manager)
+        self.assertEqual(Vehicle.objects.get(pk=crew[0].pk).status, 'IN_USE')
+
+    def test_assign(self):
+        response = self.assign(self.shipments[0], self.crews[0])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertAssigned(self.shipments[0], self.crews[0])
+
+    def test_assign_validates_crew(self):
+        vehicle, driver = self.crews[0]
+        response = self.assign(self.shipments[0], (self.crews[1][0], driver))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('не привязан', str(response.data))
+        response = self.assign(self.shipments[0], (vehicle, Driver(pk=0)))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('не найдены', str(response.data))
+
+    def test_vehicle_cannot_be_booked_twice(self):
+        self.assertEqual(self.assign(self.shipments[0], self.crews[0]).status_code, 200)
+        response = self.assign(self.shipments[1], self.crews[0])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Shipment.objects.get(pk=self.shipments[1].pk).status, 'PLANNED')
+
+    def test_shipment_cannot_be_assigned_twice(self):
+        self.assertEqual(self.assign(self.shipments[0], self.crews[0]).status_code, 200)
+        self.assertEqual(self.assign(self.shipments[0], self.crews[1]).status_code, 409)
+        self.assertEqual(Vehicle.objects.get(pk=self.crews[1][0].pk).status, 'AVAILABLE')
+
+    def test_concurrent_booking_is_rolled_back(self):
+        """ТС заняли между проверкой и записью: условный UPDATE это видит"""
+        Vehicle.objects.filter(pk=self.crews[0][0].pk).update(status='IN_USE')
+        with mock.patch('cargo.assignment.find_conflicts', return_value=[]):
+            response = self.assign(self.shipments[0], self.crews[0])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Shipment.objects.get(pk=self.shipments[0].pk).status, 'PLANNED')
+
+    def test_batch_assign(self):
+        response = self.batch_assign(list(zip(self.shipments, self.crews)))
+        self.assertEqual(response.status_code, 200, response.data)
+        for shipment, crew in zip(self.shipments, self.crews):
+            self.assertAssigned(shipment, crew)
+
+    def test_batch_assign_is_all_or_nothing(self):
+        response = self.batch_assign([
+            (self.shipments[0], self.crews[0]),
+            (self.shipments[1], self.crews[0]),
+            (self.shipments[0], self.crews[1]),
+        ])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([conflict['index'] for conflict in response.data['conflicts']], [1, 2])
+        self.assertFalse(Shipment.objects.filter(status='ASSIGNED').exists())
+        self.assertFalse(Vehicle.objects.filter(status='IN_USE').exists())
+
+    def test_batch_assign_validates_payload(self):
+        response = self.client.post('/api/cargo/shipments/batch-assign/', [{'shipment_id': 'x'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/cargo/shipments/batch-assign/', [], format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ShipmentBulkCreateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        cls.origin = Warehouse.objects.create(name='Центральный склад', address='ул. Промышленная, 1', capacity=1000)
+        cls.destination = Warehouse.objects.create(name='Северный терминал', address='ул. Лесная, 5', capacity=1000)
+        cls.cargo_type = CargoType.objects.create(name='Щебень')
+        cls.vehicle = Vehicle.objects.create(license_plate='А123ВС77', model='КАМАЗ 65115', capacity=20, volume=80)
+        cls.other_vehicle = Vehicle.objects.create(license_plate='В456ОР50', model='Volvo FH', capacity=20, volume=80)
+        cls.driver = Driver.objects.create(
+            user=User.objects.create_user('driver', password='x', role='DRIVER'),
+            license_number='77 00 000000', license_category='C', license_expiry='2030-01-01',
+            phone_number='79990000000', vehicle=cls.vehicle
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+
+    def item(self, **values):
+        departure = timezone.now() + timedelta(days=1)
+        return {
+            'cargo_type': self.cargo_type.pk, 'weight': '5.00', 'volume': '10.00',
+            'description': 'Гранитный щебень фракции 20-40',
+            'origin_warehouse': self.origin.pk, 'destination_warehouse': self.destination.pk,
+            'planned_departure': departure.isoformat(),
+            'planned_arrival': (departure + timedelta(hours=6)).isoformat(),
+            **values
+        }
+
+    def post(self, items):
+        return self.client.post('/api/cargo/shipments/bulk/', items, format='json')
+
+    def test_all_created(self):
+        response = self.post([
+            self.item(), self.item(assigned_vehicle=self.vehicle.pk, assigned_driver=self.driver.pk)
+        ])
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 2)
+
+        ids = [result['id'] for result in response.data['results']]
+        shipments = Shipment.objects.filter(pk__in=ids)
+        self.assertEqual(len(shipments), 2)
+        self.assertTrue(all(shipment.created_by == self.manager for shipment in shipments))
+        # Записанные через bulk_create поставки попадают в поисковый индекс
+        self.assertEqual(sorted(search_ids('shipment', 'гранитный')), sorted(ids))
+
+    def test_partial_success(self):
+        response = self.post([
+            self.item(),
+            self.item(destination_warehouse=self.origin.pk),
+            self.item(cargo_type=999999),
+            self.item(assigned_vehicle=self.other_vehicle.pk, assigned_driver=self.driver.pk),
+            self.item(weight='много'),
+        ])
+        self.assertEqual(response.status_code, 207, response.data)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 4))
+
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [201, 400, 400, 400, 400])
+        self.assertIn('destination_warehouse', results[1]['errors'])
+        self.assertIn('cargo_type', results[2]['errors'])
+        self.assertIn('assigned_driver', results[3]['errors'])
+        self.assertIn('weight', results[4]['errors'])
+        self.assertEqual(Shipment.objects.count(), 1)
+
+    def test_nothing_created(self):
+        response = self.post([self.item(origin_warehouse=999999)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Shipment.objects.count(), 0)
+
+    def test_rejects_non_list(self):
+        self.assertEqual(self.post(self.item()).status_code, 400)
+        self.assertEqual(self.post([]).status_code, 400)
+
+
+class ShipmentApiPerformanceTests(PerformanceTestCase):
+    EXPAND = (
+        'cargo_type,origin_warehouse,destination_warehouse,assigned_vehicle.current_warehouse,'
+        'assigned_driver.user,assigned_driver.vehicle.current_warehouse,created_by,assigned_by'
+    )
+
+    def test_cargo_types_list(self):
+        self.assertWithinBudget('cargo-types-list', 'get', '/api/cargo/cargo-types/')
+
+    def test_list(self):
+        self.assertWithinBudget('shipments-list', 'get', '/api/cargo/shipments/', {'page_size': 100})
+
+    def test_list_expanded(self):
+        response = self.assertWithinBudget(
+            'shipments-list-expanded', 'get', '/api/cargo/shipments/', {'expand': self.EXPAND}
+        )
+        self.assertIn('assigned_by_details', response.data['results'][0])
+
+    def test_list_cursor(self):
+        self.assertWithinBudget(
+            'shipments-list-cursor', 'get', '/api/cargo/shipments/', {'pagination': 'cursor', 'page_size': 100}
+        )
+
+    def test_retrieve(self):
+        shipment = Shipment.objects.filter(assigned_driver__isnull=False).first()
+        self.assertWithinBudget(
+            'shipments-retrieve', 'get', f'/api/cargo/shipments/{shipment.pk}/', {'expand': self.EXPAND}
+        )
+
+    def test_list_not_modified(self):
+        params = {'expand': self.EXPAND}
+        etag = self.client.get('/api/cargo/shipments/', params)['ETag']
+        self.assertWithinBudget(
+            'shipments-list-not-modified', 'get', '/api/cargo/shipments/', params,
+            expected_status=304, HTTP_IF_NONE_MATCH=etag
+        )
+
+    def test_retrieve_not_modified(self):
+        url = f'/api/cargo/shipments/{Shipment.objects.first().pk}/'
+        etag = self.client.get(url, {'expand': self.EXPAND})['ETag']
+        self.assertWithinBudget(
+            'shipments-retrieve-not-modified', 'get', url, {'expand': self.EXPAND},
+            expected_status=304, HTTP_IF_NONE_MATCH=etag
+        )
+
+    def test_search(self):
+        response = self.assertWithinBudget(
+            'shipments-search', 'get', '/api/cargo/shipments/', {'search': 'груз 1'}
+        )
+        self.assertTrue(response.data['results'])
+
+    def test_stats(self):
+        self.assertWithinBudget('shipments-stats', 'get', '/api/cargo/shipments/stats/')
+
+    def test_upcoming(self):
+        response = self.assertWithinBudget(
+            'shipments-upcoming', 'get', '/api/cargo/shipments/upcoming/', {'expand': self.EXPAND}
+        )
+        self.assertTrue(response.data)
+
+    def test_assign(self):
+        driver = Driver.objects.filter(vehicle__status='AVAILABLE').select_related('vehicle').first()
+        shipment = Shipment.objects.filter(status='PLANNED').first()
+        self.assertWithinBudget(
+            'shipments-assign', 'post', f'/api/cargo/shipments/{shipment.pk}/assign/',
+            {'vehicle_id': driver.vehicle_id, 'driver_id': driver.pk}
+        )
+
+    def test_batch_assign(self):
+        crews = list(Driver.objects.filter(vehicle__status='AVAILABLE').order_by('pk')[:50])
+        shipments = Shipment.objects.filter(status='PLANNED').order_by('pk')[:len(crews)]
+        response = self.assertWithinBudget(
+            'shipments-batch-assign', 'post', '/api/cargo/shipments/batch-assign/',
+            [
+                {'shipment_id': shipment.pk, 'vehicle_id': driver.vehicle_id, 'driver_id': driver.pk}
+                for shipment, driver in zip(shipments, crews)
+            ],
+            format='json'
+        )
+        self.assertEqual(len(response.data['assigned']), len(crews))
+
+    def test_bulk_create(self):
+        warehouses = self.data['warehouses']
+        departure = timezone.now() + timedelta(days=1)
+        items = [
+            {
+                'cargo_type': self.data['cargo_types'][index % 20].pk, 'weight': 5, 'volume': 10,
+                'origin_warehouse': warehouses[index].pk, 'destination_warehouse': warehouses[index + 1].pk,
+                'planned_departure': departure.isoformat(),
+                'planned_arrival': (departure + timedelta(hours=6)).isoformat(),
+            }
+            for index in range(500)
+        ]
+        response = self.assertWithinBudget(
+            'shipments-bulk-create', 'post', '/api/cargo/shipments/bulk/', items,
+            expected_status=201, format='json'
+        )
+        self.assertEqual(response.data['created'], 500)
 
-# Create your tests here.
+    def test_update_status(self):
+        shipment = Shipment.objects.filter(status='ASSIGNED').first()
+        self.assertWithinBudget(
+            'shipments-update-status', 'post', f'/api/cargo/shipments/{shipment.pk}/update_status/',
+            {'status': 'IN_TRANSIT'}
+        )
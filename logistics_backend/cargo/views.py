@@ -1,17 +1,25 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, Count, Avg
 from django.utils import timezone
 from datetime import timedelta
+from core.conditional import ConditionalGetMixin
+from core.pagination import KeysetPaginationMixin
+from core.query_plan import QueryPlanMixin
 from .models import CargoType, Shipment
 from .serializers import (
     CargoTypeSerializer, ShipmentSerializer,
-    AssignShipmentSerializer, UpdateShipmentStatusSerializer
+    AssignShipmentSerializer, ShipmentAssignmentSerializer, UpdateShipmentStatusSerializer,
+    ShipmentScopeSerializer
 )
+from search.query import apply_search
+from vehicles.assignment import AssignmentConflict
+from .assignment import MAX_BATCH_ASSIGNMENTS, assign_shipments
+from .bulk import MAX_BULK_ITEMS, ShipmentBulkCreator
+from .stats import day_start, scope_shipments, shipment_stats
 
 
-class CargoTypeViewSet(viewsets.ModelViewSet):
+class CargoTypeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = CargoType.objects.all()
     serializer_class = CargoTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -25,12 +33,12 @@ class CargoTypeViewSet(viewsets.ModelViewSet):
 
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(name__icontains=search)
+            queryset = apply_search(queryset, 'cargo_type', search)
 
         return queryset
 
 
-class ShipmentViewSet(viewsets.ModelViewSet):
+class ShipmentViewSet(ConditionalGetMixin, QueryPlanMixin, KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Shipment.objects.all()
     serializer_class = ShipmentSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -50,63 +58,86 @@ class ShipmentViewSet(viewsets.ModelViewSet):
         if priority_filter:
             queryset = queryset.filter(priority=priority_filter)
 
-        warehouse_filter = self.request.query_params.get('warehouse', None)
-        if warehouse_filter:
-            queryset = queryset.filter(
-                Q(origin_warehouse_id=warehouse_filter) |
-                Q(destination_warehouse_id=warehouse_filter)
-            )
-
-        date_from = self.request.query_params.get('date_from', None)
-        date_to = self.request.query_params.get('date_to', None)
-        if date_from:
-            queryset = queryset.filter(planned_departure__date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(planned_departure__date__lte=date_to)
-
+        # Даты фильтруются полуоткрытым диапазоном по planned_departure,
+        # без __date, чтобы запрос мог использовать индекс
+        scope = ShipmentScopeSerializer(data=self.request.query_params)
+        scope.is_valid(raise_exception=True)
+        queryset = scope_shipments(queryset, **scope.validated_data)
 
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(cargo_type__name__icontains=search) |
-                Q(description__icontains=search)
-            )
+            queryset = apply_search(queryset, 'shipment', search)
 
-        return queryset.select_related(
-            'cargo_type', 'origin_warehouse', 'destination_warehouse',
-            'assigned_vehicle', 'assigned_driver', 'created_by', 'assigned_by'
-        )
+        # Связанные объекты подтягиваются по дереву сериализатора, то есть
+        # только для раскрытых через ?expand= полей
+        return self.optimize_queryset(queryset)
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Создание списка поставок. Ответ 201, если созданы все,
+        207 - если часть, 400 - если ни одной; results - итог по каждому элементу"""
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'error': 'Ожидается непустой список поставок'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > MAX_BULK_ITEMS:
+            return Response(
+                {'error': f'Не больше {MAX_BULK_ITEMS} поставок за запрос'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        result = ShipmentBulkCreator(request.user).create(items)
+        if not result['failed']:
+            response_status = status.HTTP_201_CREATED
+        elif result['created']:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(result, status=response_status)
+
     @action(detail=True, methods=['post'])
     def assign(self, request, pk=None):
+        """Назначение транспорта и водителя; 409, если поставка уже
+        назначена или ТС занято, в том числе параллельным запросом"""
         shipment = self.get_object()
         serializer = AssignShipmentSerializer(data=request.data)
 
         if serializer.is_valid():
-            vehicle = serializer.validated_data['vehicle']
-            driver = serializer.validated_data['driver']
+            try:
+                assign_shipments([{
+                    'shipment_id': shipment.pk,
+                    'vehicle_id': serializer.validated_data['vehicle_id'],
+                    'driver_id': serializer.validated_data['driver_id'],
+                }], request.user)
+            except AssignmentConflict as e:
+                return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
+            shipment = self.optimize_queryset(Shipment.objects.all()).get(pk=shipment.pk)
+            return Response(self.get_serializer(shipment).data)
 
-            if vehicle.status != 'AVAILABLE':
-                return Response(
-                    {'error': 'Транспортное средство недоступно'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            shipment.assigned_vehicle = vehicle
-            shipment.assigned_driver = driver
-            shipment.assigned_by = request.user
-            shipment.status = 'ASSIGNED'
-            shipment.save()
+    @action(detail=False, methods=['post'], url_path='batch-assign')
+    def batch_assign(self, request):
+        """Пакетное назначение [{shipment_id, vehicle_id, driver_id}, ...]
+        одной транзакцией: назначаются все или ни одно. При конфликте - 409
+        и conflicts с номерами элементов"""
+        serializer = ShipmentAssignmentSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=MAX_BATCH_ASSIGNMENTS
+        )
+        serializer.is_valid(raise_exception=True)
 
-            vehicle.status = 'IN_USE'
-            vehicle.save()
+        try:
+            assign_shipments(serializer.validated_data, request.user)
+        except AssignmentConflict as e:
+            return Response({'conflicts': e.conflicts}, status=status.HTTP_409_CONFLICT)
 
-            return Response(ShipmentSerializer(shipment).data)
-
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'assigned': [item['shipment_id'] for item in serializer.validated_data]})
 
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
@@ -117,63 +148,46 @@ class ShipmentViewSet(viewsets.ModelViewSet):
             new_status = serializer.validated_data['status']
             notes = serializer.validated_data.get('notes', '')
 
+            update_fields = ['status', 'updated_at']
             if new_status == 'IN_TRANSIT' and not shipment.actual_departure:
                 shipment.actual_departure = timezone.now()
+                update_fields.append('actual_departure')
             elif new_status == 'COMPLETED' and not shipment.actual_arrival:
                 shipment.actual_arrival = timezone.now()
+                update_fields.append('actual_arrival')
             elif new_status == 'DELAYED':
                 shipment.delay_reason = notes
+                update_fields.append('delay_reason')
 
             shipment.status = new_status
-            shipment.save()
+            shipment.save(update_fields=update_fields)
 
-            return Response(ShipmentSerializer(shipment).data)
+            shipment = self.optimize_queryset(Shipment.objects.all()).get(pk=shipment.pk)
+            return Response(self.get_serializer(shipment).data)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        status_stats = Shipment.objects.values('status').annotate(
-            count=Count('id')
-        )
+        """Статистика по поставкам, считается агрегирующими запросами в БД.
+        Необязательные параметры: date_from, date_to, warehouse"""
+        scope = ShipmentScopeSerializer(data=request.query_params)
+        scope.is_valid(raise_exception=True)
 
-        priority_stats = Shipment.objects.values('priority').annotate(
-            count=Count('id')
-        )
-        completed_shipments = Shipment.objects.filter(
-            status='COMPLETED',
-            actual_departure__isnull=False,
-            actual_arrival__isnull=False
-        )
-
-        avg_delivery_time = None
-        if completed_shipments.exists():
-            total_seconds = sum(
-                (ship.actual_arrival - ship.actual_departure).total_seconds()
-                for ship in completed_shipments
-            )
-            avg_delivery_time = total_seconds / completed_shipments.count()
-
-        return Response({
-            'status_stats': list(status_stats),
-            'priority_stats': list(priority_stats),
-            'total_shipments': Shipment.objects.count(),
-            'active_shipments': Shipment.objects.exclude(
-                status__in=['COMPLETED', 'CANCELLED']
-            ).count(),
-            'avg_delivery_time_seconds': avg_delivery_time,
-        })
+        queryset = scope_shipments(Shipment.objects.all(), **scope.validated_data)
+        return Response(shipment_stats(queryset))
 
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
         """Предстоящие поставки (на сегодня и завтра)"""
-        today = timezone.now().date()
-        tomorrow = today + timedelta(days=1)
+        today = timezone.localdate()
 
         upcoming_shipments = Shipment.objects.filter(
-            planned_departure__date__in=[today, tomorrow],
+            planned_departure__gte=day_start(today),
+            planned_departure__lt=day_start(today + timedelta(days=2)),
             status__in=['PLANNED', 'ASSIGNED']
         ).order_by('planned_departure')
+        upcoming_shipments = self.optimize_queryset(upcoming_shipments)
 
         serializer = self.get_serializer(upcoming_shipments, many=True)
         return Response(serializer.data)
\ No newline at end of file
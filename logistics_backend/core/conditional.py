@@ -0,0 +1,148 @@
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .query_plan import get_related_paths
+
+
+MODEL_VERSION_KEY = 'conditional:version:{label}'
+
+
+def model_versions(models):
+    """{модель: версия}. Версия случайная, а не счетчик: после очистки кэша
+    клиент не получит 304 по ETag, посчитанному до очистки."""
+    keys = {MODEL_VERSION_KEY.format(label=model._meta.label_lower): model for model in models}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        versions[key] = cache.get(key)
+    return {model: versions[key] for key, model in keys.items()}
+
+
+def bump_model_version(model):
+    cache.set(MODEL_VERSION_KEY.format(label=model._meta.label_lower), uuid.uuid4().hex, timeout=None)
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified для list и retrieve.
+
+    Для списка валидаторы считаются одним агрегирующим запросом по
+    отфильтрованной выборке без соединений: Max(updated_at) (по индексу) и
+    число строк. Изменения связанных объектов, выводимых сериализатором,
+    видны по версиям их моделей из кэша (core.signals меняет версию при
+    каждой записи), поэтому 304 не соединяет таблицы связей. Для карточки
+    берется updated_at объекта и уже загруженных связанных объектов. Если
+    клиент прислал совпадающий If-None-Match (для карточки также
+    If-Modified-Since), отдается 304 без сериализации.
+
+    По одному If-Modified-Since список не проверяется: удаление строки
+    не сдвигает Max(updated_at), это видно только по числу строк в ETag.
+    Версии моделей общие для воркеров только при общем кэше."""
+    last_modified_field = 'updated_at'
+
+    def get_related_models(self):
+        """Модели объектов, которые выводит сериализатор, включая саму модель"""
+        model = self.queryset.model
+        models = {model}
+        select_related, prefetch_related = get_related_paths(self.get_serializer())
+        for path in select_related + prefetch_related:
+            related_model = model
+            for attr in path.split('__'):
+                related_model = related_model._meta.get_field(attr).related_model
+            models.add(related_model)
+        return sorted(models, key=lambda related_model: related_model._meta.label_lower)
+
+    def get_timestamp_paths(self):
+        """Пути связей из сериализатора, у моделей которых есть updated_at"""
+        model = self.queryset.model
+        paths = []
+        for path in get_related_paths(self.get_serializer())[0]:
+            related_model = model
+            for attr in path.split('__'):
+                related_model = related_model._meta.get_field(attr).related_model
+            try:
+                related_model._meta.get_field(self.last_modified_field)
+            except FieldDoesNotExist:
+                continue
+            paths.append(path)
+        return paths
+
+    def get_list_validators(self, queryset):
+        result = queryset.order_by().aggregate(count=Count('pk'), last_modified=Max(self.last_modified_field))
+        timestamps = [result['last_modified']] if result['last_modified'] is not None else []
+        return result['count'], timestamps
+
+    def get_object_validators(self, instance):
+        timestamps = [getattr(instance, self.last_modified_field)]
+        for path in self.get_timestamp_paths():
+            related = instance
+            for attr in path.split('__'):
+                related = getattr(related, attr, None)
+                if related is None:
+                    break
+            if related is not None:
+                timestamps.append(getattr(related, self.last_modified_field))
+        return 1, timestamps
+
+    def get_etag(self, request, count, timestamps):
+        key = '|'.join([
+            str(request.user.pk),
+            request.get_full_path(),
+            request.accepted_media_type or '',
+            str(count),
+            *(timestamp.isoformat() for timestamp in timestamps),
+            *model_versions(self.get_related_models()).values(),
+        ])
+        return f'W/"{hashlib.md5(key.encode()).hexdigest()}"'
+
+    def conditional_response(self, request, count, timestamps, render, check_last_modified=True):
+        """Возвращает 304, если у клиента актуальная версия, иначе результат
+        render() с заголовками ETag и Last-Modified"""
+        etag = self.get_etag(request, count, timestamps)
+        last_modified = int(max(timestamps).timestamp()) if timestamps else None
+
+        response = get_conditional_response(
+            request._request, etag=etag,
+            last_modified=last_modified if check_last_modified else None
+        )
+        if response is None:
+            response = render()
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Клиент хранит ответ, но перепроверяет его при каждом запросе
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        count, timestamps = self.get_list_validators(queryset)
+        return self.conditional_response(
+            request, count, timestamps,
+            lambda: self.render_list(queryset),
+            check_last_modified=False
+        )
+
+    def render_list(self, queryset):
+        """То же, что ListModelMixin.list, но по уже построенной выборке"""
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        count, timestamps = self.get_object_validators(instance)
+        return self.conditional_response(
+            request, count, timestamps,
+            lambda: Response(self.get_serializer(instance).data)
+        )
@@ -0,0 +1,143 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Постраничный вывод по ключу (created_at, id) от новых к старым.
+
+    Страница выбирается условием по ключу последней записи, а не OFFSET,
+    поэтому стоимость одинакова для первой и тысячной страницы, а новые
+    записи не сдвигают содержимое страниц. Общее количество считается
+    только по запросу ?with_count=true."""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'with_count'
+    max_page_size = 100
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def __init__(self):
+        self.page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, reverse, instance):
+        payload = json.dumps({'r': reverse, 't': instance.created_at.isoformat(), 'i': instance.pk})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            created_at = parse_datetime(payload['t'])
+            if created_at is None:
+                raise ValueError
+            return bool(payload['r']), created_at, int(payload['i'])
+        except (TypeError, ValueError, KeyError):
+            raise ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'true':
+            self.count = queryset.count()
+
+        reverse = False
+        queryset = queryset.order_by('-created_at', '-pk')
+        if cursor:
+            reverse, created_at, pk = cursor
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+                ).order_by('created_at', 'pk')
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+                )
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+        return results
+
+    def get_link(self, reverse):
+        if not self.page:
+            return None
+        instance = self.page[0] if reverse else self.page[-1]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(reverse, instance))
+
+    def get_next_link(self):
+        return self.get_link(reverse=False) if self.has_next else None
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.get_link(reverse=True)
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class KeysetPaginationMixin:
+    """Для ViewSet: ?pagination=cursor включает KeysetPagination вместо
+    постраничного вывода по номеру страницы"""
+    pagination_query_param = 'pagination'
+
+    @property
+    def paginator(self):
+        if (
+            not hasattr(self, '_paginator')
+            and self.request is not None
+            and self.request.query_params.get(self.pagination_query_param) == 'cursor'
+        ):
+            self._paginator = KeysetPagination()
+        return super().paginator
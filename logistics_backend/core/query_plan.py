@@ -0,0 +1,70 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def get_related_paths(serializer):
+    """Пути связей, по которым сериализатор обращается к вложенным объектам.
+
+    Обходит дерево полей уже созданного сериализатора (с учётом ?fields= и
+    ?expand=) и возвращает (select_related, prefetch_related): прямые
+    ForeignKey/OneToOne идут в select_related, обратные и ManyToMany связи,
+    а также всё, что находится под ними, - в prefetch_related."""
+    select_related = []
+    prefetch_related = []
+    collect_paths(serializer, '', False, select_related, prefetch_related)
+    return select_related, prefetch_related
+
+
+def collect_paths(serializer, prefix, prefetch, select_related, prefetch_related):
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None:
+        return
+
+    for field in serializer.fields.values():
+        if not isinstance(field, serializers.BaseSerializer) or field.source == '*':
+            continue
+
+        path = prefix
+        field_prefetch = prefetch
+        current_model = model
+        for attr in field.source.split('.'):
+            try:
+                model_field = current_model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # Свойство или метод модели - связь по нему не выводится
+                current_model = None
+                break
+            if not model_field.is_relation:
+                current_model = None
+                break
+            if model_field.many_to_many or model_field.one_to_many:
+                field_prefetch = True
+            path = f'{path}__{attr}' if path else attr
+            current_model = model_field.related_model
+
+        if current_model is None:
+            continue
+
+        (prefetch_related if field_prefetch else select_related).append(path)
+        collect_paths(field, path, field_prefetch, select_related, prefetch_related)
+
+
+def optimize_queryset(queryset, serializer):
+    """Добавляет к queryset select_related/prefetch_related по дереву сериализатора,
+    чтобы выборка любого числа объектов стоила постоянного числа запросов"""
+    select_related, prefetch_related = get_related_paths(serializer)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset
+
+
+class QueryPlanMixin:
+    """Для ViewSet: связи для выборки берутся из сериализатора текущего запроса"""
+
+    def optimize_queryset(self, queryset):
+        return optimize_queryset(queryset, self.get_serializer())
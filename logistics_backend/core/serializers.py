@@ -1,7 +1,97 @@
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from django.contrib.auth.password_validation import validate_password
 from .models import User
 
+
+def parse_list_param(value):
+    """'a, b,,c' -> ['a', 'b', 'c']"""
+    if not value:
+        return []
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def build_expand_tree(paths):
+    """['assigned_driver.vehicle', 'cargo_type'] -> {'assigned_driver': ['vehicle'], 'cargo_type': []}"""
+    tree = {}
+    for path in paths:
+        name, _, rest = path.partition('.')
+        children = tree.setdefault(name, [])
+        if rest:
+            children.append(rest)
+    return tree
+
+
+class DynamicFieldsMixin:
+    """Разреженный набор полей и вложенные блоки по запросу.
+
+    ?expand=cargo_type,assigned_driver.vehicle оставляет из вложенных
+    <связь>_details (связи из Meta.expandable_fields, через точку - на
+    следующих уровнях) только перечисленные, пустой ?expand= отдает связи
+    плоскими id. Без ?expand= блоки отдаются как раньше, все и на всех
+    уровнях (API_EXPAND_BY_DEFAULT), а при ?fields= - только названные в нем.
+    ?fields=id,status оставляет в ответе GET только перечисленные поля;
+    запись (POST/PUT/PATCH) проверяет все поля, а ответ на нее полный.
+    Параметры запроса читает только корневой сериализатор, вложенным
+    набор полей передаётся аргументами fields и expand."""
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+        if request is not None:
+            if fields is None:
+                fields = parse_list_param(request.query_params.get(self.fields_query_param))
+            if expand is None and self.expand_query_param in request.query_params:
+                expand = parse_list_param(request.query_params.get(self.expand_query_param))
+        self.requested_fields = set(fields or [])
+
+        if expand is None:
+            tree = self.get_default_expand_tree(self.requested_fields)
+        else:
+            tree = self.get_expand_tree(expand)
+        for name, children in tree.items():
+            serializer_class = self.Meta.expandable_fields[name]
+            field_kwargs = {'source': name, 'read_only': True}
+            if issubclass(serializer_class, DynamicFieldsMixin):
+                field_kwargs['expand'] = children
+            self.fields[f'{name}_details'] = serializer_class(**field_kwargs)
+
+    @property
+    def _readable_fields(self):
+        request = self.context.get('request')
+        if not self.requested_fields or (request is not None and request.method not in SAFE_METHODS):
+            yield from super()._readable_fields
+            return
+        for field in super()._readable_fields:
+            if field.field_name in self.requested_fields:
+                yield field
+
+    @classmethod
+    def get_default_expand_tree(cls, fields):
+        """Раскрытие без ?expand=: все связи (вложенные - тоже по умолчанию)
+        или, при ?fields=, только связи, чьи <связь>_details в нем названы"""
+        if not settings.API_EXPAND_BY_DEFAULT:
+            return {}
+        expandable = getattr(cls.Meta, 'expandable_fields', {})
+        return {
+            name: None for name in expandable
+            if not fields or f'{name}_details' in fields
+        }
+
+    @classmethod
+    def get_expand_tree(cls, expand):
+        """Дерево раскрытия без неизвестных связей"""
+        expandable = getattr(cls.Meta, 'expandable_fields', {})
+        return {
+            name: children for name, children in build_expand_tree(expand).items()
+            if name in expandable
+        }
+
+
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False, validators=[validate_password])
     password_confirm = serializers.CharField(write_only=True, required=False)
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .conditional import bump_model_version
+
+# Отправляется после массовых операций (bulk_create, bulk_update,
+# queryset.update), которые не вызывают post_save.
+# sender - класс модели, pks - измененные id (None, если неизвестны),
+# fields - необязательный список измененных полей, как update_fields
+bulk_changed = Signal()
+
+
+@receiver([post_save, post_delete, bulk_changed])
+def model_changed(sender, **kwargs):
+    # ETag списков учитывает версии моделей связанных объектов (core.conditional).
+    # Версия меняется после фиксации, иначе другой воркер отдаст 304 по
+    # ETag с новой версией, но посчитанный по старым данным ответ.
+    transaction.on_commit(lambda: bump_model_version(sender))
@@ -0,0 +1,204 @@
+import json
+import os
+import random
+import time
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+# Бюджеты эндпоинтов API на данных seed_volumes(): (запросов, миллисекунд).
+# Число запросов не должно зависеть от объема данных и размера страницы,
+# его рост означает N+1 и должен быть виден при ревью этой таблицы.
+# Время - грубая верхняя граница от зависаний и полных сканирований; оно
+# зависит от машины, поэтому только пишется в отчет PERF_REPORT, а тест
+# роняет лишь при PERF_ENFORCE_TIME=1.
+QUERY_BUDGETS = {
+    'users-profile': (0, 200),
+    'users-drivers': (1, 500),
+    'cargo-types-list': (3, 300),
+    'shipments-list': (3, 500),
+    'shipments-list-expanded': (3, 1000),
+    'shipments-list-cursor': (2, 500),
+    'shipments-retrieve': (1, 300),
+    'shipments-list-not-modified': (1, 300),
+    'shipments-retrieve-not-modified': (1, 300),
+    'shipments-search': (4, 500),
+    'shipments-stats': (2, 1000),
+    'shipments-upcoming': (1, 1000),
+    # Поставка (get_object), экипаж (валидация), затем те же 7 запросов, что у
+    # одного элемента shipments-batch-assign: SAVEPOINT, select_for_update
+    # поставки, ТС и водителя, UPDATE поставки и ТС, RELEASE; и перечитывание
+    # поставки со связями для ответа
+    'shipments-assign': (10, 500),
+    'shipments-update-status': (3, 500),
+    'shipments-bulk-create': (18, 3000),
+    'shipments-batch-assign': (7, 1000),
+    'vehicles-list': (3, 500),
+    'vehicles-list-expanded': (3, 500),
+    'vehicles-retrieve': (1, 300),
+    'vehicles-list-not-modified': (1, 300),
+    'vehicles-search': (4, 500),
+    'vehicles-stats': (1, 500),
+    'vehicles-by-plate': (1, 300),
+    'vehicles-plate-prefix': (1, 300),
+    'vehicles-upload-excel': (48, 5000),
+    'vehicles-assign-driver': (9, 500),
+    'vehicles-nearest-available': (2, 300),
+    'drivers-list': (3, 500),
+    'drivers-available': (1, 500),
+    'drivers-assign-vehicle': (9, 500),
+    'warehouses-list': (3, 500),
+    'warehouses-retrieve': (1, 300),
+    'warehouses-list-not-modified': (1, 300),
+    'warehouses-search': (4, 500),
+    'warehouses-update-load': (2, 300),
+    'warehouses-stats': (2, 1000),
+    'warehouses-available-managers': (1, 300),
+    'warehouses-distances': (0, 300),
+    'warehouses-nearest': (1, 300),
+    'planning-dispatch-preview': (4, 3000),
+    'planning-dispatch-commit': (11, 3000),
+    'planning-consolidation-preview': (4, 3000),
+    'planning-consolidation-commit': (11, 3000),
+    'dashboard': (5, 2000),
+    'dashboard-cached': (0, 200),
+    'analytics-shipments': (2, 500),
+    'analytics-shipments-grouped': (2, 500),
+}
+
+# Путь к файлу, куда дописываются замеры (JSON построчно)
+REPORT_PATH = os.environ.get('PERF_REPORT')
+# Превышение бюджета времени - ошибка теста, а не только запись в отчете
+ENFORCE_TIME = os.environ.get('PERF_ENFORCE_TIME') == '1'
+
+
+def seed_volumes(warehouses=1000, vehicles=2000, drivers=200, shipments=5000, seed=0):
+    """Заполняет базу объемами, близкими к рабочим. Пишет bulk_create,
+    поэтому save() и сигналы моделей не вызываются, поисковый индекс
+    строится в конце целиком."""
+    from cargo.models import CargoType, Shipment
+    from core.models import User
+    from vehicles.models import Driver, Vehicle
+    from warehouses.models import Warehouse
+
+    rnd = random.Random(seed)
+    now = timezone.now()
+
+    users = []
+    for index in range(10):
+        users.append(User(username=f'manager{index}', role='LOGISTICS_MANAGER'))
+        users.append(User(username=f'dispatcher{index}', role='DISPATCHER'))
+    for index in range(drivers):
+        users.append(User(username=f'driver{index}', role='DRIVER', first_name=f'Водитель {index}'))
+    for user in users:
+        user.set_unusable_password()
+    users = User.objects.bulk_create(users)
+    managers = [user for user in users if user.role != 'DRIVER']
+    driver_users = [user for user in users if user.role == 'DRIVER']
+
+    warehouse_objects = Warehouse.objects.bulk_create([
+        Warehouse(
+            name=f'Склад {index}', address=f'Адрес склада {index}',
+            capacity=1000, current_load=rnd.randrange(1000),
+            contact_person=rnd.choice(managers), is_active=index % 10 != 0,
+            # Координаты без rnd, чтобы не менять остальную выборку
+            latitude=round(45 + index * 0.013 % 20, 6), longitude=round(30 + index * 0.029 % 100, 6)
+        )
+        for index in range(warehouses)
+    ])
+    cargo_types = CargoType.objects.bulk_create([
+        CargoType(name=f'Груз {index}', hazard_class=index % 9 or None) for index in range(20)
+    ])
+    vehicle_objects = Vehicle.objects.bulk_create([
+        Vehicle(
+            license_plate=f'А{index:05d}ВС77', normalized_plate=f'А{index:05d}ВС77', model='КАМАЗ 65115',
+            capacity=20, volume=80, status='AVAILABLE' if index % 3 else 'IN_USE',
+            current_warehouse=rnd.choice(warehouse_objects)
+        )
+        for index in range(vehicles)
+    ])
+    driver_objects = Driver.objects.bulk_create([
+        Driver(
+            user=user, license_number=f'77 00 {index:06d}', license_category='C',
+            license_expiry='2030-01-01', phone_number='79990000000',
+            vehicle=vehicle_objects[index] if index % 2 else None
+        )
+        for index, user in enumerate(driver_users)
+    ])
+
+    # Водитель поставки должен быть закреплен за ее транспортом
+    crews = [driver for driver in driver_objects if driver.vehicle_id]
+    statuses = [value for value, _ in Shipment.STATUS_CHOICES]
+    priorities = [value for value, _ in Shipment.PRIORITY_CHOICES]
+    shipment_objects = []
+    for index in range(shipments):
+        origin, destination = rnd.sample(warehouse_objects, 2)
+        departure = now + timedelta(hours=rnd.randrange(-24 * 60, 24 * 10))
+        status = rnd.choice(statuses)
+        crew = rnd.choice(crews) if status != 'PLANNED' else None
+        shipment_objects.append(Shipment(
+            cargo_type=rnd.choice(cargo_types), weight=rnd.randrange(1, 20), volume=rnd.randrange(1, 80),
+            origin_warehouse=origin, destination_warehouse=destination,
+            planned_departure=departure, planned_arrival=departure + timedelta(hours=rnd.randrange(2, 48)),
+            actual_departure=departure if status == 'COMPLETED' else None,
+            actual_arrival=departure + timedelta(hours=rnd.randrange(2, 48)) if status == 'COMPLETED' else None,
+            status=status, priority=rnd.choice(priorities),
+            assigned_vehicle=crew.vehicle if crew else None, assigned_driver=crew,
+            created_by=rnd.choice(managers), assigned_by=rnd.choice(managers) if crew else None
+        ))
+    Shipment.objects.bulk_create(shipment_objects, batch_size=1000)
+
+    from search.documents import rebuild_index
+    rebuild_index()
+
+    return {
+        'manager': managers[0],
+        'warehouses': warehouse_objects,
+        'vehicles': vehicle_objects,
+        'drivers': driver_objects,
+        'cargo_types': cargo_types,
+    }
+
+
+class PerformanceTestCase(APITestCase):
+    """Проверяет эндпоинты по бюджетам QUERY_BUDGETS на данных seed_volumes():
+    число запросов - всегда, время - при PERF_ENFORCE_TIME=1"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_volumes()
+        cls.manager = cls.data['manager']
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+
+    def assertWithinBudget(self, name, method, url, data=None, expected_status=200, **kwargs):
+        max_queries, max_ms = QUERY_BUDGETS[name]
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(self.client, method)(url, data, **kwargs)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.record(name, len(queries), elapsed_ms, max_ms)
+        self.assertEqual(response.status_code, expected_status, getattr(response, 'data', None))
+        self.assertLessEqual(
+            len(queries), max_queries,
+            f'{name}: {len(queries)} запросов при бюджете {max_queries}:\n' +
+            '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+        if ENFORCE_TIME:
+            self.assertLessEqual(elapsed_ms, max_ms, f'{name}: {elapsed_ms:.0f} мс при бюджете {max_ms} мс')
+        return response
+
+    def record(self, name, queries, elapsed_ms, max_ms):
+        if REPORT_PATH:
+            with open(REPORT_PATH, 'a') as report:
+                report.write(json.dumps({
+                    'name': name, 'queries': queries, 'ms': round(elapsed_ms, 1),
+                    'over_time_budget': elapsed_ms > max_ms,
+                }) + '\n')
@@ -1,3 +1,118 @@
+import base64
+import json
+from datetime import timedelta
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from vehicles.models import Vehicle
+from .models import User
+from .testing import QUERY_BUDGETS, PerformanceTestCase
+
+
+class KeysetPaginationTests(TestCase):
+    URL = '/api/vehicles/vehicles/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        cls.now = timezone.now()
+        # По три ТС на момент создания: порядок внутри момента задает id
+        for index in range(9):
+            cls.create_vehicle(index, cls.now - timedelta(minutes=index // 3))
+
+    @classmethod
+    def create_vehicle(cls, index, created_at, status='AVAILABLE'):
+        vehicle = Vehicle.objects.create(
+            license_plate=f'А{index:03d}ВС77', model='КАМАЗ 65115', capacity=20, volume=80, status=status
+        )
+        Vehicle.objects.filter(pk=vehicle.pk).update(created_at=created_at)
+        return vehicle
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+
+    def expected(self, queryset=Vehicle.objects.all()):
+        return list(queryset.order_by('-created_at', '-pk').values_list('pk', flat=True))
+
+    def get(self, url=None, expected_status=200, **params):
+        response = self.client.get(url or self.URL, None if url else {'pagination': 'cursor', **params})
+        self.assertEqual(response.status_code, expected_status, response.data)
+        return response.data
+
+    def walk(self, data, link='next'):
+        pages = [[item['id'] for item in data['results']]]
+        while data[link]:
+            data = self.get(data[link])
+            pages.append([item['id'] for item in data['results']])
+        return pages
+
+    def test_next_and_previous(self):
+        first = self.get(page_size=4)
+        self.assertIsNone(first['previous'])
+        pages = self.walk(first)
+        self.assertEqual([len(page) for page in pages], [4, 4, 1])
+        self.assertEqual(sum(pages, []), self.expected())
+
+        last = self.get(first['next'])
+        last = self.get(last['next'])
+        self.assertIsNone(last['next'])
+        backward = self.walk(last, link='previous')
+        self.assertEqual(backward, pages[::-1])
+
+    def test_inserts_during_walk(self):
+        first = self.get(page_size=2)
+        # Новее всех - не сдвигает уже начатый обход; в оставшемся
+        # диапазоне - появляется на своем месте
+        newer = self.create_vehicle(100, self.now + timedelta(minutes=1))
+        self.create_vehicle(101, self.now - timedelta(seconds=90))
+
+        walked = sum(self.walk(first), [])
+        self.assertEqual(len(walked), len(set(walked)))
+        self.assertEqual(walked, self.expected(Vehicle.objects.exclude(pk=newer.pk)))
+
+    def test_ties_on_created_at(self):
+        Vehicle.objects.update(created_at=self.now)
+        pages = self.walk(self.get(page_size=2))
+        self.assertEqual(sum(pages, []), sorted(Vehicle.objects.values_list('pk', flat=True), reverse=True))
+
+    def test_invalid_cursor(self):
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        valid = {'r': False, 't': self.now.isoformat(), 'i': 1}
+        for cursor in (
+            'garbage', '!!!', encode([]), encode({**valid, 'i': 'x'}), encode({**valid, 't': 'вчера'}),
+            encode({'r': False, 'i': 1}),
+        ):
+            data = self.get(expected_status=400, cursor=cursor)
+            self.assertIn('cursor', data)
+        self.get(cursor=encode(valid))
+
+    def test_with_count(self):
+        self.create_vehicle(20, self.now, status='MAINTENANCE')
+        self.assertNotIn('count', self.get(page_size=2))
+
+        data = self.get(page_size=2, with_count='true')
+        self.assertEqual(data['count'], 10)
+        data = self.get(data['next'])
+        self.assertEqual(data['count'], 10)
+        self.assertEqual(self.get(page_size=2, with_count='true', status='MAINTENANCE')['count'], 1)
+
+
+class UserApiPerformanceTests(PerformanceTestCase):
+
+    def test_profile(self):
+        self.assertWithinBudget('users-profile', 'get', '/api/auth/users/profile/')
+
+    def test_drivers(self):
+        self.assertWithinBudget('users-drivers', 'get', '/api/auth/users/drivers/')
 
-# Create your tests here.
+    def test_time_budget_is_report_only(self):
+        with mock.patch.dict(QUERY_BUDGETS, {'users-profile': (0, 0)}):
+            self.assertWithinBudget('users-profile', 'get', '/api/auth/users/profile/')
+            with mock.patch('core.testing.ENFORCE_TIME', True), self.assertRaises(AssertionError):
+                self.assertWithinBudget('users-profile', 'get', '/api/auth/users/profile/')
@@ -0,0 +1,53 @@
+from django.core.exceptions import ValidationError
+
+
+class SaveValidationMixin:
+    """Проверка модели при save() без лишних запросов.
+
+    В отличие от full_clean() проверяются только записываемые поля (с
+    учетом update_fields), у связей - только заполненность, без выборки
+    объекта: существование гарантирует внешний ключ в БД. Уникальность
+    тоже проверяет БД. Правила модели описываются в validate_written(),
+    которая получает множество записываемых полей (None - все поля) и
+    сравнивает связи по id."""
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        self.validate_for_save(None if update_fields is None else set(update_fields))
+        super().save(*args, **kwargs)
+
+    def clean(self):
+        self.validate_written(None)
+
+    def validate_written(self, fields):
+        pass
+
+    def writes(self, fields, *names):
+        """Пишется ли хотя бы одно из полей names"""
+        return fields is None or not fields.isdisjoint(names)
+
+    def validate_for_save(self, fields):
+        errors = {}
+        for field in self._meta.concrete_fields:
+            if not self.writes(fields, field.name, field.attname):
+                continue
+
+            raw_value = getattr(self, field.attname)
+            if field.blank and raw_value in field.empty_values:
+                continue
+            if field.is_relation:
+                if raw_value is None:
+                    errors[field.name] = [ValidationError(field.error_messages['null'], code='null')]
+                continue
+            try:
+                setattr(self, field.attname, field.clean(raw_value, self))
+            except ValidationError as e:
+                errors[field.name] = e.error_list
+
+        try:
+            self.validate_written(fields)
+        except ValidationError as e:
+            errors = e.update_error_dict(errors)
+
+        if errors:
+            raise ValidationError(errors)
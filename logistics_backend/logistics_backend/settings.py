@@ -40,10 +40,11 @@ INSTALLED_APPS = [
     'corsheaders',
     'rest_framework_simplejwt',
 
-    # 'planning',
-    # 'analytics',
+    'planning',
+    'analytics',
     'cargo',
     'core',
+    'search',
     'vehicles',
     'warehouses',
 ]
@@ -137,6 +138,31 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# Вложенные блоки <связь>_details в ответах без ?expand= (core.serializers.DynamicFieldsMixin):
+# True - все, как до появления ?expand=; False - связи плоскими id, блоки только по ?expand=
+API_EXPAND_BY_DEFAULT = config('API_EXPAND_BY_DEFAULT', default=True, cast=bool)
+
+# Локальный кэш процесса годится для разработки; при нескольких воркерах
+# укажите Redis или Memcached через CACHE_BACKEND/CACHE_LOCATION, иначе
+# снимок дашборда и версии моделей для ETag списков (core.conditional) не
+# сбрасываются изменениями из других воркеров
+# (предупреждение analytics.W001 в manage.py check --deploy)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='logistics'),
+    }
+}
+
+# Время жизни снимка /api/dashboard/ в секундах
+DASHBOARD_CACHE_TTL = config('DASHBOARD_CACHE_TTL', default=30, cast=int)
+
+# Размер пачки bulk_create при импорте транспорта из Excel
+VEHICLE_IMPORT_CHUNK_SIZE = config('VEHICLE_IMPORT_CHUNK_SIZE', default=500, cast=int)
+# Число потоков фоновой обработки импортов; при RUN_INLINE импорт выполняется в запросе
+VEHICLE_IMPORT_WORKERS = config('VEHICLE_IMPORT_WORKERS', default=2, cast=int)
+VEHICLE_IMPORT_RUN_INLINE = config('VEHICLE_IMPORT_RUN_INLINE', default=False, cast=bool)
+
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
@@ -166,4 +192,26 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
-]
\ No newline at end of file
+]
+
+# Автоматическое распределение поставок: сколько хранится рассчитанный
+# план до подтверждения (с) и сколько поставок берется в один расчет
+DISPATCH_PLAN_TTL = config('DISPATCH_PLAN_TTL', default=900, cast=int)
+DISPATCH_MAX_SHIPMENTS = config('DISPATCH_MAX_SHIPMENTS', default=20000, cast=int)
+
+# Каталог файлов матрицы расстояний между складами (warehouses.geo): общий
+# для всех процессов приложения на локальном диске (запись блокируется flock)
+WAREHOUSE_DISTANCE_DIR = config('WAREHOUSE_DISTANCE_DIR', default=str(BASE_DIR / 'var' / 'distances'))
+
+# Маршруты с несколькими остановками (planning.routing): процессов поиска,
+# поставок в одном расчете, средняя скорость (км/ч) и время на погрузку
+# или разгрузку (мин)
+ROUTING_WORKERS = config('ROUTING_WORKERS', default=os.cpu_count() or 1, cast=int)
+ROUTING_RUN_INLINE = config('ROUTING_RUN_INLINE', default=False, cast=bool)
+ROUTING_MAX_SHIPMENTS = config('ROUTING_MAX_SHIPMENTS', default=1000, cast=int)
+ROUTING_AVERAGE_SPEED_KMH = config('ROUTING_AVERAGE_SPEED_KMH', default=60, cast=float)
+ROUTING_SERVICE_MINUTES = config('ROUTING_SERVICE_MINUTES', default=30, cast=float)
+
+# Дневные итоги по поставкам (analytics.rollups): насколько раньше отметки
+# пересчета перечитываются изменения (с)
+ANALYTICS_ROLLUP_LAG_SECONDS = config('ANALYTICS_ROLLUP_LAG_SECONDS', default=300, cast=int)
@@ -18,6 +18,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
+from analytics.views import DashboardView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -25,8 +26,9 @@ urlpatterns = [
     path('api/warehouses/', include('warehouses.urls')),
     path('api/vehicles/', include('vehicles.urls')),
     path('api/cargo/', include('cargo.urls')),
-    # path('api/analytics/', include('analytics.urls')),
-    # path('api/planning/', include('planning.urls')),
+    path('api/dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('api/analytics/', include('analytics.urls')),
+    path('api/planning/', include('planning.urls')),
 ]
 
 if settings.DEBUG:
@@ -1,3 +1,16 @@
 from django.contrib import admin
+from .models import RoutePlanJob, SavedPlan
 
-# Register your models here.
+
+@admin.register(RoutePlanJob)
+class RoutePlanJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'date_from', 'date_to', 'time_budget', 'created_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'updated_at', 'started_at', 'finished_at')
+
+
+@admin.register(SavedPlan)
+class SavedPlanAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'shared_vehicles', 'created_at', 'expires_at')
+    list_filter = ('kind',)
+    readonly_fields = ('created_at',)
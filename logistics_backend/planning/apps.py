@@ -4,3 +4,4 @@ from django.apps import AppConfig
 class PlanningConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'planning'
+    verbose_name = 'Планирование'
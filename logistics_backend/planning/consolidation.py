@@ -0,0 +1,188 @@
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+
+from cargo.models import Shipment
+from cargo.stats import scope_shipments
+from .dispatcher import load_vehicles
+
+# Окно отправления по умолчанию: поставки одного направления, плановое
+# отправление которых отстоит от первой в группе не больше чем на окно,
+# можно везти одним рейсом
+DEFAULT_WINDOW_HOURS = 4
+PRIORITY_RANK = {'LOW': 0, 'MEDIUM': 1, 'HIGH': 2, 'URGENT': 3}
+# Погрешность сравнения сумм весов и объемов
+EPSILON = 1e-6
+
+
+def compatible(hazard_class, other):
+    """Разделение опасных грузов: в одном ТС не больше одного класса
+    опасности, неопасный груз можно везти с любым. Это строже таблицы
+    совместной погрузки ДОПОГ, зато не требует ее сопровождения."""
+    return hazard_class is None or other is None or hazard_class == other
+
+
+def load_shipments(date_from=None, date_to=None, warehouse=None):
+    """PLANNED поставки окна, не больше DISPATCH_MAX_SHIPMENTS ближайших:
+    (id, вес, объем, склад отправления, склад назначения, отправление,
+    класс опасности, приоритет)"""
+    queryset = scope_shipments(
+        Shipment.objects.filter(status='PLANNED'), date_from=date_from, date_to=date_to, warehouse=warehouse
+    )
+    rows = queryset.order_by('planned_departure', 'pk').values_list(
+        'id', 'weight', 'volume', 'origin_warehouse_id', 'destination_warehouse_id', 'planned_departure',
+        'cargo_type__hazard_class', 'priority'
+    )[:settings.DISPATCH_MAX_SHIPMENTS]
+    return [(row[0], float(row[1]), float(row[2]), *row[3:]) for row in rows]
+
+
+def group_shipments(shipments, window):
+    """Группы поставок одного направления (отправление -> назначение) с
+    отправлением в пределах window от первой поставки группы"""
+    groups = []
+    lanes = {}
+    for shipment in sorted(shipments, key=lambda row: (row[3], row[4], row[5], row[0])):
+        lane = lanes.get((shipment[3], shipment[4]))
+        if lane is None or shipment[5] - lane[0][5] > window:
+            lane = []
+            lanes[(shipment[3], shipment[4])] = lane
+            groups.append(lane)
+        lane.append(shipment)
+    # Сначала группы со срочными поставками, затем по времени отправления
+    groups.sort(key=lambda group: (-max(PRIORITY_RANK[row[7]] for row in group), group[0][5]))
+    return groups
+
+
+class Fleet:
+    """Свободные ТС в массивах NumPy: подбор ТС под груз - одна векторная
+    операция, а не проход по списку"""
+
+    def __init__(self, vehicles):
+        self.vehicles = vehicles
+        self.capacity = np.array([row[1] for row in vehicles], dtype=float)
+        self.volume = np.array([row[2] for row in vehicles], dtype=float)
+        self.warehouse = np.array([row[3] or -1 for row in vehicles], dtype=np.int64)
+        self.free = np.ones(len(vehicles), dtype=bool)
+
+    def take(self, weight, volume, warehouse, largest):
+        """Номер подходящего свободного ТС или None. ТС на складе
+        отправления предпочтительнее; из них берется самое крупное
+        (largest) или самое маленькое, в которое груз помещается."""
+        fits = (
+            self.free & (self.capacity >= weight - EPSILON) & (self.volume >= volume - EPSILON)
+        )
+        if not fits.any():
+            return None
+        local = fits & (self.warehouse == warehouse)
+        if local.any():
+            fits = local
+
+        candidates = np.flatnonzero(fits)
+        order = np.lexsort((self.volume[candidates], self.capacity[candidates]))
+        index = int(candidates[order[-1] if largest else order[0]])
+        self.free[index] = False
+        return index
+
+    def release(self, index):
+        self.free[index] = True
+
+
+def pack_group(group, fleet):
+    """First-fit decreasing по группе: поставки по убыванию доли от
+    наибольших грузоподъемности и объема парка, каждая - в первый открытый
+    рейс, где хватает места и нет несовместимого класса опасности. Новый
+    рейс открывается на самом крупном свободном ТС, после упаковки каждый
+    рейс пересаживается на самое маленькое ТС, вмещающее его груз.
+    Возвращает (рейсы, поставки без ТС)."""
+    scale_weight = fleet.capacity.max() if len(fleet.vehicles) else 1
+    scale_volume = fleet.volume.max() if len(fleet.vehicles) else 1
+    items = sorted(group, key=lambda row: (-(row[1] / scale_weight + row[2] / scale_volume), row[0]))
+    origin = group[0][3]
+
+    loads = []
+    unassigned = []
+    for item in items:
+        for load in loads:
+            if (
+                compatible(load['hazard_class'], item[6])
+                and load['weight'] + item[1] <= fleet.capacity[load['vehicle']] + EPSILON
+                and load['volume'] + item[2] <= fleet.volume[load['vehicle']] + EPSILON
+            ):
+                break
+        else:
+            vehicle = fleet.take(item[1], item[2], origin, largest=True)
+            if vehicle is None:
+                unassigned.append(item[0])
+                continue
+            load = {'vehicle': vehicle, 'hazard_class': None, 'weight': 0.0, 'volume': 0.0, 'shipments': []}
+            loads.append(load)
+
+        load['weight'] += item[1]
+        load['volume'] += item[2]
+        load['hazard_class'] = load['hazard_class'] or item[6]
+        load['shipments'].append(item)
+
+    for load in loads:
+        fleet.release(load['vehicle'])
+        load['vehicle'] = fleet.take(load['weight'], load['volume'], origin, largest=False)
+    return loads, unassigned
+
+
+def consolidate(shipments, vehicles, window):
+    """Раскладывает поставки по ТС; каждое ТС получает не больше одного рейса"""
+    fleet = Fleet(vehicles)
+    loads = []
+    unassigned = []
+    for group in group_shipments(shipments, window):
+        group_loads, group_unassigned = pack_group(group, fleet)
+        loads.extend(group_loads)
+        unassigned.extend(group_unassigned)
+    return fleet, loads, unassigned
+
+
+def build_plan(date_from=None, date_to=None, warehouse=None, window_hours=DEFAULT_WINDOW_HOURS):
+    shipments = load_shipments(date_from, date_to, warehouse)
+    vehicles = load_vehicles()
+    fleet, loads, unassigned = consolidate(shipments, vehicles, timedelta(hours=window_hours))
+
+    plan_loads = []
+    assignments = []
+    for load in loads:
+        load['departure'] = min(row[5] for row in load['shipments'])
+    for load in sorted(loads, key=lambda load: (load['departure'], vehicles[load['vehicle']][0])):
+        vehicle = vehicles[load['vehicle']]
+        first = load['shipments'][0]
+        shipment_ids = sorted(row[0] for row in load['shipments'])
+        plan_loads.append({
+            'vehicle_id': vehicle[0],
+            'driver_id': vehicle[4],
+            'origin_warehouse_id': first[3],
+            'destination_warehouse_id': first[4],
+            'departure': load['departure'],
+            'same_warehouse': first[3] == vehicle[3],
+            'hazard_class': load['hazard_class'],
+            'shipment_ids': shipment_ids,
+            'weight': round(load['weight'], 2),
+            'volume': round(load['volume'], 2),
+            'weight_utilization': round(load['weight'] / fleet.capacity[load['vehicle']], 3),
+            'volume_utilization': round(load['volume'] / fleet.volume[load['vehicle']], 3),
+        })
+        assignments.extend(
+            {'shipment_id': shipment_id, 'vehicle_id': vehicle[0], 'driver_id': vehicle[4]}
+            for shipment_id in shipment_ids
+        )
+
+    capacity = sum(fleet.capacity[load['vehicle']] for load in loads)
+    return {
+        'loads': plan_loads,
+        'assignments': assignments,
+        'unassigned': sorted(unassigned),
+        'shipments_total': len(shipments),
+        'truncated': len(shipments) == settings.DISPATCH_MAX_SHIPMENTS,
+        'vehicles_total': len(vehicles),
+        'vehicles_used': len(loads),
+        # Без консолидации каждой поставке нужно отдельное ТС
+        'vehicles_saved': len(assignments) - len(loads),
+        'weight_utilization': round(sum(load['weight'] for load in loads) / capacity, 3) if capacity else None,
+    }
@@ -0,0 +1,218 @@
+import numpy as np
+from django.conf import settings
+from django.db.models import Min
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+from cargo.models import Shipment
+from cargo.stats import scope_shipments
+from vehicles.models import Vehicle
+
+# Стоимость назначения ТС, стоящего не на складе отправления поставки
+OTHER_WAREHOUSE_COST = 1.0
+# Вес доли неиспользованной грузоподъемности: из подходящих ТС
+# выбирается то, что меньше всего превосходит груз
+SLACK_COST = 0.1
+# Скидка за приоритет. Шаг больше OTHER_WAREHOUSE_COST, поэтому при
+# нехватке транспорта срочная поставка получает ТС раньше обычной, даже
+# если ТС придется подать с другого склада
+PRIORITY_BONUS = {'LOW': 0.0, 'MEDIUM': 2.0, 'HIGH': 4.0, 'URGENT': 6.0}
+# Стоимость недопустимой пары (груз не помещается)
+INFEASIBLE = 1e6
+# Больше ячеек матрица стоимостей целиком не строится (8 МБ float64):
+# решается разреженная задача по кандидатам
+DENSE_CELLS = 1_000_000
+# Кандидатов на поставку (самых дешевых ТС) и на ТС (самых дешевых поставок)
+CANDIDATES = 32
+# Строк матрицы стоимостей за один проход при отборе кандидатов
+CHUNK_ROWS = 512
+# Стоимость «поставка без ТС» в разреженной задаче: выше любой допустимой
+# пары, поэтому назначение выгоднее пропуска
+UNASSIGNED = OTHER_WAREHOUSE_COST + SLACK_COST + 1
+# Сдвиг весов разреженной задачи: нулевой вес означает отсутствие ребра
+WEIGHT_SHIFT = max(PRIORITY_BONUS.values()) + 1
+
+
+def load_shipments(date_from=None, date_to=None, warehouse=None):
+    """PLANNED поставки окна, не больше DISPATCH_MAX_SHIPMENTS ближайших по
+    отправлению: (id, вес, объем, склад отправления, приоритет)"""
+    queryset = scope_shipments(
+        Shipment.objects.filter(status='PLANNED'), date_from=date_from, date_to=date_to, warehouse=warehouse
+    )
+    return list(queryset.order_by('planned_departure', 'pk').values_list(
+        'id', 'weight', 'volume', 'origin_warehouse_id', 'priority'
+    )[:settings.DISPATCH_MAX_SHIPMENTS])
+
+
+def load_vehicles():
+    """Свободные ТС с закрепленным водителем и известной вместимостью:
+    (id, грузоподъемность, объем, текущий склад, id водителя)"""
+    return list(
+        Vehicle.objects.filter(
+            status='AVAILABLE', is_active=True, capacity__isnull=False, volume__isnull=False,
+            assigned_drivers__is_active=True
+        ).annotate(driver_id=Min('assigned_drivers__id')).order_by('pk').values_list(
+            'id', 'capacity', 'volume', 'current_warehouse_id', 'driver_id'
+        )
+    )
+
+
+def shipment_arrays(shipments):
+    return (
+        np.array([row[1] for row in shipments], dtype=float),
+        np.array([row[2] for row in shipments], dtype=float),
+        np.array([row[3] for row in shipments], dtype=np.int64),
+        np.array([PRIORITY_BONUS[row[4]] for row in shipments], dtype=float),
+    )
+
+
+def vehicle_arrays(vehicles):
+    return (
+        np.array([row[1] for row in vehicles], dtype=float),
+        np.array([row[2] for row in vehicles], dtype=float),
+        # ТС без склада не совпадает ни с одним складом отправления
+        np.array([row[3] or -1 for row in vehicles], dtype=np.int64),
+    )
+
+
+def costs(shipment_columns, vehicle_columns):
+    weight, volume, origin, bonus = shipment_columns
+    capacity, vehicle_volume, warehouse = vehicle_columns
+
+    cost = np.where(origin[:, None] == warehouse[None, :], 0.0, OTHER_WAREHOUSE_COST)
+    slack = 1 - weight[:, None] / np.where(capacity > 0, capacity, np.inf)[None, :]
+    cost += SLACK_COST * np.clip(slack, 0, 1)
+    cost -= bonus[:, None]
+
+    fits = (capacity[None, :] >= weight[:, None]) & (vehicle_volume[None, :] >= volume[:, None])
+    cost[~fits] = INFEASIBLE
+    return cost
+
+
+def cost_matrix(shipments, vehicles):
+    """Матрица стоимостей поставка x ТС, считается векторно по колонкам"""
+    return costs(shipment_arrays(shipments), vehicle_arrays(vehicles))
+
+
+def candidates(shipment_columns, vehicle_columns, k=CANDIDATES):
+    """Допустимые пары (строки, колонки, стоимости): для каждой поставки k
+    самых дешевых ТС и для каждого ТС k самых дешевых поставок. Стоимости
+    считаются блоками по CHUNK_ROWS строк: память O((CHUNK_ROWS + k)·m)
+    вместо n·m на всю матрицу."""
+    n, m = len(shipment_columns[0]), len(vehicle_columns[0])
+    row_k, column_k = min(k, m), min(k, n)
+    rows, columns, values = [], [], []
+    # Лучшие поставки каждого ТС среди уже просмотренных блоков
+    best_cost = np.empty((0, m))
+    best_row = np.empty((0, m), dtype=np.int64)
+
+    for start in range(0, n, CHUNK_ROWS):
+        block = costs(tuple(column[start:start + CHUNK_ROWS] for column in shipment_columns), vehicle_columns)
+        block_rows = np.arange(start, start + len(block))
+
+        top = np.argpartition(block, row_k - 1, axis=1)[:, :row_k]
+        rows.append(np.repeat(block_rows, row_k))
+        columns.append(top.ravel())
+        values.append(np.take_along_axis(block, top, axis=1).ravel())
+
+        best_cost = np.vstack([best_cost, block])
+        best_row = np.vstack([best_row, np.broadcast_to(block_rows[:, None], block.shape)])
+        if len(best_cost) > column_k:
+            top = np.argpartition(best_cost, column_k - 1, axis=0)[:column_k]
+            best_cost = np.take_along_axis(best_cost, top, axis=0)
+            best_row = np.take_along_axis(best_row, top, axis=0)
+
+    rows.append(best_row.ravel())
+    columns.append(np.tile(np.arange(m), len(best_row)))
+    values.append(best_cost.ravel())
+
+    rows, columns, values = np.concatenate(rows), np.concatenate(columns), np.concatenate(values)
+    # Пара могла попасть в кандидаты и поставки, и ТС
+    _, unique = np.unique(rows * m + columns, return_index=True)
+    unique = unique[values[unique] < INFEASIBLE]
+    return rows[unique], columns[unique], values[unique]
+
+
+def sparse_match(shipment_columns, vehicle_columns):
+    """Назначение по кандидатам (min_weight_full_bipartite_matching). У
+    каждой поставки есть своя фиктивная колонка «без ТС» стоимостью
+    UNASSIGNED, поэтому полное паросочетание по строкам существует всегда.
+    Поставки и ТС, оставшиеся без пары, сопоставляются повторно среди
+    себя, пока находятся новые назначения."""
+    n, m = len(shipment_columns[0]), len(vehicle_columns[0])
+    free_rows, free_columns = np.arange(n), np.arange(m)
+    pairs = []
+    while len(free_rows) and len(free_columns):
+        rows, columns, values = candidates(
+            tuple(column[free_rows] for column in shipment_columns),
+            tuple(column[free_columns] for column in vehicle_columns)
+        )
+        if not len(rows):
+            break
+        size = len(free_rows)
+        graph = csr_matrix((
+            np.concatenate([values, np.full(size, UNASSIGNED)]) + WEIGHT_SHIFT,
+            (np.concatenate([rows, np.arange(size)]), np.concatenate([columns, len(free_columns) + np.arange(size)]))
+        ), shape=(size, len(free_columns) + size))
+        matched_rows, matched_columns = min_weight_full_bipartite_matching(graph)
+
+        found = matched_columns < len(free_columns)
+        if not found.any():
+            break
+        pairs.extend(zip(
+            free_rows[matched_rows[found]].tolist(), free_columns[matched_columns[found]].tolist()
+        ))
+        free_rows = np.setdiff1d(free_rows, free_rows[matched_rows[found]])
+        free_columns = np.setdiff1d(free_columns, free_columns[matched_columns[found]])
+    return pairs
+
+
+def match(cost):
+    """Назначение минимальной суммарной стоимости (венгерский алгоритм в
+    варианте scipy, O(n·m·min(n, m))). Каждое ТС получает не больше одной
+    поставки. Возвращает пары (строка, колонка) без недопустимых."""
+    if not cost.size:
+        return []
+    if cost.shape[0] > cost.shape[1]:
+        # Решатель быстрее, когда строк меньше, чем колонок
+        columns, rows = linear_sum_assignment(cost.T)
+    else:
+        rows, columns = linear_sum_assignment(cost)
+    return [
+        (row, column) for row, column in zip(rows.tolist(), columns.tolist())
+        if cost[row, column] < INFEASIBLE
+    ]
+
+
+def plan_pairs(shipments, vehicles):
+    """Пары (строка, колонка): точное решение по всей матрице стоимостей,
+    если она не больше DENSE_CELLS, иначе разреженное по кандидатам"""
+    if len(shipments) * len(vehicles) <= DENSE_CELLS:
+        return match(cost_matrix(shipments, vehicles))
+    return sparse_match(shipment_arrays(shipments), vehicle_arrays(vehicles))
+
+
+def build_plan(date_from=None, date_to=None, warehouse=None):
+    shipments = load_shipments(date_from, date_to, warehouse)
+    vehicles = load_vehicles()
+
+    assignments = []
+    for row, column in sorted(plan_pairs(shipments, vehicles)):
+        shipment, vehicle = shipments[row], vehicles[column]
+        assignments.append({
+            'shipment_id': shipment[0],
+            'vehicle_id': vehicle[0],
+            'driver_id': vehicle[4],
+            'same_warehouse': shipment[3] == vehicle[3],
+        })
+
+    assigned = {assignment['shipment_id'] for assignment in assignments}
+    return {
+        'assignments': assignments,
+        'unassigned': [shipment[0] for shipment in shipments if shipment[0] not in assigned],
+        'shipments_total': len(shipments),
+        'truncated': len(shipments) == settings.DISPATCH_MAX_SHIPMENTS,
+        'vehicles_total': len(vehicles),
+        'same_warehouse': sum(assignment['same_warehouse'] for assignment in assignments),
+    }
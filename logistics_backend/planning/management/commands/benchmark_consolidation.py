@@ -0,0 +1,70 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+
+from planning.consolidation import DEFAULT_WINDOW_HOURS, consolidate
+from planning.dispatcher import cost_matrix, match
+
+PRIORITIES = ['LOW', 'MEDIUM', 'HIGH', 'URGENT']
+
+
+def generate_problem(shipments, vehicles, warehouses, lanes, seed=0):
+    """Сборные грузы на ограниченном числе направлений: поставки в формате
+    consolidation.load_shipments, ТС - в формате load_vehicles"""
+    rnd = random.Random(seed)
+    routes = [tuple(rnd.sample(range(warehouses), 2)) for _ in range(lanes)]
+    start = datetime(2026, 1, 1)
+    shipment_rows = []
+    for index in range(shipments):
+        origin, destination = rnd.choice(routes)
+        shipment_rows.append((
+            index, rnd.uniform(0.2, 8), rnd.uniform(1, 30), origin, destination,
+            start + timedelta(minutes=rnd.randrange(3 * 24 * 60)),
+            rnd.choice([3, 8, 9]) if rnd.random() < 0.1 else None, rnd.choice(PRIORITIES)
+        ))
+    vehicle_rows = [
+        (index, rnd.choice([1.5, 5, 10, 20, 25]), rnd.choice([10, 40, 80, 90]), rnd.randrange(warehouses), index)
+        for index in range(vehicles)
+    ]
+    return shipment_rows, vehicle_rows
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает консолидацию поставок с назначением одной поставки на ТС по загрузке парка'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shipments', type=int, default=5000)
+        parser.add_argument('--vehicles', type=int, default=3000)
+        parser.add_argument('--warehouses', type=int, default=50)
+        parser.add_argument('--lanes', type=int, default=100)
+        parser.add_argument('--window-hours', type=int, default=DEFAULT_WINDOW_HOURS)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def report(self, name, seconds, assigned, weight, capacity):
+        self.stdout.write(
+            f"{name}: {seconds:.3f} с, поставок назначено {assigned}, ТС занято {len(capacity)}, "
+            f"загрузка по весу {weight / sum(capacity):.1%}"
+        )
+
+    def handle(self, *args, **options):
+        shipments, vehicles = generate_problem(
+            options['shipments'], options['vehicles'], options['warehouses'], options['lanes'], options['seed']
+        )
+        self.stdout.write(f"Поставок: {len(shipments)}, ТС: {len(vehicles)}, направлений: {options['lanes']}")
+
+        started = time.perf_counter()
+        dispatch_rows = [(row[0], row[1], row[2], row[3], row[7]) for row in shipments]
+        pairs = match(cost_matrix(dispatch_rows, vehicles))
+        self.report(
+            'Одна поставка на ТС', time.perf_counter() - started, len(pairs),
+            sum(shipments[row][1] for row, _ in pairs), [vehicles[column][1] for _, column in pairs]
+        )
+
+        started = time.perf_counter()
+        fleet, loads, _ = consolidate(shipments, vehicles, timedelta(hours=options['window_hours']))
+        self.report(
+            'Консолидация', time.perf_counter() - started, sum(len(load['shipments']) for load in loads),
+            sum(load['weight'] for load in loads), [fleet.capacity[load['vehicle']] for load in loads]
+        )
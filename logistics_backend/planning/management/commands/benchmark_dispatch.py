@@ -0,0 +1,80 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from planning.dispatcher import INFEASIBLE, PRIORITY_BONUS, cost_matrix, match
+
+PRIORITIES = list(PRIORITY_BONUS)
+
+
+def generate_problem(shipments, vehicles, warehouses, seed=0):
+    """Поставки и ТС в формате load_shipments/load_vehicles"""
+    rnd = random.Random(seed)
+    return (
+        [
+            (index, rnd.uniform(0.5, 20), rnd.uniform(1, 80), rnd.randrange(warehouses), rnd.choice(PRIORITIES))
+            for index in range(shipments)
+        ],
+        [
+            (index, rnd.choice([1.5, 5, 10, 20, 25]), rnd.choice([10, 40, 80, 90]), rnd.randrange(warehouses), index)
+            for index in range(vehicles)
+        ],
+    )
+
+
+def greedy_match(cost, shipments):
+    """Жадный подход для сравнения: поставки по убыванию приоритета, каждой -
+    самое дешевое из еще свободных ТС"""
+    cost = cost.copy()
+    pairs = []
+    order = sorted(range(len(shipments)), key=lambda row: -PRIORITY_BONUS[shipments[row][4]])
+    for row in order:
+        column = int(np.argmin(cost[row]))
+        if cost[row, column] >= INFEASIBLE:
+            continue
+        pairs.append((row, column))
+        cost[:, column] = INFEASIBLE
+    return pairs
+
+
+class Command(BaseCommand):
+    help = 'Замеряет автоматическое распределение поставок по ТС на синтетических данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shipments', type=int, default=10000)
+        parser.add_argument('--vehicles', type=int, default=2000)
+        parser.add_argument('--warehouses', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        shipments, vehicles = generate_problem(
+            options['shipments'], options['vehicles'], options['warehouses'], options['seed']
+        )
+
+        started = time.perf_counter()
+        cost = cost_matrix(shipments, vehicles)
+        build_seconds = time.perf_counter() - started
+        self.stdout.write(
+            f"Поставок: {len(shipments)}, ТС: {len(vehicles)}, матрица: {build_seconds:.3f} с, "
+            f"{cost.nbytes / 2 ** 20:.0f} МБ"
+        )
+
+        solvers = (
+            ('greedy', lambda: greedy_match(cost, shipments)),
+            ('linear_sum_assignment', lambda: match(cost)),
+        )
+        for name, solver in solvers:
+            started = time.perf_counter()
+            pairs = solver()
+            seconds = time.perf_counter() - started
+
+            rows = [row for row, _ in pairs]
+            columns = [column for _, column in pairs]
+            same_warehouse = sum(shipments[row][3] == vehicles[column][3] for row, column in pairs)
+            urgent = sum(shipments[row][4] == 'URGENT' for row in rows)
+            self.stdout.write(
+                f"{name}: {seconds:.3f} с, назначено {len(pairs)}, срочных {urgent}, "
+                f"со своего склада {same_warehouse}, стоимость {cost[rows, columns].sum():.1f}"
+            )
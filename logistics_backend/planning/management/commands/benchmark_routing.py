@@ -0,0 +1,58 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from planning.routing import Problem, construct, solve
+from warehouses.geo import haversine
+
+
+def generate_problem(shipments, vehicles, warehouses, seed=0, speed_kmh=60, service_minutes=30):
+    """Один день в регионе ~300 x 300 км: окна погрузки в первые 10 часов,
+    на доставку дается запас от 2 до 10 часов сверх прямого рейса"""
+    rnd = random.Random(seed)
+    points = [(rnd.uniform(54, 57), rnd.uniform(35, 40)) for _ in range(warehouses)]
+    latitudes = [[point[0]] for point in points]
+    longitudes = [[point[1]] for point in points]
+    km = haversine(latitudes, longitudes, [point[0] for point in points], [point[1] for point in points])
+    minutes = km / speed_kmh * 60
+
+    shipment_rows = []
+    for index in range(shipments):
+        origin, destination = rnd.sample(range(warehouses), 2)
+        earliest = rnd.randrange(0, 600)
+        latest = earliest + float(minutes[origin, destination]) + service_minutes + rnd.randrange(120, 600)
+        shipment_rows.append((index, rnd.uniform(0.5, 6), rnd.uniform(1, 20), origin, destination, earliest, latest))
+    vehicle_rows = [(index, 20, 80, rnd.randrange(warehouses), 0.0) for index in range(vehicles)]
+    return Problem(shipment_rows, vehicle_rows, km.tolist(), minutes.tolist(), service_minutes)
+
+
+class Command(BaseCommand):
+    help = 'Замеряет построение маршрутов с остановками и временными окнами на синтетических данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stops', type=int, default=500)
+        parser.add_argument('--vehicles', type=int, default=60)
+        parser.add_argument('--warehouses', type=int, default=40)
+        parser.add_argument('--time-budget', type=float, default=10)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        problem = generate_problem(options['stops'] // 2, options['vehicles'], options['warehouses'], options['seed'])
+
+        started = time.perf_counter()
+        initial = construct(problem)
+        self.stdout.write(
+            f"Остановок: {2 * len(problem.shipments)}, ТС: {len(problem.vehicles)}, "
+            f"вставка: {time.perf_counter() - started:.3f} с, без ТС {initial['cost'][0]}, "
+            f"стоимость {initial['cost'][1]:.0f}"
+        )
+
+        outcome = solve(problem, options['time_budget'], workers=options['workers'], seed=options['seed'])
+        cost = outcome['solution']['cost']
+        used = sum(1 for stops in outcome['solution']['routes'] if stops)
+        self.stdout.write(
+            f"Поиск ({options['workers']} процессов): {outcome['seconds']:.1f} с, раундов {outcome['rounds']}, "
+            f"без ТС {cost[0]}, ТС {used}, стоимость {cost[1]:.0f} ({cost[1] / initial['cost'][1] - 1:+.1%})"
+        )
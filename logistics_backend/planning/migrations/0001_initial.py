@@ -0,0 +1,41 @@
+# Generated by Django 5.1 on 2026-10-17 23:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoutePlanJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'В очереди'), ('RUNNING', 'Выполняется'), ('COMPLETED', 'Завершен'), ('CANCELLED', 'Отменен'), ('FAILED', 'Ошибка')], default='PENDING', max_length=20, verbose_name='Статус')),
+                ('date_from', models.DateField(blank=True, null=True, verbose_name='Начало периода')),
+                ('date_to', models.DateField(blank=True, null=True, verbose_name='Конец периода')),
+                ('warehouse', models.PositiveIntegerField(blank=True, null=True, verbose_name='Склад')),
+                ('time_budget', models.PositiveIntegerField(verbose_name='Время на расчет (с)')),
+                ('cancel_requested', models.BooleanField(default=False, verbose_name='Запрошена отмена')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Маршруты')),
+                ('error_message', models.TextField(blank=True, verbose_name='Ошибка расчета')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начало расчета')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Окончание расчета')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='route_plan_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Кем запущен')),
+            ],
+            options={
+                'verbose_name': 'Расчет маршрутов',
+                'verbose_name_plural': 'Расчеты маршрутов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
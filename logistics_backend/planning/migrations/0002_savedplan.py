@@ -0,0 +1,29 @@
+# Generated by Django 5.1 on 2026-10-17 23:57
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planning', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedPlan',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('dispatch', 'Распределение'), ('consolidation', 'Консолидация')], max_length=20, verbose_name='Вид плана')),
+                ('assignments', models.JSONField(verbose_name='Назначения')),
+                ('shared_vehicles', models.BooleanField(default=False, verbose_name='Несколько поставок на ТС')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Действует до')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'План назначений',
+                'verbose_name_plural': 'Планы назначений',
+            },
+        ),
+    ]
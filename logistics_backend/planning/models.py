@@ -1,3 +1,66 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class RoutePlanJob(models.Model):
+    STATUS_CHOICES = (
+        ('PENDING', 'В очереди'),
+        ('RUNNING', 'Выполняется'),
+        ('COMPLETED', 'Завершен'),
+        ('CANCELLED', 'Отменен'),
+        ('FAILED', 'Ошибка'),
+    )
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', verbose_name='Статус')
+    date_from = models.DateField(null=True, blank=True, verbose_name='Начало периода')
+    date_to = models.DateField(null=True, blank=True, verbose_name='Конец периода')
+    warehouse = models.PositiveIntegerField(null=True, blank=True, verbose_name='Склад')
+    time_budget = models.PositiveIntegerField(verbose_name='Время на расчет (с)')
+    cancel_requested = models.BooleanField(default=False, verbose_name='Запрошена отмена')
+    result = models.JSONField(null=True, blank=True, verbose_name='Маршруты')
+    error_message = models.TextField(blank=True, verbose_name='Ошибка расчета')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='route_plan_jobs',
+        verbose_name='Кем запущен'
+    )
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начало расчета')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Окончание расчета')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Расчет маршрутов'
+        verbose_name_plural = 'Расчеты маршрутов'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Расчет маршрутов #{self.id}"
+
+
+class SavedPlan(models.Model):
+    """Рассчитанный план назначений до подтверждения. Хранится в базе, а не
+    в кэше процесса: подтверждение может прийти в другой процесс."""
+    KIND_CHOICES = (
+        ('dispatch', 'Распределение'),
+        ('consolidation', 'Консолидация'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='Вид плана')
+    assignments = models.JSONField(verbose_name='Назначения')
+    shared_vehicles = models.BooleanField(default=False, verbose_name='Несколько поставок на ТС')
+    expires_at = models.DateTimeField(db_index=True, verbose_name='Действует до')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'План назначений'
+        verbose_name_plural = 'Планы назначений'
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.id.hex}"
@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from cargo.assignment import MAX_BATCH_ASSIGNMENTS, assign_shipments
+from vehicles.assignment import AssignmentConflict
+from .models import SavedPlan
+
+
+def save_plan(kind, assignments, shared_vehicles=False):
+    """Сохраняет назначения плана для подтверждения на DISPATCH_PLAN_TTL
+    секунд и возвращает его id. kind - вид плана ('dispatch',
+    'consolidation'), план одного вида нельзя подтвердить через другой.
+    shared_vehicles - одно ТС везет несколько поставок, назначения одного
+    ТС идут подряд. Заодно удаляются истекшие планы."""
+    now = timezone.now()
+    SavedPlan.objects.filter(expires_at__lte=now).delete()
+    plan = SavedPlan.objects.create(
+        kind=kind, assignments=assignments, shared_vehicles=shared_vehicles,
+        expires_at=now + timedelta(seconds=settings.DISPATCH_PLAN_TTL)
+    )
+    return plan.pk.hex
+
+
+def batches(assignments):
+    """Пачки до MAX_BATCH_ASSIGNMENTS назначений; назначения одного ТС не
+    разрываются, иначе вторая пачка получит ТС уже занятым первой"""
+    start = 0
+    while start < len(assignments):
+        end = min(start + MAX_BATCH_ASSIGNMENTS, len(assignments))
+        if end < len(assignments):
+            boundary = end
+            while boundary > start and assignments[boundary]['vehicle_id'] == assignments[boundary - 1]['vehicle_id']:
+                boundary -= 1
+            end = boundary if boundary > start else end
+        yield start, assignments[start:end]
+        start = end
+
+
+def commit_plan(kind, plan_id, user):
+    """Применяет сохраненный план одной транзакцией через assign_shipments.
+    Возвращает число назначений или None, если план не найден (истек).
+    Если с момента расчета поставку или ТС уже назначили, выбрасывается
+    AssignmentConflict и не применяется ничего. Строка плана блокируется
+    до конца транзакции, поэтому план применяется один раз."""
+    with transaction.atomic():
+        plan = SavedPlan.objects.select_for_update().filter(
+            pk=plan_id, kind=kind, expires_at__gt=timezone.now()
+        ).first()
+        if plan is None:
+            return None
+
+        assignments = plan.assignments
+        for start, batch in batches(assignments):
+            try:
+                assign_shipments(batch, user, shared_vehicles=plan.shared_vehicles)
+            except AssignmentConflict as e:
+                for conflict in e.conflicts:
+                    if conflict['index'] is not None:
+                        conflict['index'] += start
+                raise
+        plan.delete()
+    return len(assignments)
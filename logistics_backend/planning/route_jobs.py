@@ -0,0 +1,159 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from cargo.models import Shipment
+from cargo.stats import scope_shipments
+from warehouses.geo import haversine
+from warehouses.models import Warehouse
+from .dispatcher import load_vehicles
+from .models import RoutePlanJob
+from .routing import Problem, Route, solve
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='route-plan')
+        return _executor
+
+
+def submit_route_job(job):
+    """Ставит расчет в очередь; при ROUTING_RUN_INLINE выполняет сразу.
+    Расчеты идут по одному: каждый сам занимает ROUTING_WORKERS процессов."""
+    if settings.ROUTING_RUN_INLINE:
+        run_route_job(job.pk)
+    else:
+        get_executor().submit(_run_in_worker, job.pk)
+
+
+def _run_in_worker(job_id):
+    try:
+        run_route_job(job_id)
+    finally:
+        connection.close()
+
+
+def build_problem(now, date_from=None, date_to=None, warehouse=None):
+    """Problem из PLANNED поставок окна и свободных ТС с водителем. Точки -
+    склады с координатами; поставки и ТС со складами без координат в
+    задачу не попадают и возвращаются отдельно.
+    Возвращает (problem, строки ТС задачи, id складов точек, id поставок
+    без координат)."""
+    shipments = list(
+        scope_shipments(
+            Shipment.objects.filter(status='PLANNED'), date_from=date_from, date_to=date_to, warehouse=warehouse
+        ).order_by('planned_departure', 'pk').values_list(
+            'id', 'weight', 'volume', 'origin_warehouse_id', 'destination_warehouse_id',
+            'planned_departure', 'planned_arrival'
+        )[:settings.ROUTING_MAX_SHIPMENTS]
+    )
+    vehicles = load_vehicles()
+
+    warehouse_ids = {row[3] for row in shipments} | {row[4] for row in shipments} | {row[3] for row in vehicles}
+    coordinates = {
+        pk: (float(latitude), float(longitude))
+        for pk, latitude, longitude in Warehouse.objects.filter(
+            pk__in=[pk for pk in warehouse_ids if pk], latitude__isnull=False, longitude__isnull=False
+        ).values_list('pk', 'latitude', 'longitude')
+    }
+    points = sorted(coordinates)
+    position = {pk: index for index, pk in enumerate(points)}
+
+    def minutes_from_now(moment):
+        return (moment - now).total_seconds() / 60
+
+    routable = [row for row in shipments if row[3] in position and row[4] in position]
+    vehicles = [row for row in vehicles if row[3] in position]
+    points_array = np.array([coordinates[pk] for pk in points], dtype=float).reshape(-1, 2)
+    km = haversine(points_array[:, :1], points_array[:, 1:], points_array[:, 0], points_array[:, 1])
+
+    problem = Problem(
+        shipments=[
+            (row[0], float(row[1]), float(row[2]), position[row[3]], position[row[4]],
+             max(minutes_from_now(row[5]), 0.0), minutes_from_now(row[6]))
+            for row in routable
+        ],
+        vehicles=[(row[0], float(row[1]), float(row[2]), position[row[3]], 0.0) for row in vehicles],
+        km=km.tolist(),
+        minutes=(km / settings.ROUTING_AVERAGE_SPEED_KMH * 60).tolist(),
+        service_minutes=settings.ROUTING_SERVICE_MINUTES
+    )
+    unroutable = [row[0] for row in shipments if row[3] not in position or row[4] not in position]
+    return problem, vehicles, points, unroutable
+
+
+def describe_routes(problem, solution, vehicles, points, now):
+    """Решение в виде маршрутов ТС с остановками для ответа API"""
+    routes = []
+    for vehicle, stops in enumerate(solution['routes']):
+        if not stops:
+            continue
+        route = Route(problem, vehicle, stops)
+        routes.append({
+            'vehicle_id': vehicles[vehicle][0],
+            'driver_id': vehicles[vehicle][4],
+            'distance_km': round(route.distance, 1),
+            'stops': [
+                {
+                    'shipment_id': problem.shipments[shipment][0],
+                    'action': kind,
+                    'warehouse_id': points[route.locations[index]],
+                    'arrival': (now + timedelta(minutes=route.times[index])).isoformat(),
+                    'load_weight': round(route.weights[index], 2),
+                }
+                for index, (shipment, kind) in enumerate(stops)
+            ],
+        })
+    return routes
+
+
+def run_route_job(job_id):
+    job = RoutePlanJob.objects.get(pk=job_id)
+    jobs = RoutePlanJob.objects.filter(pk=job_id)
+    now = timezone.now()
+    jobs.update(status='RUNNING', started_at=now, updated_at=now)
+
+    def should_stop():
+        return RoutePlanJob.objects.filter(pk=job_id, cancel_requested=True).exists()
+
+    try:
+        problem, vehicles, points, unroutable = build_problem(
+            now, date_from=job.date_from, date_to=job.date_to, warehouse=job.warehouse
+        )
+        outcome = solve(problem, job.time_budget, workers=settings.ROUTING_WORKERS, should_stop=should_stop)
+    except Exception as e:
+        jobs.update(
+            status='FAILED', error_message=f'Ошибка расчета: {str(e)}',
+            finished_at=timezone.now(), updated_at=timezone.now()
+        )
+        return
+
+    solution = outcome['solution']
+    result = None
+    if solution is not None:
+        routes = describe_routes(problem, solution, vehicles, points, now)
+        result = {
+            'routes': routes,
+            'unassigned': [problem.shipments[shipment][0] for shipment in solution['unassigned']],
+            'unroutable': unroutable,
+            'shipments_total': len(problem.shipments) + len(unroutable),
+            'stops_total': 2 * (len(problem.shipments) - len(solution['unassigned'])),
+            'vehicles_used': len(routes),
+            'distance_km': round(sum(route['distance_km'] for route in routes), 1),
+            'rounds': outcome['rounds'],
+            'seconds': outcome['seconds'],
+        }
+    jobs.update(
+        status='CANCELLED' if outcome['cancelled'] else 'COMPLETED',
+        result=result, finished_at=timezone.now(), updated_at=timezone.now()
+    )
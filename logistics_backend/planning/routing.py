@@ -0,0 +1,346 @@
+"""Маршруты с несколькими остановками и временными окнами.
+
+Модуль не зависит от Django: задача и решение - простые списки, поэтому
+поиск выполняется в отдельных процессах. Данные из базы готовит
+planning.route_jobs."""
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import get_context
+
+PICKUP, DELIVERY = 'PICKUP', 'DELIVERY'
+# Стоимость использования еще одного ТС в км пробега: без нее вставка
+# дает каждой поставке отдельную машину со склада отправления
+VEHICLE_COST_KM = 100.0
+# Длительность одного раунда поиска, с: между раундами процессы обмениваются
+# лучшим решением и проверяется отмена
+ROUND_SECONDS = 0.5
+# Раунд короче не запускается: накладные расходы съедят его целиком
+MIN_ROUND_SECONDS = 0.05
+# Доля поставок, которые снимаются с маршрутов за одну итерацию поиска
+RUIN_SHARE = 0.1
+MAX_RUIN = 30
+INFINITY = float('inf')
+
+
+class Problem:
+    """Поставки (id, вес, объем, точка отправления, точка назначения,
+    самое раннее начало погрузки, крайний срок доставки), ТС (id,
+    грузоподъемность, объем, точка начала, время готовности), матрицы
+    расстояний (км) и времени в пути (мин) между точками. Время - минуты
+    от начала планирования."""
+
+    def __init__(self, shipments, vehicles, km, minutes, service_minutes):
+        self.shipments = shipments
+        self.vehicles = vehicles
+        self.km = km
+        self.minutes = minutes
+        self.service = service_minutes
+
+    def latest_pickup(self, shipment):
+        """Позже этого погрузка не успевает к сроку даже прямым рейсом"""
+        row = self.shipments[shipment]
+        return row[6] - self.service - self.minutes[row[3]][row[4]]
+
+
+class Route:
+    """Маршрут одного ТС: остановки (номер поставки, PICKUP/DELIVERY) и
+    расписание. latest[k] - самое позднее начало обслуживания остановки k,
+    при котором успевают все следующие; по нему вставка проверяется без
+    пересчета хвоста маршрута."""
+
+    def __init__(self, problem, vehicle, stops=()):
+        self.problem = problem
+        self.vehicle = vehicle
+        self.set_stops(list(stops))
+
+    def set_stops(self, stops):
+        self.stops = stops
+        problem = self.problem
+        shipments, km, minutes, service = problem.shipments, problem.km, problem.minutes, problem.service
+        _, _, _, location, departure = problem.vehicles[self.vehicle]
+
+        self.locations, self.earliest, self.times, self.weights, self.volumes = [], [], [], [], []
+        deadlines = []
+        weight = volume = distance = 0.0
+        for shipment, kind in stops:
+            row = shipments[shipment]
+            target = row[3] if kind == PICKUP else row[4]
+            distance += km[location][target]
+            arrival = departure + minutes[location][target]
+            if kind == PICKUP:
+                earliest, deadline = row[5], problem.latest_pickup(shipment)
+                weight, volume = weight + row[1], volume + row[2]
+            else:
+                earliest, deadline = 0, row[6]
+                weight, volume = weight - row[1], volume - row[2]
+            start = max(arrival, earliest)
+            self.locations.append(target)
+            self.earliest.append(earliest)
+            self.times.append(start)
+            self.weights.append(weight)
+            self.volumes.append(volume)
+            deadlines.append(deadline)
+            location, departure = target, start + service
+        self.distance = distance
+
+        self.latest = [0.0] * len(stops)
+        following = INFINITY
+        for index in range(len(stops) - 1, -1, -1):
+            if index + 1 < len(stops):
+                following = self.latest[index + 1] - service - minutes[self.locations[index]][self.locations[index + 1]]
+            self.latest[index] = min(deadlines[index], following)
+
+    def best_insertion(self, shipment):
+        """(прирост км, i, j) лучшей допустимой вставки поставки: погрузка
+        перед остановкой i, разгрузка перед остановкой j >= i. None, если
+        вставить нельзя. Проверка O(n^2) на маршрут: для каждого i время
+        сдвигается вперед до первого нарушения окна или вместимости."""
+        problem = self.problem
+        row = problem.shipments[shipment]
+        _, capacity, capacity_volume, start_location, available = problem.vehicles[self.vehicle]
+        if row[1] > capacity or row[2] > capacity_volume:
+            return None
+
+        km, minutes, service = problem.km, problem.minutes, problem.service
+        origin, destination, weight, volume = row[3], row[4], row[1], row[2]
+        latest_pickup, deadline = problem.latest_pickup(shipment), row[6]
+        locations, latest, count = self.locations, self.latest, len(self.stops)
+
+        best = None
+        for i in range(count + 1):
+            if i:
+                previous, departure = locations[i - 1], self.times[i - 1] + service
+                if self.weights[i - 1] + weight > capacity or self.volumes[i - 1] + volume > capacity_volume:
+                    continue
+            else:
+                previous, departure = start_location, available
+            pickup = max(departure + minutes[previous][origin], row[5])
+            if pickup > latest_pickup:
+                continue
+
+            # Разгрузка сразу после погрузки
+            delivery = pickup + service + minutes[origin][destination]
+            if delivery <= deadline:
+                added = km[previous][origin] + km[origin][destination]
+                if i < count:
+                    feasible = delivery + service + minutes[destination][locations[i]] <= latest[i]
+                    added += km[destination][locations[i]] - km[previous][locations[i]]
+                else:
+                    feasible = True
+                if feasible and (best is None or added < best[0]):
+                    best = (added, i, i)
+
+            if i == count:
+                continue
+            # Разгрузка после одной из следующих остановок: груз едет с ними
+            pickup_added = km[previous][origin] + km[origin][locations[i]] - km[previous][locations[i]]
+            moment = max(pickup + service + minutes[origin][locations[i]], self.earliest[i])
+            k = i
+            while moment <= latest[k]:
+                if self.weights[k] + weight > capacity or self.volumes[k] + volume > capacity_volume:
+                    break
+                delivery = moment + service + minutes[locations[k]][destination]
+                if delivery <= deadline:
+                    added = pickup_added + km[locations[k]][destination]
+                    if k + 1 < count:
+                        feasible = delivery + service + minutes[destination][locations[k + 1]] <= latest[k + 1]
+                        added += km[destination][locations[k + 1]] - km[locations[k]][locations[k + 1]]
+                    else:
+                        feasible = True
+                    if feasible and (best is None or added < best[0]):
+                        best = (added, i, k + 1)
+                if k + 1 == count:
+                    break
+                moment = max(moment + service + minutes[locations[k]][locations[k + 1]], self.earliest[k + 1])
+                k += 1
+        return best
+
+    def insert(self, shipment, i, j):
+        stops = list(self.stops)
+        stops.insert(j, (shipment, DELIVERY))
+        stops.insert(i, (shipment, PICKUP))
+        self.set_stops(stops)
+
+    def remove(self, shipments):
+        self.set_stops([stop for stop in self.stops if stop[0] not in shipments])
+
+
+def insert_best(routes, shipment):
+    """Вставляет поставку в маршрут с наименьшим приростом стоимости.
+    Пустые маршруты ТС с одной точкой начала и вместимостью
+    равноценны, из них проверяется первый."""
+    best = None
+    seen_empty = set()
+    for route in routes:
+        if not route.stops:
+            vehicle = route.problem.vehicles[route.vehicle]
+            key = (vehicle[1], vehicle[2], vehicle[3], vehicle[4])
+            if key in seen_empty:
+                continue
+            seen_empty.add(key)
+        found = route.best_insertion(shipment)
+        if found is None:
+            continue
+        added = found[0] + (0 if route.stops else VEHICLE_COST_KM)
+        if best is None or added < best[0]:
+            best = (added, route, found[1], found[2])
+    if best is None:
+        return False
+    best[1].insert(shipment, best[2], best[3])
+    return True
+
+
+def solution_cost(routes, unassigned):
+    """Сначала число поставок без ТС, затем пробег со стоимостью ТС"""
+    used = [route for route in routes if route.stops]
+    return (len(unassigned), round(sum(route.distance for route in used) + VEHICLE_COST_KM * len(used), 6))
+
+
+def snapshot(routes, unassigned):
+    return {
+        'routes': [route.stops for route in routes],
+        'unassigned': sorted(unassigned),
+        'cost': solution_cost(routes, unassigned),
+    }
+
+
+def construct(problem, should_stop=None, deadline=None):
+    """Начальное решение: поставки по возрастанию срока доставки, каждая -
+    в лучшую позицию среди всех маршрутов. Между вставками проверяются
+    deadline (time.monotonic()) и не чаще раза в ROUND_SECONDS should_stop():
+    после остановки оставшиеся поставки остаются без ТС."""
+    routes = [Route(problem, vehicle) for vehicle in range(len(problem.vehicles))]
+    order = sorted(range(len(problem.shipments)), key=lambda index: problem.shipments[index][6])
+    unassigned = []
+    next_check = time.monotonic() + ROUND_SECONDS
+    for position, shipment in enumerate(order):
+        now = time.monotonic()
+        if deadline is not None and now >= deadline:
+            unassigned.extend(order[position:])
+            break
+        if should_stop and now >= next_check:
+            if should_stop():
+                unassigned.extend(order[position:])
+                break
+            next_check = now + ROUND_SECONDS
+        if not insert_best(routes, shipment):
+            unassigned.append(shipment)
+    return snapshot(routes, unassigned)
+
+
+def improve(problem, solution, seed, seconds):
+    """Локальный поиск ruin and recreate: с маршрутов снимается случайная
+    группа поставок и вставляется заново в случайном порядке. Изменение
+    принимается, если стоимость не выросла. Возвращает лучшее решение."""
+    rng = random.Random(seed)
+    routes = [Route(problem, vehicle, stops) for vehicle, stops in enumerate(solution['routes'])]
+    unassigned = list(solution['unassigned'])
+    current = best = solution['cost']
+    best_solution = solution
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        assigned = [stop[0] for route in routes for stop in route.stops if stop[1] == PICKUP]
+        if not assigned and not unassigned:
+            break
+        removed = set(rng.sample(assigned, min(len(assigned), rng.randint(1, max(1, min(MAX_RUIN, int(len(assigned) * RUIN_SHARE)))))))
+        before = [route.stops for route in routes]
+        touched = [route for route in routes if any(stop[0] in removed for stop in route.stops)]
+        for route in touched:
+            route.remove(removed)
+
+        pending = list(removed) + unassigned
+        rng.shuffle(pending)
+        left = [shipment for shipment in pending if not insert_best(routes, shipment)]
+
+        cost = solution_cost(routes, left)
+        if cost <= current:
+            current, unassigned = cost, left
+            if cost < best:
+                best, best_solution = cost, snapshot(routes, left)
+        else:
+            for route, stops in zip(routes, before):
+                if route.stops is not stops:
+                    route.set_stops(stops)
+    return best_solution
+
+
+_worker_problem = None
+
+
+def _init_worker(problem):
+    global _worker_problem
+    _worker_problem = problem
+
+
+def _improve_in_worker(solution, seed, until):
+    # Конец раунда передается моментом time.monotonic(), а не длительностью:
+    # процесс, запустившийся с опозданием, не продлевает раунд
+    return improve(_worker_problem, solution, seed, until - time.monotonic())
+
+
+def solve(problem, time_budget, workers=1, should_stop=None, seed=0):
+    """Строит решение и улучшает его раундами до истечения time_budget
+    секунд. В каждом раунде workers процессов ведут поиск от текущего
+    лучшего решения с разными seed, лучшее из них становится общим.
+    Запуск процессов и построение начального решения входят в time_budget.
+    should_stop() проверяется при построении и между раундами (кооперативная
+    отмена): после отмены возвращается лучшее найденное к этому моменту решение."""
+    started = time.monotonic()
+    deadline = started + time_budget
+    cancelled = bool(should_stop and should_stop())
+    rounds = 0
+
+    pool = None
+    if workers > 1 and not cancelled:
+        # spawn: дочерние процессы не наследуют соединения с базой и потоки.
+        # Процессы запускаются сразу и стартуют, пока строится начальное решение
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=get_context('spawn'),
+            initializer=_init_worker, initargs=(problem,)
+        )
+        for _ in range(workers):
+            pool.submit(int)
+    try:
+        solution = None
+        if not cancelled:
+            stops = []
+
+            def stop():
+                stops.append(should_stop())
+                return stops[-1]
+
+            solution = construct(problem, should_stop=stop if should_stop else None, deadline=deadline)
+            cancelled = any(stops)
+        while not cancelled and deadline - time.monotonic() > MIN_ROUND_SECONDS:
+            if should_stop and should_stop():
+                cancelled = True
+                break
+            until = min(time.monotonic() + ROUND_SECONDS, deadline)
+            seeds = [seed + rounds * workers + worker for worker in range(workers)]
+            if pool:
+                futures = [pool.submit(_improve_in_worker, solution, worker_seed, until) for worker_seed in seeds]
+                # Процессы, не успевшие к концу раунда, не задерживают поиск
+                done, late = wait(futures, timeout=max(0, until - time.monotonic()) + MIN_ROUND_SECONDS)
+                for future in late:
+                    future.cancel()
+                results = [future.result() for future in done]
+            else:
+                results = [improve(problem, solution, seeds[0], until - time.monotonic())]
+            if not results:
+                continue
+            candidate = min(results, key=lambda result: result['cost'])
+            if candidate['cost'] < solution['cost']:
+                solution = candidate
+            rounds += 1
+    finally:
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    return {
+        'solution': solution,
+        'rounds': rounds,
+        'cancelled': cancelled,
+        'seconds': round(time.monotonic() - started, 3),
+    }
@@ -0,0 +1,34 @@
+from rest_framework import serializers
+
+from cargo.serializers import ShipmentScopeSerializer
+from .models import RoutePlanJob
+from .consolidation import DEFAULT_WINDOW_HOURS
+
+
+class DispatchPreviewSerializer(ShipmentScopeSerializer):
+    """Окно распределения: date_from, date_to и склад отправления или назначения"""
+
+
+class DispatchCommitSerializer(serializers.Serializer):
+    plan_id = serializers.RegexField(r'^[0-9a-f]{32}$')
+
+
+class ConsolidationPreviewSerializer(ShipmentScopeSerializer):
+    """Окно как у распределения и окно отправления одного рейса в часах"""
+    window_hours = serializers.IntegerField(required=False, min_value=1, max_value=72, default=DEFAULT_WINDOW_HOURS)
+
+
+class RoutePlanRequestSerializer(ShipmentScopeSerializer):
+    """Окно как у распределения и время на расчет в секундах"""
+    time_budget = serializers.IntegerField(required=False, min_value=1, max_value=300, default=30)
+
+
+class RoutePlanJobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = RoutePlanJob
+        fields = [
+            'id', 'status', 'date_from', 'date_to', 'warehouse', 'time_budget', 'cancel_requested',
+            'result', 'error_message', 'created_by', 'started_at', 'finished_at', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
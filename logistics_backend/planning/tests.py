@@ -1,3 +1,477 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cargo.models import CargoType, Shipment
+from core.models import User
+from core.testing import PerformanceTestCase
+from vehicles.models import Driver, Vehicle
+from warehouses.models import Warehouse
+from .consolidation import consolidate
+from .dispatcher import (
+    PRIORITY_BONUS, cost_matrix, match, plan_pairs, shipment_arrays, sparse_match, vehicle_arrays
+)
+from .management.commands.benchmark_routing import generate_problem
+from .models import RoutePlanJob, SavedPlan
+from .plans import batches
+from .route_jobs import run_route_job
+from .routing import DELIVERY, PICKUP, Problem, Route, construct, improve, solve
+
+
+class MatchTests(SimpleTestCase):
+
+    def solve(self, shipments, vehicles):
+        return sorted(
+            (shipments[row][0], vehicles[column][0])
+            for row, column in match(cost_matrix(shipments, vehicles))
+        )
+
+    def test_capacity_and_volume_are_respected(self):
+        shipments = [(1, 15, 10, 1, 'MEDIUM'), (2, 5, 70, 1, 'MEDIUM')]
+        vehicles = [(10, 10, 80, 1, 100), (20, 20, 20, 1, 200)]
+        self.assertEqual(self.solve(shipments, vehicles), [(1, 20), (2, 10)])
+
+    def test_infeasible_pairs_are_dropped(self):
+        self.assertEqual(self.solve([(1, 30, 10, 1, 'MEDIUM')], [(10, 20, 80, 1, 100)]), [])
+
+    def test_prefers_vehicle_at_origin(self):
+        shipments = [(1, 5, 10, 1, 'MEDIUM'), (2, 5, 10, 2, 'MEDIUM')]
+        vehicles = [(10, 20, 80, 2, 100), (20, 20, 80, 1, 200)]
+        self.assertEqual(self.solve(shipments, vehicles), [(1, 20), (2, 10)])
+
+    def test_prefers_tighter_vehicle(self):
+        shipments = [(1, 5, 10, 1, 'MEDIUM')]
+        vehicles = [(10, 25, 80, 1, 100), (20, 6, 80, 1, 200)]
+        self.assertEqual(self.solve(shipments, vehicles), [(1, 20)])
+
+    def test_urgent_shipment_gets_scarce_vehicle(self):
+        shipments = [(1, 5, 10, 1, 'LOW'), (2, 5, 10, 2, 'URGENT')]
+        vehicles = [(10, 20, 80, 1, 100)]
+        self.assertEqual(self.solve(shipments, vehicles), [(2, 10)])
+
+    def test_empty_problem(self):
+        self.assertEqual(self.solve([], [(10, 20, 80, 1, 100)]), [])
+        self.assertEqual(self.solve([(1, 5, 10, 1, 'LOW')], []), [])
+
+    def sparse_solve(self, shipments, vehicles):
+        return sparse_match(shipment_arrays(shipments), vehicle_arrays(vehicles))
+
+    def test_sparse_matches_dense_without_pruning(self):
+        priorities = list(PRIORITY_BONUS)
+        shipments = [(pk, pk % 7 + 1, 10, pk % 3, priorities[pk % 4]) for pk in range(30)]
+        vehicles = [(pk, pk % 5 * 5 + 10, 80, pk % 4, pk) for pk in range(40)]
+        cost = cost_matrix(shipments, vehicles)
+
+        with mock.patch('planning.dispatcher.CANDIDATES', 40):
+            pairs = self.sparse_solve(shipments, vehicles)
+        self.assertEqual(len(pairs), 30)
+        self.assertAlmostEqual(
+            sum(cost[row, column] for row, column in pairs),
+            sum(cost[row, column] for row, column in match(cost))
+        )
+
+    def test_sparse_rematches_pruned_leftovers(self):
+        # Каждая поставка видит одно и то же самое дешевое ТС, остальные
+        # находятся повторным сопоставлением
+        shipments = [(pk, 5, 10, 1, 'MEDIUM') for pk in range(5)]
+        vehicles = [(pk, 6 + pk, 80, 2, pk) for pk in range(5)]
+        with mock.patch('planning.dispatcher.CANDIDATES', 1):
+            pairs = self.sparse_solve(shipments, vehicles)
+        self.assertEqual(sorted(column for _, column in pairs), [0, 1, 2, 3, 4])
+
+    def test_large_problem_is_solved_sparse(self):
+        shipments = [(1, 5, 10, 1, 'LOW'), (2, 5, 10, 2, 'URGENT')]
+        vehicles = [(10, 20, 80, 1, 100)]
+        with mock.patch('planning.dispatcher.DENSE_CELLS', 0), \
+                mock.patch('planning.dispatcher.match', side_effect=AssertionError):
+            self.assertEqual(plan_pairs(shipments, vehicles), [(1, 0)])
+
+
+class ConsolidationTests(SimpleTestCase):
+    departure = datetime(2026, 1, 1, 8)
+
+    def shipment(self, pk, weight, volume=10, hazard_class=None, lane=(1, 2), hours=0):
+        return (pk, weight, volume, *lane, self.departure + timedelta(hours=hours), hazard_class, 'MEDIUM')
+
+    def solve(self, shipments, vehicles, window_hours=4):
+        fleet, loads, unassigned = consolidate(shipments, vehicles, timedelta(hours=window_hours))
+        return sorted(
+            (vehicles[load['vehicle']][0], sorted(row[0] for row in load['shipments'])) for load in loads
+        ), unassigned
+
+    def test_lane_shares_smallest_fitting_vehicle(self):
+        vehicles = [(10, 25, 90, 1, 100), (20, 20, 80, 1, 200), (30, 10, 80, 1, 300)]
+        loads, unassigned = self.solve([self.shipment(pk, 5) for pk in range(1, 4)], vehicles)
+        self.assertEqual(loads, [(20, [1, 2, 3])])
+        self.assertEqual(unassigned, [])
+
+    def test_volume_limits_load(self):
+        vehicles = [(10, 20, 40, 1, 100), (20, 20, 40, 1, 200)]
+        loads, _ = self.solve([self.shipment(pk, 1, volume=30) for pk in range(1, 3)], vehicles)
+        self.assertEqual(len(loads), 2)
+
+    def test_hazard_classes_are_segregated(self):
+        shipments = [self.shipment(1, 2, hazard_class=3), self.shipment(2, 2, hazard_class=8), self.shipment(3, 2)]
+        vehicles = [(10, 20, 80, 1, 100), (20, 20, 80, 1, 200)]
+        loads, _ = self.solve(shipments, vehicles)
+        self.assertEqual(len(loads), 2)
+        self.assertNotIn([1, 2], [ids[:2] for _, ids in loads])
+        self.assertEqual(sum(len(ids) for _, ids in loads), 3)
+
+    def test_lanes_and_windows_are_separate(self):
+        shipments = [self.shipment(1, 2), self.shipment(2, 2, hours=10), self.shipment(3, 2, lane=(1, 3))]
+        vehicles = [(pk, 20, 80, 1, pk) for pk in range(1, 5)]
+        loads, _ = self.solve(shipments, vehicles)
+        self.assertEqual(sorted(ids for _, ids in loads), [[1], [2], [3]])
+        loads, _ = self.solve(shipments, vehicles, window_hours=12)
+        self.assertEqual(sorted(ids for _, ids in loads), [[1, 2], [3]])
+
+    def test_oversized_shipment_is_unassigned(self):
+        loads, unassigned = self.solve([self.shipment(1, 30), self.shipment(2, 5)], [(10, 20, 80, 1, 100)])
+        self.assertEqual(loads, [(10, [2])])
+        self.assertEqual(unassigned, [1])
+
+    def test_batches_keep_vehicle_loads_together(self):
+        assignments = [{'vehicle_id': vehicle_id} for vehicle_id in [1, 1, 2, 2, 2, 3]]
+        with mock.patch('planning.plans.MAX_BATCH_ASSIGNMENTS', 4):
+            self.assertEqual([(start, len(batch)) for start, batch in batches(assignments)], [(0, 2), (2, 4)])
+
+
+class RoutingTests(SimpleTestCase):
+    # Точки на прямой через 60 км: час пути при 60 км/ч
+    km = [[abs(a - b) * 60.0 for b in range(3)] for a in range(3)]
+
+    def problem(self, shipments, vehicles):
+        return Problem(shipments, vehicles, self.km, self.km, service_minutes=0)
+
+    def assertFeasible(self, problem, solution):
+        assigned = []
+        for vehicle, stops in enumerate(solution['routes']):
+            route = Route(problem, vehicle, stops)
+            seen = set()
+            for index, (shipment, kind) in enumerate(stops):
+                row = problem.shipments[shipment]
+                if kind == PICKUP:
+                    seen.add(shipment)
+                    self.assertGreaterEqual(route.times[index], row[5])
+                else:
+                    self.assertIn(shipment, seen)
+                    self.assertLessEqual(route.times[index], row[6] + 1e-6)
+                self.assertLessEqual(route.weights[index], problem.vehicles[vehicle][1] + 1e-6)
+            assigned.extend(seen)
+        self.assertEqual(
+            sorted(assigned + solution['unassigned']), list(range(len(problem.shipments)))
+        )
+
+    def test_chains_stops_on_one_vehicle(self):
+        problem = self.problem(
+            [(1, 5, 10, 0, 1, 0, 600), (2, 5, 10, 1, 2, 0, 600)], [(10, 20, 80, 0, 0), (20, 20, 80, 2, 0)]
+        )
+        solution = construct(problem)
+        self.assertEqual(solution['routes'][1], [])
+        self.assertEqual(Route(problem, 0, solution['routes'][0]).locations, [0, 1, 1, 2])
+        self.assertFeasible(problem, solution)
+
+    def test_time_window_and_capacity(self):
+        problem = self.problem(
+            [(1, 15, 10, 0, 2, 0, 90), (2, 15, 10, 0, 1, 0, 600), (3, 15, 10, 0, 1, 0, 600)],
+            [(10, 20, 80, 0, 0)]
+        )
+        solution = construct(problem)
+        # Два часа пути не укладываются в 90 минут; два груза по 15 т не
+        # помещаются вместе, второй забирается после возврата
+        self.assertEqual(solution['unassigned'], [0])
+        self.assertEqual(len(solution['routes'][0]), 4)
+        self.assertFeasible(problem, solution)
+
+    def test_search_keeps_solution_feasible(self):
+        problem = generate_problem(60, 15, 12, seed=1)
+        initial = construct(problem)
+        solution = improve(problem, initial, seed=1, seconds=0.5)
+        self.assertLessEqual(solution['cost'], initial['cost'])
+        self.assertFeasible(problem, solution)
+
+    def test_time_budget_and_cancellation(self):
+        problem = generate_problem(60, 15, 12, seed=2)
+        outcome = solve(problem, 0.5)
+        self.assertLess(outcome['seconds'], 1.5)
+        self.assertGreater(outcome['rounds'], 0)
+
+        checks = []
+        outcome = solve(problem, 60, should_stop=lambda: checks.append(1) or len(checks) > 2)
+        self.assertTrue(outcome['cancelled'])
+        self.assertEqual(outcome['rounds'], 1)
+        self.assertFeasible(problem, outcome['solution'])
+
+    def test_construct_stops_between_insertions(self):
+        problem = generate_problem(60, 15, 12, seed=2)
+        solution = construct(problem, deadline=time.monotonic())
+        self.assertEqual(len(solution['unassigned']), len(problem.shipments))
+        with mock.patch('planning.routing.ROUND_SECONDS', 0):
+            checks = []
+            solution = construct(problem, should_stop=lambda: checks.append(1) or len(checks) > 5)
+        self.assertEqual(len(checks), 6)
+        self.assertGreaterEqual(len(solution['unassigned']), len(problem.shipments) - 5)
+        self.assertFeasible(problem, solution)
+
+    def test_worker_processes(self):
+        # Запуск spawn-процессов входит в бюджет времени
+        problem = generate_problem(40, 10, 10, seed=3)
+        outcome = solve(problem, 3, workers=2)
+        self.assertLess(outcome['seconds'], 3.5)
+        self.assertGreater(outcome['rounds'], 0)
+        self.assertFeasible(problem, outcome['solution'])
+
+
+@override_settings(ROUTING_RUN_INLINE=True, ROUTING_WORKERS=1)
+class RoutePlanApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        cls.warehouses = [
+            Warehouse.objects.create(
+                name=name, address=name, capacity=1000, latitude=latitude, longitude=longitude
+            )
+            for name, latitude, longitude in [
+                ('Москва', '55.755826', '37.617300'), ('Тверь', '56.858721', '35.917596'),
+                ('Санкт-Петербург', '59.938630', '30.314130'),
+            ]
+        ]
+        vehicle = Vehicle.objects.create(
+            license_plate='А001ВС77', model='КАМАЗ 65115', capacity=20, volume=80,
+            current_warehouse=cls.warehouses[0]
+        )
+        Driver.objects.create(
+            user=User.objects.create_user('driver', password='x', role='DRIVER'),
+            license_number='77 00 000001', license_category='C', license_expiry='2030-01-01',
+            phone_number='79990000000', vehicle=vehicle
+        )
+        cargo_type = CargoType.objects.create(name='Паллеты')
+        departure = timezone.now() + timedelta(hours=1)
+        cls.shipments = [
+            Shipment.objects.create(
+                cargo_type=cargo_type, weight=5, volume=20,
+                origin_warehouse=cls.warehouses[index], destination_warehouse=cls.warehouses[index + 1],
+                planned_departure=departure, planned_arrival=departure + timedelta(hours=24),
+                created_by=cls.manager
+            )
+            for index in range(2)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+
+    def test_create_and_cancel(self):
+        response = self.client.post('/api/planning/routes/', {'time_budget': 1}, format='json')
+        self.assertEqual(response.status_code, 202, response.data)
+        self.assertEqual(response.data['status'], 'COMPLETED')
+        routes = response.data['result']['routes']
+        self.assertEqual(len(routes), 1)
+        self.assertEqual(
+            [stop['warehouse_id'] for stop in routes[0]['stops']],
+            [self.warehouses[0].pk, self.warehouses[1].pk, self.warehouses[1].pk, self.warehouses[2].pk]
+        )
+        self.assertEqual(
+            [stop['action'] for stop in routes[0]['stops'] if stop['shipment_id'] == self.shipments[1].pk],
+            ['PICKUP', 'DELIVERY']
+        )
+
+        response = self.client.post(f"/api/planning/routes/{response.data['id']}/cancel/")
+        self.assertEqual(response.status_code, 409)
+
+    def test_cancelled_before_start(self):
+        job = RoutePlanJob.objects.create(time_budget=60, created_by=self.manager)
+        response = self.client.post(f'/api/planning/routes/{job.pk}/cancel/')
+        self.assertEqual(response.status_code, 200)
+        run_route_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'CANCELLED')
+        self.assertIsNone(job.result)
+
+
+class DispatchApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        warehouses = [
+            Warehouse.objects.create(name=f'Склад {index}', address=f'Адрес {index}', capacity=1000)
+            for index in range(3)
+        ]
+        cargo_type = CargoType.objects.create(name='Щебень')
+        for index in range(2):
+            vehicle = Vehicle.objects.create(
+                license_plate=f'А{index:03d}ВС77', model='КАМАЗ 65115', capacity=20, volume=80,
+                current_warehouse=warehouses[index]
+            )
+            Driver.objects.create(
+                user=User.objects.create_user(f'driver{index}', password='x', role='DRIVER'),
+                license_number=f'77 00 00000{index}', license_category='C', license_expiry='2030-01-01',
+                phone_number='79990000000', vehicle=vehicle
+            )
+        # ТС без водителя в распределении не участвует
+        Vehicle.objects.create(license_plate='В456ОР50', model='Volvo FH', capacity=20, volume=80)
+
+        departure = timezone.now() + timedelta(days=1)
+        cls.shipments = [
+            Shipment.objects.create(
+                cargo_type=cargo_type, weight=weight, volume=10,
+                origin_warehouse=warehouses[index % 2], destination_warehouse=warehouses[2],
+                planned_departure=departure, planned_arrival=departure + timedelta(hours=6),
+                created_by=cls.manager
+            )
+            for index, weight in enumerate([5, 5, 50])
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+
+    def preview(self):
+        response = self.client.post('/api/planning/dispatch/preview/', {}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_preview_does_not_assign(self):
+        plan = self.preview()
+        self.assertEqual(
+            [(item['shipment_id'], item['same_warehouse']) for item in plan['assignments']],
+            [(self.shipments[0].pk, True), (self.shipments[1].pk, True)]
+        )
+        self.assertEqual(plan['unassigned'], [self.shipments[2].pk])
+        self.assertFalse(Shipment.objects.filter(status='ASSIGNED').exists())
+
+    def test_commit(self):
+        plan = self.preview()
+        response = self.client.post('/api/planning/dispatch/commit/', {'plan_id': plan['plan_id']})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['assigned'], 2)
+        for item in plan['assignments']:
+            shipment = Shipment.objects.get(pk=item['shipment_id'])
+            self.assertEqual(shipment.status, 'ASSIGNED')
+            self.assertEqual(shipment.assigned_vehicle_id, item['vehicle_id'])
+        self.assertFalse(Vehicle.objects.filter(status='AVAILABLE', assigned_drivers__isnull=False).exists())
+
+        # План применяется один раз
+        response = self.client.post('/api/planning/dispatch/commit/', {'plan_id': plan['plan_id']})
+        self.assertEqual(response.status_code, 404)
+
+    def test_plan_does_not_depend_on_cache(self):
+        plan = self.preview()
+        # Другой процесс с собственным кэшем
+        cache.clear()
+        response = self.client.post('/api/planning/dispatch/commit/', {'plan_id': plan['plan_id']})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertFalse(SavedPlan.objects.exists())
+
+    def test_expired_or_other_kind_plan_is_not_found(self):
+        plan = self.preview()
+        response = self.client.post('/api/planning/consolidation/commit/', {'plan_id': plan['plan_id']})
+        self.assertEqual(response.status_code, 404)
+
+        SavedPlan.objects.update(expires_at=timezone.now())
+        response = self.client.post('/api/planning/dispatch/commit/', {'plan_id': plan['plan_id']})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Shipment.objects.filter(status='ASSIGNED').exists())
+
+        # Истекшие планы удаляются при сохранении нового
+        self.preview()
+        self.assertEqual(SavedPlan.objects.count(), 1)
+
+    def test_stale_plan_conflicts(self):
+        plan = self.preview()
+        Vehicle.objects.filter(pk=plan['assignments'][1]['vehicle_id']).update(status='MAINTENANCE')
+
+        response = self.client.post('/api/planning/dispatch/commit/', {'plan_id': plan['plan_id']})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([conflict['index'] for conflict in response.data['conflicts']], [1])
+        self.assertFalse(Shipment.objects.filter(status='ASSIGNED').exists())
+
+
+class ConsolidationApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        origin, destination = [
+            Warehouse.objects.create(name=f'Склад {index}', address=f'Адрес {index}', capacity=1000)
+            for index in range(2)
+        ]
+        cls.vehicle = Vehicle.objects.create(
+            license_plate='А001ВС77', model='КАМАЗ 65115', capacity=20, volume=80, current_warehouse=origin
+        )
+        cls.driver = Driver.objects.create(
+            user=User.objects.create_user('driver', password='x', role='DRIVER'),
+            license_number='77 00 000001', license_category='C', license_expiry='2030-01-01',
+            phone_number='79990000000', vehicle=cls.vehicle
+        )
+        cargo_type = CargoType.objects.create(name='Паллеты')
+        departure = timezone.now() + timedelta(days=1)
+        cls.shipments = [
+            Shipment.objects.create(
+                cargo_type=cargo_type, weight=5, volume=20, origin_warehouse=origin, destination_warehouse=destination,
+                planned_departure=departure + timedelta(hours=index), planned_arrival=departure + timedelta(hours=8),
+                created_by=cls.manager
+            )
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+
+    def test_preview_and_commit(self):
+        response = self.client.post('/api/planning/consolidation/preview/', {}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data['loads']), 1)
+        load = response.data['loads'][0]
+        self.assertEqual(load['shipment_ids'], [shipment.pk for shipment in self.shipments])
+        self.assertEqual(load['weight_utilization'], 0.75)
+        self.assertEqual(response.data['vehicles_saved'], 2)
+
+        # План консолидации не подтверждается как план распределения
+        plan_id = response.data['plan_id']
+        self.assertEqual(self.client.post('/api/planning/dispatch/commit/', {'plan_id': plan_id}).status_code, 404)
+
+        response = self.client.post('/api/planning/consolidation/commit/', {'plan_id': plan_id})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['assigned'], 3)
+        self.assertEqual(
+            set(Shipment.objects.values_list('status', 'assigned_vehicle_id', 'assigned_driver_id')),
+            {('ASSIGNED', self.vehicle.pk, self.driver.pk)}
+        )
+        self.assertEqual(Vehicle.objects.get(pk=self.vehicle.pk).status, 'IN_USE')
+
+
+class DispatchPerformanceTests(PerformanceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_preview_and_commit(self):
+        response = self.assertWithinBudget('planning-dispatch-preview', 'post', '/api/planning/dispatch/preview/')
+        self.assertTrue(response.data['assignments'])
+        self.assertWithinBudget(
+            'planning-dispatch-commit', 'post', '/api/planning/dispatch/commit/',
+            {'plan_id': response.data['plan_id']}
+        )
+
+    def test_consolidation_preview_and_commit(self):
+        response = self.assertWithinBudget(
+            'planning-consolidation-preview', 'post', '/api/planning/consolidation/preview/'
+        )
+        self.assertTrue(response.data['loads'])
+        self.assertWithinBudget(
+            'planning-consolidation-commit', 'post', '/api/planning/consolidation/commit/',
+            {'plan_id': response.data['plan_id']}
+        )
@@ -0,0 +1,12 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import ConsolidationViewSet, DispatchViewSet, RoutePlanJobViewSet
+
+router = DefaultRouter()
+router.register(r'dispatch', DispatchViewSet, basename='dispatch')
+router.register(r'consolidation', ConsolidationViewSet, basename='consolidation')
+router.register(r'routes', RoutePlanJobViewSet, basename='route-plans')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -1,3 +1,115 @@
-from django.shortcuts import render
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
-# Create your views here.
+from vehicles.assignment import AssignmentConflict
+from . import consolidation
+from .dispatcher import build_plan
+from .models import RoutePlanJob
+from .plans import commit_plan, save_plan
+from .route_jobs import submit_route_job
+from .serializers import (
+    ConsolidationPreviewSerializer, DispatchCommitSerializer, DispatchPreviewSerializer, RoutePlanJobSerializer,
+    RoutePlanRequestSerializer
+)
+
+
+class DispatchViewSet(viewsets.ViewSet):
+    """Автоматическое распределение PLANNED поставок по свободным ТС"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    @action(detail=False, methods=['post'])
+    def preview(self, request):
+        """Рассчитывает план и сохраняет его на DISPATCH_PLAN_TTL секунд;
+        ничего не назначает"""
+        serializer = DispatchPreviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        plan = build_plan(**serializer.validated_data)
+        return Response({'plan_id': save_plan('dispatch', plan['assignments']), **plan})
+
+    @action(detail=False, methods=['post'])
+    def commit(self, request):
+        """Применяет план из preview целиком; 409, если часть поставок
+        или ТС уже назначили, 404 - если план истек"""
+        serializer = DispatchCommitSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            assigned = commit_plan('dispatch', serializer.validated_data['plan_id'], request.user)
+        except AssignmentConflict as e:
+            return Response({'conflicts': e.conflicts}, status=status.HTTP_409_CONFLICT)
+
+        if assigned is None:
+            return Response(
+                {'error': 'План не найден или истек, рассчитайте его заново'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({'assigned': assigned})
+
+
+class ConsolidationViewSet(viewsets.ViewSet):
+    """Консолидация: несколько PLANNED поставок одного направления и окна
+    отправления на одно ТС"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    @action(detail=False, methods=['post'])
+    def preview(self, request):
+        """Рассчитывает рейсы и сохраняет план на DISPATCH_PLAN_TTL секунд;
+        ничего не назначает"""
+        serializer = ConsolidationPreviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        plan = consolidation.build_plan(**serializer.validated_data)
+        plan_id = save_plan('consolidation', plan.pop('assignments'), shared_vehicles=True)
+        return Response({'plan_id': plan_id, **plan})
+
+    @action(detail=False, methods=['post'])
+    def commit(self, request):
+        """Применяет план из preview целиком; 409, если часть поставок
+        или ТС уже назначили, 404 - если план истек"""
+        serializer = DispatchCommitSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            assigned = commit_plan('consolidation', serializer.validated_data['plan_id'], request.user)
+        except AssignmentConflict as e:
+            return Response({'conflicts': e.conflicts}, status=status.HTTP_409_CONFLICT)
+
+        if assigned is None:
+            return Response(
+                {'error': 'План не найден или истек, рассчитайте его заново'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({'assigned': assigned})
+
+
+class RoutePlanJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Расчеты маршрутов с несколькими остановками: POST ставит расчет в
+    очередь, результат и статус - по /api/planning/routes/<id>/"""
+    queryset = RoutePlanJob.objects.all()
+    serializer_class = RoutePlanJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def create(self, request):
+        serializer = RoutePlanRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        job = RoutePlanJob.objects.create(created_by=request.user, **serializer.validated_data)
+        submit_route_job(job)
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Просит остановить расчет: он завершится после текущего раунда
+        поиска со статусом CANCELLED и лучшими найденными маршрутами"""
+        job = self.get_object()
+        if job.status not in ('PENDING', 'RUNNING'):
+            return Response(
+                {'error': 'Расчет уже завершен'},
+                status=status.HTTP_409_CONFLICT
+            )
+        RoutePlanJob.objects.filter(pk=job.pk).update(cancel_requested=True)
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data)
@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import SearchDocument
+
+@admin.register(SearchDocument)
+class SearchDocumentAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'object_id', 'body')
+    list_filter = ('kind',)
+    readonly_fields = ('kind', 'object_id', 'body')
@@ -0,0 +1,104 @@
+from django.db import transaction
+
+from cargo.models import CargoType, Shipment
+from vehicles.models import Vehicle
+from warehouses.models import Warehouse
+from .models import SearchDocument
+from .morphology import index_terms
+
+BATCH_SIZE = 2000
+
+
+class DocumentType:
+    """Какие поля модели попадают в поисковый документ. Поля читаются через
+    values_list, поэтому связанные поля (cargo_type__name) берутся тем же
+    запросом, без создания объектов моделей."""
+
+    def __init__(self, kind, model, fields):
+        self.kind = kind
+        self.model = model
+        self.fields = fields
+
+    def depends_on(self, update_fields):
+        """Меняет ли сохранение update_fields текст документа"""
+        roots = {field.split('__')[0] for field in self.fields}
+        return not roots.isdisjoint(update_fields)
+
+    def build_body(self, values):
+        return ' '.join(term for value in values for term in index_terms(value))
+
+    def rows(self, pks=None):
+        queryset = self.model.objects.order_by('pk')
+        if pks is not None:
+            queryset = queryset.filter(pk__in=pks)
+        return queryset.values_list('pk', *self.fields).iterator(chunk_size=BATCH_SIZE)
+
+
+DOCUMENT_TYPES = {
+    document_type.kind: document_type for document_type in [
+        DocumentType('cargo_type', CargoType, ['name', 'description']),
+        DocumentType('shipment', Shipment, ['cargo_type__name', 'description', 'special_instructions']),
+        DocumentType('vehicle', Vehicle, ['license_plate', 'model', 'cargo_recipient']),
+        DocumentType('warehouse', Warehouse, ['name', 'address']),
+    ]
+}
+KIND_BY_MODEL = {document_type.model: kind for kind, document_type in DOCUMENT_TYPES.items()}
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_documents(kind, rows):
+    document_type = DOCUMENT_TYPES[kind]
+    indexed = 0
+    for chunk in chunked(rows, BATCH_SIZE):
+        SearchDocument.objects.bulk_create(
+            [
+                SearchDocument(kind=kind, object_id=row[0], body=document_type.build_body(row[1:]))
+                for row in chunk
+            ],
+            update_conflicts=True,
+            unique_fields=['kind', 'object_id'],
+            update_fields=['body']
+        )
+        indexed += len(chunk)
+    return indexed
+
+
+def index_objects(kind, pks):
+    """Переиндексирует объекты по id; документы удаленных объектов удаляются"""
+    pks = set(pks)
+    found = set()
+    for chunk in chunked(sorted(pks), BATCH_SIZE):
+        rows = list(DOCUMENT_TYPES[kind].rows(chunk))
+        found.update(row[0] for row in rows)
+        write_documents(kind, rows)
+    remove_objects(kind, pks - found)
+
+
+def remove_objects(kind, pks):
+    for chunk in chunked(sorted(pks), BATCH_SIZE):
+        SearchDocument.objects.filter(kind=kind, object_id__in=chunk).delete()
+
+
+@transaction.atomic
+def rebuild_kind(kind):
+    """Полная переиндексация одного типа объектов"""
+    model = DOCUMENT_TYPES[kind].model
+    indexed = write_documents(kind, DOCUMENT_TYPES[kind].rows())
+    SearchDocument.objects.filter(kind=kind).exclude(
+        object_id__in=model.objects.values('pk')
+    ).delete()
+    return indexed
+
+
+def rebuild_index():
+    return {kind: rebuild_kind(kind) for kind in DOCUMENT_TYPES}
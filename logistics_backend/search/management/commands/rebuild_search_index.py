@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from search.documents import DOCUMENT_TYPES, rebuild_kind
+
+
+class Command(BaseCommand):
+    help = 'Полностью перестраивает поисковый индекс типов груза, поставок, транспорта и складов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(DOCUMENT_TYPES), action='append')
+
+    def handle(self, *args, **options):
+        for kind in options['kind'] or DOCUMENT_TYPES:
+            started = time.perf_counter()
+            indexed = rebuild_kind(kind)
+            self.stdout.write(f'{kind}: {indexed} документов за {time.perf_counter() - started:.1f} с')
@@ -0,0 +1,28 @@
+# Generated by Django 5.1 on 2026-10-17 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20, verbose_name='Тип объекта')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='ID объекта')),
+                ('body', models.TextField(verbose_name='Текст')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ',
+                'verbose_name_plural': 'Поисковые документы',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='search_document_unique_object')],
+            },
+        ),
+    ]
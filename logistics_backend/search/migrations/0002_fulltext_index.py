@@ -0,0 +1,91 @@
+from django.db import migrations
+
+# Для каждого типа документов в SQLite - своя таблица FTS5 с внешним
+# содержимым (search_searchdocument), синхронизируемая триггерами
+KINDS = ['shipment', 'vehicle', 'warehouse']
+
+
+def sqlite_create(kind):
+    table = f'search_{kind}_fts'
+    return [
+        f"""
+        CREATE VIRTUAL TABLE {table} USING fts5(
+            body,
+            content='search_searchdocument',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='1 2 3'
+        )
+        """,
+        f"""
+        CREATE TRIGGER {table}_ai AFTER INSERT ON search_searchdocument
+        WHEN new.kind = '{kind}' BEGIN
+            INSERT INTO {table}(rowid, body) VALUES (new.id, new.body);
+        END
+        """,
+        f"""
+        CREATE TRIGGER {table}_ad AFTER DELETE ON search_searchdocument
+        WHEN old.kind = '{kind}' BEGIN
+            INSERT INTO {table}({table}, rowid, body) VALUES ('delete', old.id, old.body);
+        END
+        """,
+        f"""
+        CREATE TRIGGER {table}_au AFTER UPDATE ON search_searchdocument
+        WHEN old.kind = '{kind}' BEGIN
+            INSERT INTO {table}({table}, rowid, body) VALUES ('delete', old.id, old.body);
+            INSERT INTO {table}(rowid, body) VALUES (new.id, new.body);
+        END
+        """,
+        f"""
+        INSERT INTO {table}(rowid, body)
+        SELECT id, body FROM search_searchdocument WHERE kind = '{kind}'
+        """,
+    ]
+
+
+def sqlite_drop(kind):
+    table = f'search_{kind}_fts'
+    return [
+        f'DROP TRIGGER IF EXISTS {table}_au',
+        f'DROP TRIGGER IF EXISTS {table}_ad',
+        f'DROP TRIGGER IF EXISTS {table}_ai',
+        f'DROP TABLE IF EXISTS {table}',
+    ]
+
+
+POSTGRES_CREATE = [
+    """
+    CREATE INDEX search_searchdocument_body_tsv
+    ON search_searchdocument USING GIN (to_tsvector('simple', body))
+    """,
+]
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS search_searchdocument_body_tsv',
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({
+                'sqlite': [statement for kind in KINDS for statement in sqlite_create(kind)],
+                'postgresql': POSTGRES_CREATE,
+            }),
+            run_for_vendor({
+                'sqlite': [statement for kind in KINDS for statement in sqlite_drop(kind)],
+                'postgresql': POSTGRES_DROP,
+            }),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from importlib import import_module
+
+from django.db import migrations
+
+from search.morphology import index_terms
+
+fulltext_index = import_module('search.migrations.0002_fulltext_index')
+KIND = 'cargo_type'
+
+
+def index_cargo_types(apps, schema_editor):
+    """Типов груза немного: документы строятся сразу, без rebuild_search_index"""
+    CargoType = apps.get_model('cargo', 'CargoType')
+    SearchDocument = apps.get_model('search', 'SearchDocument')
+    SearchDocument.objects.bulk_create([
+        SearchDocument(
+            kind=KIND, object_id=pk,
+            body=' '.join(term for value in values for term in index_terms(value))
+        )
+        for pk, *values in CargoType.objects.values_list('pk', 'name', 'description')
+    ], ignore_conflicts=True)
+
+
+def remove_cargo_types(apps, schema_editor):
+    apps.get_model('search', 'SearchDocument').objects.filter(kind=KIND).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cargo', '0005_shipment_updated_idx'),
+        ('search', '0002_fulltext_index'),
+    ]
+
+    operations = [
+        # Документы пишутся до создания таблицы FTS5: ее заполняет последний
+        # запрос sqlite_create
+        migrations.RunPython(index_cargo_types, remove_cargo_types),
+        migrations.RunPython(
+            fulltext_index.run_for_vendor({'sqlite': fulltext_index.sqlite_create(KIND)}),
+            fulltext_index.run_for_vendor({'sqlite': fulltext_index.sqlite_drop(KIND)}),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """Денормализованный поисковый документ объекта: нормализованные основы
+    слов из его текстовых полей. Полнотекстовый индекс над body создается
+    миграцией под конкретную СУБД (FTS5 в SQLite, GIN по tsvector в Postgres)."""
+    kind = models.CharField(max_length=20, verbose_name='Тип объекта')
+    object_id = models.PositiveBigIntegerField(verbose_name='ID объекта')
+    body = models.TextField(verbose_name='Текст')
+
+    class Meta:
+        verbose_name = 'Поисковый документ'
+        verbose_name_plural = 'Поисковые документы'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='search_document_unique_object'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}"
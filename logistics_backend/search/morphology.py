@@ -0,0 +1,57 @@
+import re
+
+from vehicles.plates import normalize_plate
+
+TOKEN_PATTERN = re.compile(r'[0-9a-zа-я]+')
+DIGITS_PATTERN = re.compile(r'\d+')
+CYRILLIC_WORD = re.compile(r'^[а-я]+$')
+
+# Окончания русских прилагательных и существительных, от длинных к коротким.
+# Это не полноценный стеммер: он убирает частые флексии, чтобы "склада",
+# "складов" и "склад" давали одну основу, а остальное добирает поиск по префиксу.
+ENDINGS = sorted([
+    'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ами', 'ями', 'иях', 'ией',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый', 'ий', 'ой', 'ую', 'юю', 'ых', 'их',
+    'ым', 'им', 'ом', 'ем', 'ов', 'ев', 'ей', 'ам', 'ям', 'ах', 'ях', 'ию', 'ия',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+], key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+
+
+def stem(token):
+    if len(token) <= MIN_STEM_LENGTH or not CYRILLIC_WORD.match(token):
+        return token
+    for ending in ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= MIN_STEM_LENGTH:
+            return token[:-len(ending)]
+    return token
+
+
+def tokenize(text):
+    """Нижний регистр, ё -> е, слова из букв и цифр"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(str(text).lower().replace('ё', 'е'))
+
+
+def fold_token(token):
+    """В токенах с цифрами (госномера) латиница приводится к кириллице"""
+    if token.isalpha() or token.isdigit():
+        return token
+    return normalize_plate(token).lower()
+
+
+def index_terms(text):
+    """Термы документа: основы слов, а для смешанных токенов вроде госномера
+    "а123вс77" - еще и отдельные группы цифр"""
+    terms = []
+    for token in map(fold_token, tokenize(text)):
+        terms.append(stem(token))
+        if not token.isdigit():
+            terms.extend(DIGITS_PATTERN.findall(token))
+    return terms
+
+
+def query_terms(text):
+    """Термы запроса, каждый ищется как префикс"""
+    return list(dict.fromkeys(stem(fold_token(token)) for token in tokenize(text)))
@@ -0,0 +1,93 @@
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+from .documents import DOCUMENT_TYPES
+from .models import SearchDocument
+from .morphology import query_terms
+
+
+def match_expression(terms):
+    """Условие полнотекстового поиска для СУБД: каждое слово запроса
+    совпадает с началом какого-либо терма документа. Точное совпадение
+    терма дает документу больший вес, чем совпадение по префиксу."""
+    # Термы состоят только из [0-9a-zа-я], кавычки не нужно экранировать
+    if connection.vendor == 'sqlite':
+        return ' AND '.join(f'("{term}" OR "{term}"*)' for term in terms)
+    return ' & '.join(f'({term} | {term}:*)' for term in terms)
+
+
+def matching_sql(kind, match):
+    """(sql, params) подзапроса id найденных объектов, без ограничения числа"""
+    if connection.vendor == 'sqlite':
+        table = f'search_{kind}_fts'
+        return f"""
+            SELECT d.object_id FROM {table}
+            JOIN search_searchdocument d ON d.id = {table}.rowid
+            WHERE {table} MATCH %s
+        """, [match]
+    return """
+        SELECT object_id FROM search_searchdocument
+        WHERE kind = %s AND to_tsvector('simple', body) @@ to_tsquery('simple', %s)
+    """, [kind, match]
+
+
+def rank_sql(kind, match, column):
+    """(sql, params) релевантности объекта column: чем меньше, тем выше.
+    Подзапрос выполняется только для строк, уже прошедших все фильтры."""
+    # SQLite: совпадения с рангом материализуются один раз на запрос, иначе
+    # FTS5 заново читает списки документов термов для каждой строки
+    if connection.vendor == 'sqlite':
+        table = f'search_{kind}_fts'
+        return f"""
+            WITH m AS MATERIALIZED (
+                SELECT d.object_id, {table}.rank FROM {table}
+                JOIN search_searchdocument d ON d.id = {table}.rowid
+                WHERE {table} MATCH %s
+            )
+            SELECT m.rank FROM m WHERE m.object_id = {column}
+        """, [match]
+    return f"""
+        SELECT -ts_rank(to_tsvector('simple', body), to_tsquery('simple', %s))
+        FROM search_searchdocument WHERE kind = %s AND object_id = {column}
+    """, [match, kind]
+
+
+def has_fulltext_index():
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def search_ids(kind, text, limit=None):
+    """id объектов типа kind, у которых каждое слово запроса совпадает
+    с началом какого-либо терма документа, от более релевантных к менее"""
+    if kind not in DOCUMENT_TYPES:
+        raise ValueError(f'Неизвестный тип документа: {kind}')
+    return list(apply_search(
+        SearchDocument.objects.filter(kind=kind), kind, text, column='object_id'
+    ).values_list('object_id', flat=True)[:limit])
+
+
+def apply_search(queryset, kind, text, column='pk'):
+    """Оставляет в queryset найденные объекты и сортирует их по
+    релевантности. Совпадения подставляются подзапросом, поэтому остальные
+    фильтры, количество и пагинация считаются по всем найденным объектам."""
+    terms = query_terms(text)
+    if not terms:
+        return queryset.none()
+
+    if not has_fulltext_index():
+        # Без полнотекстового индекса - поиск подстрокой по нормализованному тексту
+        documents = SearchDocument.objects.filter(kind=kind)
+        for term in terms:
+            documents = documents.filter(body__contains=term)
+        return queryset.filter(**{f'{column}__in': documents.values('object_id')})
+
+    match = match_expression(terms)
+    model = queryset.model
+    field = model._meta.pk if column == 'pk' else model._meta.get_field(column)
+    outer = f'{connection.ops.quote_name(model._meta.db_table)}.{connection.ops.quote_name(field.column)}'
+    return queryset.filter(
+        **{f'{column}__in': RawSQL(*matching_sql(kind, match))}
+    ).annotate(
+        search_rank=RawSQL(*rank_sql(kind, match, outer), output_field=FloatField())
+    ).order_by('search_rank', f'-{column}')
@@ -0,0 +1,49 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from cargo.models import CargoType, Shipment
+from core.signals import bulk_changed
+from vehicles.models import Vehicle
+from warehouses.models import Warehouse
+
+from .documents import DOCUMENT_TYPES, KIND_BY_MODEL, index_objects, rebuild_kind, remove_objects
+
+
+@receiver(post_save, sender=CargoType)
+@receiver(post_save, sender=Shipment)
+@receiver(post_save, sender=Vehicle)
+@receiver(post_save, sender=Warehouse)
+def index_saved(sender, instance, update_fields=None, **kwargs):
+    kind = KIND_BY_MODEL[sender]
+    # Сохранение только статуса или загрузки документ не меняет
+    if update_fields is not None and not DOCUMENT_TYPES[kind].depends_on(update_fields):
+        return
+    index_objects(kind, [instance.pk])
+
+
+@receiver(post_delete, sender=CargoType)
+@receiver(post_delete, sender=Shipment)
+@receiver(post_delete, sender=Vehicle)
+@receiver(post_delete, sender=Warehouse)
+def remove_deleted(sender, instance, **kwargs):
+    remove_objects(KIND_BY_MODEL[sender], [instance.pk])
+
+
+@receiver(bulk_changed, sender=CargoType)
+@receiver(bulk_changed, sender=Shipment)
+@receiver(bulk_changed, sender=Vehicle)
+@receiver(bulk_changed, sender=Warehouse)
+def index_bulk_changed(sender, pks=None, fields=None, **kwargs):
+    if fields is not None and not DOCUMENT_TYPES[KIND_BY_MODEL[sender]].depends_on(fields):
+        return
+    if pks is None:
+        rebuild_kind(KIND_BY_MODEL[sender])
+    else:
+        index_objects(KIND_BY_MODEL[sender], pks)
+
+
+@receiver(post_save, sender=CargoType)
+def index_cargo_type_shipments(sender, instance, created, **kwargs):
+    """Название типа груза входит в документы его поставок"""
+    if not created:
+        index_objects('shipment', Shipment.objects.filter(cargo_type=instance).values_list('pk', flat=True))
@@ -0,0 +1,167 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cargo.models import CargoType, Shipment
+from cargo.stats import scope_shipments
+from core.models import User
+from core.signals import bulk_changed
+from vehicles.models import Vehicle
+from warehouses.models import Warehouse
+from .documents import rebuild_kind
+from .models import SearchDocument
+from .morphology import index_terms, query_terms, stem
+from .query import search_ids
+
+
+class MorphologyTests(TestCase):
+
+    def test_inflections_share_stem(self):
+        self.assertEqual(stem('склада'), stem('склад'))
+        self.assertEqual(stem('складов'), stem('склад'))
+        self.assertEqual(stem('металлическая'), stem('металлических'))
+
+    def test_short_and_mixed_tokens_are_kept(self):
+        self.assertEqual(stem('лес'), 'лес')
+        self.assertEqual(index_terms('А123ВС77'), ['а123вс77', '123', '77'])
+
+    def test_plate_homoglyphs_are_folded(self):
+        self.assertEqual(query_terms('a123bc77'), ['а123вс77'])
+        self.assertEqual(query_terms('Volvo'), ['volvo'])
+
+    def test_query_terms_normalize_yo(self):
+        self.assertEqual(query_terms('Ёмкость ёмкости'), [stem('емкость')])
+
+
+class SearchIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        cls.origin = Warehouse.objects.create(name='Центральный склад', address='ул. Промышленная, 1', capacity=1000)
+        cls.destination = Warehouse.objects.create(name='Северный терминал', address='ул. Лесная, 5', capacity=1000)
+        cls.cargo_type = CargoType.objects.create(name='Щебень гранитный')
+
+    def create_shipment(self, description):
+        return Shipment.objects.create(
+            cargo_type=self.cargo_type, weight=1, volume=1, description=description,
+            origin_warehouse=self.origin, destination_warehouse=self.destination,
+            planned_departure='2024-01-01T08:00Z', planned_arrival='2024-01-01T18:00Z',
+            created_by=self.user
+        )
+
+    def test_save_indexes_and_prefix_matches(self):
+        shipment = self.create_shipment('Срочная доставка металлических конструкций')
+        self.assertEqual(search_ids('shipment', 'металлическая конструкция'), [shipment.pk])
+        self.assertEqual(search_ids('shipment', 'щеб'), [shipment.pk])
+        self.assertEqual(search_ids('shipment', 'срочн песок'), [])
+
+    def test_update_and_delete_keep_index_in_sync(self):
+        shipment = self.create_shipment('Паллеты')
+        shipment.description = 'Контейнеры'
+        shipment.save()
+        self.assertEqual(search_ids('shipment', 'паллеты'), [])
+        self.assertEqual(search_ids('shipment', 'контейнер'), [shipment.pk])
+
+        shipment_pk = shipment.pk
+        shipment.delete()
+        self.assertEqual(search_ids('shipment', 'контейнер'), [])
+        self.assertFalse(SearchDocument.objects.filter(kind='shipment', object_id=shipment_pk).exists())
+
+    def test_cargo_type_rename_reindexes_shipments(self):
+        shipment = self.create_shipment('')
+        self.cargo_type.name = 'Песок речной'
+        self.cargo_type.save()
+        self.assertEqual(search_ids('shipment', 'речной песок'), [shipment.pk])
+        self.assertEqual(search_ids('shipment', 'щебень'), [])
+
+    def test_cargo_type_search(self):
+        crushed = CargoType.objects.create(name='Щебень', description='Фракция 5-20, щебень известняковый')
+        CargoType.objects.create(name='Песок речной')
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.get('/api/cargo/cargo-types/', {'search': 'щебень'})
+        self.assertCountEqual([row['id'] for row in response.data['results']], [crushed.pk, self.cargo_type.pk])
+        response = client.get('/api/cargo/cargo-types/', {'search': 'гранит щеб'})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.cargo_type.pk])
+
+        crushed.delete()
+        self.assertEqual(search_ids('cargo_type', 'известняк'), [])
+
+    def test_ranking_prefers_more_matches(self):
+        weak = self.create_shipment('Доставка')
+        strong = self.create_shipment('Доставка доставка доставка')
+        self.assertEqual(search_ids('shipment', 'доставка'), [strong.pk, weak.pk])
+
+    def test_kinds_are_separate(self):
+        self.assertEqual(search_ids('warehouse', 'северн'), [self.destination.pk])
+        self.assertEqual(search_ids('shipment', 'северн'), [])
+
+    def test_bulk_changed_indexes_bulk_writes(self):
+        vehicles = Vehicle.objects.bulk_create([
+            Vehicle(license_plate='А123ВС77', normalized_plate='А123ВС77', model='КАМАЗ 65115'),
+            Vehicle(license_plate='В456ОР50', normalized_plate='В456ОР50', model='Volvo FH'),
+        ])
+        self.assertEqual(search_ids('vehicle', '123'), [])
+
+        bulk_changed.send(sender=Vehicle, pks=[vehicle.pk for vehicle in vehicles])
+        self.assertEqual(search_ids('vehicle', '123'), [vehicles[0].pk])
+        self.assertEqual(search_ids('vehicle', 'volvo'), [vehicles[1].pk])
+
+        Vehicle.objects.filter(pk=vehicles[0].pk).delete()
+        self.assertEqual(rebuild_kind('vehicle'), 1)
+        self.assertEqual(search_ids('vehicle', 'камаз'), [])
+
+
+class SearchFilterTests(TestCase):
+    """Поиск - одно из условий запроса: остальные фильтры и количество
+    считаются по всем совпадениям, а не по первым найденным"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        warehouses = [
+            Warehouse.objects.create(name=f'Склад {index}', address=f'Адрес {index}', capacity=1000)
+            for index in range(2)
+        ]
+        cargo_types = [CargoType.objects.create(name='Груз сборный'), CargoType.objects.create(name='Песок')]
+        statuses = ['PLANNED', 'ASSIGNED', 'COMPLETED']
+        priorities = ['LOW', 'MEDIUM', 'HIGH']
+        now = timezone.now()
+        Shipment.objects.bulk_create([
+            Shipment(
+                cargo_type=cargo_types[index % 5 == 0], weight=1, volume=1,
+                origin_warehouse=warehouses[0], destination_warehouse=warehouses[1],
+                planned_departure=now + timedelta(days=index % 30),
+                planned_arrival=now + timedelta(days=index % 30 + 1),
+                status=statuses[index % 3], priority=priorities[index % 7 % 3], created_by=cls.user
+            )
+            for index in range(600)
+        ])
+        rebuild_kind('shipment')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_filters_and_count_cover_all_matches(self):
+        expected = Shipment.objects.filter(cargo_type__name='Груз сборный')
+        self.assertGreater(expected.count(), 200)
+        self.assertEqual(len(search_ids('shipment', 'груз')), expected.count())
+
+        response = self.client.get('/api/cargo/shipments/', {'search': 'груз'})
+        self.assertEqual(response.data['count'], expected.count())
+
+        date_to = timezone.localdate() + timedelta(days=10)
+        response = self.client.get('/api/cargo/shipments/', {
+            'search': 'груз', 'status': 'COMPLETED', 'priority': 'HIGH', 'date_to': date_to.isoformat()
+        })
+        filtered = scope_shipments(expected.filter(status='COMPLETED', priority='HIGH'), date_to=date_to)
+        self.assertGreater(filtered.count(), 0)
+        self.assertEqual(response.data['count'], filtered.count())
+        self.assertEqual(
+            sorted(row['id'] for row in response.data['results']), sorted(filtered.values_list('pk', flat=True))
+        )
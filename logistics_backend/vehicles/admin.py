@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Vehicle, Driver
+from .models import Vehicle, Driver, VehicleImportJob
 
 @admin.register(Driver)
 class DriverAdmin(admin.ModelAdmin):
@@ -16,4 +16,10 @@ class VehicleAdmin(admin.ModelAdmin):
     raw_id_fields = ('current_warehouse',)
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('current_warehouse')
\ No newline at end of file
+        return super().get_queryset(request).select_related('current_warehouse')
+
+@admin.register(VehicleImportJob)
+class VehicleImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'file_name', 'status', 'rows_processed', 'rows_total', 'errors_total', 'created_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'updated_at', 'started_at', 'finished_at')
\ No newline at end of file
@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.utils import timezone
+
+from core.signals import bulk_changed
+from .models import Driver, Vehicle
+
+VEHICLE_UNAVAILABLE = 'Транспортное средство недоступно'
+DRIVER_INACTIVE = 'Водитель неактивен'
+DRIVER_CHANGED = 'Водитель изменен другим запросом'
+
+# Поля ТС, которые меняет reserve_vehicles
+RESERVATION_FIELDS = ['status', 'updated_at']
+
+
+class AssignmentConflict(Exception):
+    """Назначение не выполнено: объект занят другим назначением.
+    conflicts - список {'index': номер элемента или None, 'error': текст}"""
+
+    def __init__(self, conflicts):
+        super().__init__(conflicts[0]['error'])
+        self.conflicts = conflicts
+
+
+def reserve_vehicles(vehicle_ids, now=None):
+    """Переводит активные ТС из AVAILABLE в IN_USE одним условным UPDATE.
+
+    Проверка статуса и запись выполняются одной командой, поэтому из двух
+    одновременных назначений одного ТС успешно только одно; второе
+    получает AssignmentConflict. Вызывается внутри транзакции назначения,
+    чтобы при конфликте откатились и остальные изменения."""
+    reserved = Vehicle.objects.filter(pk__in=vehicle_ids, status='AVAILABLE', is_active=True).update(
+        status='IN_USE', updated_at=now or timezone.now()
+    )
+    if reserved != len(set(vehicle_ids)):
+        raise AssignmentConflict([{'index': None, 'error': VEHICLE_UNAVAILABLE}])
+
+
+def assign_vehicle(driver, vehicle):
+    """Закрепляет за активным водителем свободное ТС. Строка водителя
+    блокируется, а запись условна по ТС, закрепленному за ним при чтении:
+    из двух одновременных назначений одного водителя успешно только одно,
+    второе откатывает и резервирование своего ТС."""
+    now = timezone.now()
+    with transaction.atomic():
+        current = Driver.objects.select_for_update().only('id', 'vehicle_id', 'is_active').get(pk=driver.pk)
+        if not current.is_active:
+            raise AssignmentConflict([{'index': None, 'error': DRIVER_INACTIVE}])
+
+        reserve_vehicles([vehicle.pk], now)
+        updated = Driver.objects.filter(pk=driver.pk, vehicle_id=current.vehicle_id).update(
+            vehicle=vehicle, updated_at=now
+        )
+        if not updated:
+            raise AssignmentConflict([{'index': None, 'error': DRIVER_CHANGED}])
+
+    bulk_changed.send(sender=Vehicle, pks=[vehicle.pk], fields=RESERVATION_FIELDS)
@@ -0,0 +1,325 @@
+import re
+import time
+from decimal import Decimal
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.signals import bulk_changed
+from warehouses.index import WarehouseIndex, WAREHOUSE_NUMBER_PATTERNS, extract_warehouse_number
+from .models import Vehicle
+from .plates import normalize_plate, normalize_plate_column
+
+SHEET_NAME = '14.09.2023'
+HEADER_ROWS = 4
+# Номер первой строки данных в Excel (с учетом шапки и строки заголовков)
+FIRST_DATA_ROW = HEADER_ROWS + 1
+
+# Номера колонок листа
+RECIPIENT_COLUMN = 1
+MODEL_COLUMN = 3
+PLATE_COLUMN = 4
+WAREHOUSE_COLUMN = 5
+VOLUME_COLUMN = 22
+DESCRIPTION_COLUMN = 23
+
+# Первое число в ячейке объема: "1,896" -> 1.896, "12 м3" -> 12
+VOLUME_PATTERN = r'(-?\d+(?:\.\d+)?)'
+
+
+def parse_volume(volume_str):
+    if pd.isna(volume_str) or volume_str == '':
+        return None
+
+    match = re.search(VOLUME_PATTERN, str(volume_str).strip().replace(',', '.'))
+    return float(match.group(1)) if match else None
+
+
+def parse_volume_column(column):
+    text = column.astype(str).str.replace(',', '.', regex=False)
+    volumes = pd.to_numeric(text.str.extract(VOLUME_PATTERN, expand=False), errors='coerce')
+    return volumes.where(column.notna())
+
+
+def extract_warehouse_number_column(column):
+    """Векторный аналог extract_warehouse_number: паттерны применяются
+    по порядку, каждый следующий только к еще не найденным строкам"""
+    text = column.astype(str)
+    numbers = pd.Series(None, index=column.index, dtype=object)
+    for pattern in WAREHOUSE_NUMBER_PATTERNS:
+        extracted = text.str.extract(pattern, flags=re.IGNORECASE, expand=False)
+        numbers = numbers.where(numbers.notna(), extracted)
+
+    numbers = numbers.where(column.notna())
+    stripped = numbers.str.lstrip('0')
+    return stripped.where(stripped != '', '0').where(numbers.notna())
+
+
+def text_column(column):
+    return column.astype(str).where(column.notna(), '')
+
+
+# Поля, которые импорт сверяет и обновляет в режиме upsert
+UPSERT_FIELDS = [
+    'model', 'current_warehouse_id', 'cargo_recipient',
+    'cargo_description', 'cargo_volume', 'is_active'
+]
+
+
+def quantize_volume(value):
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class FleetImporter:
+    """Импорт парка транспорта из Excel пачками через bulk_create"""
+
+    MODE_UPSERT = 'upsert'
+    MODE_REPLACE = 'replace'
+
+    def __init__(self, chunk_size=None, mode=MODE_UPSERT, progress=None):
+        self.chunk_size = chunk_size or settings.VEHICLE_IMPORT_CHUNK_SIZE
+        self.mode = mode
+        self.progress = progress
+        self.errors = []
+        # id записанных ТС для bulk_changed; None - неизвестны (режим replace)
+        self.changed_pks = None
+
+    def report_progress(self, **state):
+        if self.progress:
+            self.progress(errors=self.errors, **state)
+
+    def read_rows(self, excel_file):
+        df = pd.read_excel(excel_file, sheet_name=SHEET_NAME)
+        data_df = df.iloc[HEADER_ROWS:].reset_index(drop=True)
+
+        errors_count = len(self.errors)
+        try:
+            return self.parse_frame(data_df)
+        except Exception:
+            # Построчный разбор медленнее, но указывает, в какой строке ошибка
+            del self.errors[errors_count:]
+            return self.parse_frame_rowwise(data_df)
+
+    def parse_frame(self, data_df):
+        """Разбор листа целыми колонками"""
+        data_df = data_df[
+            data_df.iloc[:, MODEL_COLUMN].notna() & data_df.iloc[:, PLATE_COLUMN].notna()
+        ]
+        row_numbers = data_df.index + FIRST_DATA_ROW
+        license_plates = data_df.iloc[:, PLATE_COLUMN].astype(str).str.strip()
+        normalized_plates = normalize_plate_column(license_plates)
+
+        # Один номер, записанный латиницей, кириллицей или с пробелами, - дубликат
+        empty = normalized_plates == ''
+        duplicated = normalized_plates.duplicated() & ~empty
+        for row_number, license_plate, is_empty in zip(
+            row_numbers[empty | duplicated], license_plates[empty | duplicated], empty[empty | duplicated]
+        ):
+            if is_empty:
+                self.errors.append(f"Строка {row_number}: некорректный госномер {license_plate}")
+            else:
+                self.errors.append(f"Строка {row_number}: дубликат госномера {license_plate}")
+
+        parsed = pd.DataFrame({
+            'cargo_recipient': text_column(data_df.iloc[:, RECIPIENT_COLUMN]),
+            'vehicle_model': data_df.iloc[:, MODEL_COLUMN].astype(str),
+            'license_plate': license_plates,
+            'normalized_plate': normalized_plates,
+            'warehouse_number': extract_warehouse_number_column(data_df.iloc[:, WAREHOUSE_COLUMN]),
+            'cargo_description': text_column(data_df.iloc[:, DESCRIPTION_COLUMN]),
+            'cargo_volume': parse_volume_column(data_df.iloc[:, VOLUME_COLUMN]),
+            'row_index': row_numbers,
+        })[~(empty | duplicated)]
+
+        parsed = parsed.astype(object).where(parsed.notna(), None)
+        return parsed.to_dict('records')
+
+    def parse_frame_rowwise(self, data_df):
+        rows = []
+        processed_license_plates = set()
+
+        for index, row in data_df.iterrows():
+            row_number = index + FIRST_DATA_ROW
+            try:
+                if pd.isna(row.iloc[MODEL_COLUMN]) or pd.isna(row.iloc[PLATE_COLUMN]):
+                    continue
+
+                license_plate = str(row.iloc[PLATE_COLUMN]).strip()
+                normalized_plate = normalize_plate(license_plate)
+                if not normalized_plate:
+                    self.errors.append(f"Строка {row_number}: некорректный госномер {license_plate}")
+                    continue
+                if normalized_plate in processed_license_plates:
+                    self.errors.append(f"Строка {row_number}: дубликат госномера {license_plate}")
+                    continue
+
+                processed_license_plates.add(normalized_plate)
+
+                recipient = row.iloc[RECIPIENT_COLUMN]
+                description = row.iloc[DESCRIPTION_COLUMN]
+                rows.append({
+                    'cargo_recipient': str(recipient) if not pd.isna(recipient) else "",
+                    'vehicle_model': str(row.iloc[MODEL_COLUMN]),
+                    'license_plate': license_plate,
+                    'normalized_plate': normalized_plate,
+                    'warehouse_number': extract_warehouse_number(row.iloc[WAREHOUSE_COLUMN]),
+                    'cargo_description': str(description) if not pd.isna(description) else "",
+                    'cargo_volume': parse_volume(row.iloc[VOLUME_COLUMN]),
+                    'row_index': row_number
+                })
+
+            except Exception as e:
+                self.errors.append(f"Строка {row_number}: ошибка чтения данных - {str(e)}")
+
+        return rows
+
+    def resolve_warehouses(self, warehouse_numbers):
+        """Индекс складов строится одним запросом, недостающие склады
+        создаются одной пачкой"""
+        return WarehouseIndex.build().get_or_create_many(warehouse_numbers, batch_size=self.chunk_size)
+
+    def build_vehicle(self, row, warehouses):
+        return Vehicle(
+            license_plate=row['license_plate'],
+            normalized_plate=row['normalized_plate'],
+            vehicle_type='TRUCK',
+            status='AVAILABLE',
+            **self.vehicle_values(row, warehouses)
+        )
+
+    def vehicle_values(self, row, warehouses):
+        warehouse = warehouses.get(row['warehouse_number'])
+        return {
+            'model': row['vehicle_model'],
+            'current_warehouse_id': warehouse.pk if warehouse else None,
+            'cargo_recipient': row['cargo_recipient'],
+            'cargo_description': row['cargo_description'],
+            'cargo_volume': quantize_volume(row['cargo_volume']),
+            'is_active': True,
+        }
+
+    def write(self, rows):
+        if self.mode == self.MODE_REPLACE:
+            return self.replace(rows)
+        return self.upsert(rows)
+
+    def replace(self, rows):
+        """Удаление парка и все пачки пишутся одной транзакцией: при ошибке
+        парк остается прежним, а до фиксации читатели видят старый парк, а
+        не пустой. Прогресс пишется в той же транзакции и виден другим
+        соединениям только после нее."""
+        vehicles_created = 0
+        rows_processed = 0
+
+        with transaction.atomic():
+            Vehicle.objects.all().delete()
+            warehouses = self.resolve_warehouses({
+                row['warehouse_number'] for row in rows if row['warehouse_number']
+            })
+
+            for chunk in chunked(rows, self.chunk_size):
+                vehicles = [self.build_vehicle(row, warehouses) for row in chunk]
+                Vehicle.objects.bulk_create(vehicles, batch_size=self.chunk_size)
+
+                vehicles_created += len(vehicles)
+                rows_processed += len(chunk)
+                self.report_progress(rows_processed=rows_processed, vehicles_created=vehicles_created)
+
+        return {'vehicles_created': vehicles_created}
+
+    def upsert(self, rows):
+        """Сверяет лист с парком по госномеру и записывает только разницу:
+        новые ТС создаются, измененные обновляются, отсутствующие в листе
+        деактивируются. Назначения поставок и водителей сохраняются."""
+        counts = {
+            'vehicles_created': 0,
+            'vehicles_updated': 0,
+            'vehicles_unchanged': 0,
+            'vehicles_deactivated': 0,
+        }
+        rows_processed = 0
+        self.changed_pks = []
+
+        existing = {
+            vehicle.normalized_plate: vehicle
+            for vehicle in Vehicle.objects.only('id', 'normalized_plate', *UPSERT_FIELDS)
+        }
+        with transaction.atomic():
+            warehouses = self.resolve_warehouses({
+                row['warehouse_number'] for row in rows if row['warehouse_number']
+            })
+
+        for chunk in chunked(rows, self.chunk_size):
+            to_create = []
+            to_update = []
+            now = timezone.now()
+
+            for row in chunk:
+                vehicle = existing.get(row['normalized_plate'])
+                if vehicle is None:
+                    to_create.append(self.build_vehicle(row, warehouses))
+                    continue
+
+                values = self.vehicle_values(row, warehouses)
+                if all(getattr(vehicle, field) == value for field, value in values.items()):
+                    counts['vehicles_unchanged'] += 1
+                    continue
+
+                for field, value in values.items():
+                    setattr(vehicle, field, value)
+                vehicle.updated_at = now
+                to_update.append(vehicle)
+
+            with transaction.atomic():
+                Vehicle.objects.bulk_create(to_create, batch_size=self.chunk_size)
+                Vehicle.objects.bulk_update(
+                    to_update, UPSERT_FIELDS + ['updated_at'], batch_size=self.chunk_size
+                )
+
+            self.changed_pks.extend(vehicle.pk for vehicle in to_create + to_update)
+            counts['vehicles_created'] += len(to_create)
+            counts['vehicles_updated'] += len(to_update)
+            rows_processed += len(chunk)
+            self.report_progress(rows_processed=rows_processed, **counts)
+
+        sheet_plates = {row['normalized_plate'] for row in rows}
+        removed_ids = [
+            vehicle.pk for plate, vehicle in existing.items()
+            if plate not in sheet_plates and vehicle.is_active
+        ]
+        for ids in chunked(removed_ids, self.chunk_size):
+            with transaction.atomic():
+                counts['vehicles_deactivated'] += Vehicle.objects.filter(pk__in=ids).update(
+                    is_active=False, updated_at=timezone.now()
+                )
+            self.changed_pks.extend(ids)
+
+        return counts
+
+    def run(self, excel_file):
+        started = time.monotonic()
+
+        rows = self.read_rows(excel_file)
+        self.report_progress(rows_total=len(rows))
+        counts = self.write(rows)
+        bulk_changed.send(sender=Vehicle, pks=self.changed_pks)
+
+        duration = time.monotonic() - started
+        return {
+            **counts,
+            'mode': self.mode,
+            'rows_total': len(rows),
+            'chunk_size': self.chunk_size,
+            'duration_seconds': round(duration, 3),
+            'rows_per_second': round(len(rows) / duration, 1) if duration > 0 else None,
+            'errors_total': len(self.errors),
+        }
@@ -0,0 +1,83 @@
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .importers import FleetImporter
+from .models import VehicleImportJob
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.VEHICLE_IMPORT_WORKERS,
+                thread_name_prefix='vehicle-import'
+            )
+        return _executor
+
+
+def submit_import_job(job, content):
+    """Ставит импорт в очередь локального пула потоков.
+    При VEHICLE_IMPORT_RUN_INLINE импорт выполняется сразу в текущем потоке."""
+    if settings.VEHICLE_IMPORT_RUN_INLINE:
+        run_import_job(job.pk, content)
+    else:
+        get_executor().submit(_run_in_worker, job.pk, content)
+
+
+def _run_in_worker(job_id, content):
+    try:
+        run_import_job(job_id, content)
+    finally:
+        connection.close()
+
+
+def run_import_job(job_id, content):
+    job = VehicleImportJob.objects.get(pk=job_id)
+    jobs = VehicleImportJob.objects.filter(pk=job_id)
+    jobs.update(status='RUNNING', started_at=timezone.now(), updated_at=timezone.now())
+
+    def progress(errors, **state):
+        jobs.update(
+            errors=errors[:VehicleImportJob.MAX_STORED_ERRORS],
+            errors_total=len(errors),
+            updated_at=timezone.now(),
+            **state
+        )
+
+    importer = FleetImporter(chunk_size=job.chunk_size, mode=job.mode, progress=progress)
+    try:
+        result = importer.run(io.BytesIO(content))
+    except Exception as e:
+        jobs.update(
+            status='FAILED',
+            error_message=f'Ошибка обработки файла: {str(e)}',
+            errors=importer.errors[:VehicleImportJob.MAX_STORED_ERRORS],
+            errors_total=len(importer.errors),
+            finished_at=timezone.now(),
+            updated_at=timezone.now()
+        )
+        return
+
+    jobs.update(
+        status='COMPLETED',
+        rows_total=result['rows_total'],
+        rows_processed=result['rows_total'],
+        vehicles_created=result['vehicles_created'],
+        vehicles_updated=result.get('vehicles_updated', 0),
+        vehicles_unchanged=result.get('vehicles_unchanged', 0),
+        vehicles_deactivated=result.get('vehicles_deactivated', 0),
+        chunk_size=result['chunk_size'],
+        errors=importer.errors[:VehicleImportJob.MAX_STORED_ERRORS],
+        errors_total=len(importer.errors),
+        finished_at=timezone.now(),
+        updated_at=timezone.now()
+    )
@@ -0,0 +1,59 @@
+import random
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from vehicles.importers import FleetImporter, HEADER_ROWS
+
+MODELS = ['КАМАЗ 65115', 'MAN TGS 26.440', 'Volvo FH 460', 'ГАЗель Next', None]
+WAREHOUSES = ['База скл. №3', 'склад № 12', 'Склад 7', '№ 015', 'Центральный', None]
+VOLUMES = ['1,896', '12 м3', '3.5', '', None, 42, 0.75]
+
+
+def generate_sheet(rows, seed=0):
+    """Лист в формате импорта: шапка, затем строки с повторами госномеров"""
+    rnd = random.Random(seed)
+    data = [[None] * 24 for _ in range(HEADER_ROWS)]
+    for index in range(rows):
+        row = [None] * 24
+        row[1] = f'Грузополучатель {rnd.randrange(200)}' if rnd.random() > 0.1 else None
+        row[3] = rnd.choice(MODELS)
+        row[4] = f' А{rnd.randrange(rows):06d}ВС77 '
+        row[5] = rnd.choice(WAREHOUSES)
+        row[22] = rnd.choice(VOLUMES)
+        row[23] = 'Щебень' if index % 3 else None
+        data.append(row)
+    return pd.DataFrame(data)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает построчный и векторный разбор листа импорта транспорта'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        df = generate_sheet(options['rows'], options['seed'])
+        data_df = df.iloc[HEADER_ROWS:].reset_index(drop=True)
+
+        timings = {}
+        results = {}
+        for name in ('parse_frame_rowwise', 'parse_frame'):
+            importer = FleetImporter()
+            started = time.perf_counter()
+            rows = getattr(importer, name)(data_df)
+            timings[name] = time.perf_counter() - started
+            results[name] = (rows, importer.errors)
+
+        if results['parse_frame'] != results['parse_frame_rowwise']:
+            raise CommandError('Результаты построчного и векторного разбора различаются')
+
+        rows, errors = results['parse_frame']
+        self.stdout.write(f"Строк в листе: {options['rows']}, разобрано: {len(rows)}, дубликатов: {len(errors)}")
+        for name, seconds in timings.items():
+            self.stdout.write(f"{name}: {seconds:.3f} с ({options['rows'] / seconds:.0f} строк/с)")
+        self.stdout.write(
+            f"Ускорение: x{timings['parse_frame_rowwise'] / timings['parse_frame']:.1f}"
+        )
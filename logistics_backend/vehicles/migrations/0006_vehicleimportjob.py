@@ -0,0 +1,41 @@
+# Generated by Django 5.1 on 2026-10-17 22:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0005_remove_vehicle_current_driver_remove_vehicle_vin_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('status', models.CharField(choices=[('PENDING', 'В очереди'), ('RUNNING', 'Выполняется'), ('COMPLETED', 'Завершен'), ('FAILED', 'Ошибка')], default='PENDING', max_length=20, verbose_name='Статус')),
+                ('chunk_size', models.PositiveIntegerField(blank=True, null=True, verbose_name='Размер пачки')),
+                ('rows_total', models.PositiveIntegerField(default=0, verbose_name='Всего строк')),
+                ('rows_processed', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+                ('vehicles_created', models.PositiveIntegerField(default=0, verbose_name='Создано ТС')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Ошибки строк')),
+                ('errors_total', models.PositiveIntegerField(default=0, verbose_name='Всего ошибок')),
+                ('error_message', models.TextField(blank=True, verbose_name='Ошибка обработки файла')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начало обработки')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Окончание обработки')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vehicle_import_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Кем запущен')),
+            ],
+            options={
+                'verbose_name': 'Импорт транспорта',
+                'verbose_name_plural': 'Импорты транспорта',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
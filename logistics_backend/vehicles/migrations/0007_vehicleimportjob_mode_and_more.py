@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-17 22:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0006_vehicleimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicleimportjob',
+            name='mode',
+            field=models.CharField(choices=[('upsert', 'Обновление по госномеру'), ('replace', 'Полная замена парка')], default='upsert', max_length=10, verbose_name='Режим импорта'),
+        ),
+        migrations.AddField(
+            model_name='vehicleimportjob',
+            name='vehicles_deactivated',
+            field=models.PositiveIntegerField(default=0, verbose_name='Деактивировано ТС'),
+        ),
+        migrations.AddField(
+            model_name='vehicleimportjob',
+            name='vehicles_unchanged',
+            field=models.PositiveIntegerField(default=0, verbose_name='Без изменений'),
+        ),
+        migrations.AddField(
+            model_name='vehicleimportjob',
+            name='vehicles_updated',
+            field=models.PositiveIntegerField(default=0, verbose_name='Обновлено ТС'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-17 22:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0007_vehicleimportjob_mode_and_more'),
+        ('warehouses', '0002_alter_warehouse_contact_person'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['created_at'], name='vehicle_created_idx'),
+        ),
+    ]
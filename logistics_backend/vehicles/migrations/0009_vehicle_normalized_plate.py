@@ -0,0 +1,30 @@
+# Generated by Django 5.1 on 2026-10-17 22:41
+
+from django.db import migrations, models
+
+from vehicles.plates import normalize_plate
+
+
+def fill_normalized_plates(apps, schema_editor):
+    Vehicle = apps.get_model('vehicles', 'Vehicle')
+    vehicles = list(Vehicle.objects.only('id', 'license_plate'))
+    for vehicle in vehicles:
+        vehicle.normalized_plate = normalize_plate(vehicle.license_plate)
+    Vehicle.objects.bulk_update(vehicles, ['normalized_plate'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0008_vehicle_vehicle_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='normalized_plate',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=20, verbose_name='Нормализованный госномер'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_normalized_plates, migrations.RunPython.noop),
+    ]
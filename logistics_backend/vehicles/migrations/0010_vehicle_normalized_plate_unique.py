@@ -0,0 +1,58 @@
+from django.db import migrations, models
+
+from vehicles.plates import normalize_plate
+
+# Сколько групп совпадающих номеров перечислить в сообщении
+MAX_REPORTED = 50
+
+
+def find_plate_collisions(rows):
+    """{нормализованный номер: [(id, госномер)]} для номеров, которые после
+    нормализации совпадают у нескольких ТС ("A123BC77" и "А123ВС77")"""
+    groups = {}
+    for pk, license_plate in rows:
+        groups.setdefault(normalize_plate(license_plate), []).append((pk, license_plate))
+    return {plate: vehicles for plate, vehicles in groups.items() if len(vehicles) > 1}
+
+
+def check_plate_collisions(apps, schema_editor):
+    """Уникальный индекс не создается, пока в базе есть совпадающие номера:
+    какое ТС оставить, решает человек, а не миграция"""
+    Vehicle = apps.get_model('vehicles', 'Vehicle')
+    rows = list(Vehicle.objects.order_by('pk').values_list('pk', 'license_plate', 'normalized_plate'))
+
+    collisions = find_plate_collisions((pk, license_plate) for pk, license_plate, _ in rows)
+    if collisions:
+        lines = [
+            f"{plate or '(пустой)'}: " + ', '.join(f'#{pk} "{license_plate}"' for pk, license_plate in vehicles)
+            for plate, vehicles in sorted(collisions.items())[:MAX_REPORTED]
+        ]
+        raise RuntimeError(
+            f'Групп ТС с совпадающими после нормализации госномерами: {len(collisions)}. Уникальный '
+            'индекс normalized_plate не создан: исправьте или объедините ТС и повторите миграцию.\n'
+            + '\n'.join(lines)
+        )
+
+    # Записи в обход save() могли оставить устаревший нормализованный номер
+    stale = [
+        Vehicle(pk=pk, normalized_plate=normalize_plate(license_plate))
+        for pk, license_plate, normalized_plate in rows
+        if normalize_plate(license_plate) != normalized_plate
+    ]
+    Vehicle.objects.bulk_update(stale, ['normalized_plate'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0009_vehicle_normalized_plate'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_plate_collisions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='vehicle',
+            name='normalized_plate',
+            field=models.CharField(editable=False, max_length=20, unique=True, verbose_name='Нормализованный госномер'),
+        ),
+    ]
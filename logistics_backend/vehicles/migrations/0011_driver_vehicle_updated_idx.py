@@ -0,0 +1,24 @@
+# Generated by Django 5.1 on 2026-10-18 00:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0010_vehicle_normalized_plate_unique'),
+        ('warehouses', '0003_warehouse_updated_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='driver',
+            index=models.Index(fields=['updated_at'], name='driver_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['updated_at'], name='vehicle_updated_idx'),
+        ),
+    ]
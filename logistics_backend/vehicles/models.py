@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from warehouses.models import Warehouse
+from .plates import normalize_plate
 
 class Driver(models.Model):
     user = models.OneToOneField(
@@ -29,6 +31,10 @@ class Driver(models.Model):
     class Meta:
         verbose_name = 'Водитель'
         verbose_name_plural = 'Водители'
+        indexes = [
+            # Max(updated_at) для ETag списка (core.conditional)
+            models.Index(fields=['updated_at'], name='driver_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.license_number}"
@@ -49,6 +55,10 @@ class Vehicle(models.Model):
     )
 
     license_plate = models.CharField(max_length=20, unique=True, verbose_name='Госномер')
+    # Госномер без пробелов и кода RUS, латиница приведена к кириллице;
+    # по нему сверяется импорт и ищутся номера. Уникален: один номер,
+    # записанный латиницей и кириллицей, - одно ТС
+    normalized_plate = models.CharField(max_length=20, unique=True, editable=False, verbose_name='Нормализованный госномер')
     model = models.CharField(max_length=100, verbose_name='Модель')
     vehicle_type = models.CharField(max_length=20, choices=VEHICLE_TYPE_CHOICES, default='TRUCK', verbose_name='Тип транспорта')
     
@@ -105,6 +115,79 @@ class Vehicle(models.Model):
     class Meta:
         verbose_name = 'Транспортное средство'
         verbose_name_plural = 'Транспортные средства'
+        indexes = [
+            models.Index(fields=['created_at'], name='vehicle_created_idx'),
+            models.Index(fields=['updated_at'], name='vehicle_updated_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.normalized_plate = normalize_plate(self.license_plate)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'license_plate' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_plate'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.model} - {self.license_plate}"
\ No newline at end of file
+        return f"{self.model} - {self.license_plate}"
+
+class VehicleImportJob(models.Model):
+    STATUS_CHOICES = (
+        ('PENDING', 'В очереди'),
+        ('RUNNING', 'Выполняется'),
+        ('COMPLETED', 'Завершен'),
+        ('FAILED', 'Ошибка'),
+    )
+
+    MODE_CHOICES = (
+        ('upsert', 'Обновление по госномеру'),
+        ('replace', 'Полная замена парка'),
+    )
+
+    # Сколько сообщений об ошибках строк хранится в задаче
+    MAX_STORED_ERRORS = 100
+
+    file_name = models.CharField(max_length=255, verbose_name='Имя файла')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', verbose_name='Статус')
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default='upsert', verbose_name='Режим импорта')
+    chunk_size = models.PositiveIntegerField(null=True, blank=True, verbose_name='Размер пачки')
+    rows_total = models.PositiveIntegerField(default=0, verbose_name='Всего строк')
+    rows_processed = models.PositiveIntegerField(default=0, verbose_name='Обработано строк')
+    vehicles_created = models.PositiveIntegerField(default=0, verbose_name='Создано ТС')
+    vehicles_updated = models.PositiveIntegerField(default=0, verbose_name='Обновлено ТС')
+    vehicles_unchanged = models.PositiveIntegerField(default=0, verbose_name='Без изменений')
+    vehicles_deactivated = models.PositiveIntegerField(default=0, verbose_name='Деактивировано ТС')
+    errors = models.JSONField(default=list, blank=True, verbose_name='Ошибки строк')
+    errors_total = models.PositiveIntegerField(default=0, verbose_name='Всего ошибок')
+    error_message = models.TextField(blank=True, verbose_name='Ошибка обработки файла')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='vehicle_import_jobs',
+        verbose_name='Кем запущен'
+    )
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начало обработки')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Окончание обработки')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Импорт транспорта'
+        verbose_name_plural = 'Импорты транспорта'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Импорт #{self.id} - {self.file_name}"
+
+    def duration_seconds(self):
+        if not self.started_at:
+            return None
+        finished_at = self.finished_at or timezone.now()
+        return (finished_at - self.started_at).total_seconds()
+
+    def rows_per_second(self):
+        duration = self.duration_seconds()
+        if duration:
+            return round(self.rows_processed / duration, 1)
+        return None
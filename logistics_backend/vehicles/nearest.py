@@ -0,0 +1,34 @@
+from warehouses.geo import get_spatial_index
+from .models import Vehicle
+
+# Сколько ближайших складов берется в первый проход
+FIRST_RING = 32
+# Во сколько раз расширяется круг складов, если ТС не хватило
+RING_GROWTH = 4
+
+
+def nearest_available(warehouse_id, k):
+    """k свободных ТС, ближайших к складу: [(id ТС, км)] по возрастанию
+    расстояния до склада, на котором стоит ТС.
+
+    Склады перебираются кругами по пространственному индексу: если в
+    круге нашлось k ТС, любое ТС за его пределами не ближе найденных.
+    ТС без склада или на складе без координат не учитываются.
+    KeyError, если склада warehouse_id нет в индексе."""
+    index = get_spatial_index()
+    latitude, longitude = index.coordinates(warehouse_id)
+    vehicles = Vehicle.objects.filter(status='AVAILABLE', is_active=True)
+
+    count = max(k, FIRST_RING)
+    while True:
+        warehouses = dict(index.nearest(latitude, longitude, count))
+        if len(warehouses) == len(index):
+            rows = list(vehicles.filter(current_warehouse__isnull=False).values_list('id', 'current_warehouse_id'))
+            break
+        rows = list(vehicles.filter(current_warehouse__in=list(warehouses)).values_list('id', 'current_warehouse_id'))
+        if len(rows) >= k:
+            break
+        count *= RING_GROWTH
+
+    found = [(vehicle_id, warehouses[warehouse_id]) for vehicle_id, warehouse_id in rows if warehouse_id in warehouses]
+    return sorted(found, key=lambda item: (item[1], item[0]))[:k]
@@ -0,0 +1,36 @@
+import re
+
+# Латинские буквы, совпадающие по начертанию с буквами российских номеров,
+# приводятся к кириллице
+HOMOGLYPHS = str.maketrans('ABEKMHOPCTYX', 'АВЕКМНОРСТУХ')
+REGION_SUFFIX = re.compile(r'RUS$')
+NON_ALNUM = re.compile(r'[^0-9A-ZА-ЯЁ]')
+
+
+def normalize_plate(value):
+    """' a 123 вс 77 RUS' -> 'А123ВС77'"""
+    if value is None:
+        return ''
+    plate = NON_ALNUM.sub('', str(value).upper())
+    plate = REGION_SUFFIX.sub('', plate)
+    return plate.translate(HOMOGLYPHS).replace('Ё', 'Е')
+
+
+def normalize_plate_column(column):
+    """normalize_plate для колонки pandas"""
+    return (
+        column.astype(str).str.upper()
+        .str.replace(NON_ALNUM, '', regex=True)
+        .str.replace(REGION_SUFFIX, '', regex=True)
+        .str.translate(HOMOGLYPHS)
+        .str.replace('Ё', 'Е', regex=False)
+    )
+
+
+def plate_prefix_range(prefix):
+    """Границы [low, high) для поиска по началу номера сравнением строк,
+    которое в отличие от LIKE использует обычный индекс"""
+    low = normalize_plate(prefix)
+    if not low:
+        return None
+    return low, low[:-1] + chr(ord(low[-1]) + 1)
@@ -1,20 +1,48 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from .models import Vehicle, Driver
-from core.serializers import UserProfileSerializer
+from .models import Vehicle, Driver, VehicleImportJob
+from .plates import normalize_plate
+from core.serializers import DynamicFieldsMixin, UserProfileSerializer
 from warehouses.serializers import WarehouseSerializer
 
-class VehicleSerializer(serializers.ModelSerializer):
-    current_warehouse_details = WarehouseSerializer(source='current_warehouse', read_only=True)
+DUPLICATE_PLATE_MESSAGE = 'Транспортное средство с таким госномером уже существует.'
+
+
+class VehicleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Vehicle
         fields = [
             'id', 'license_plate', 'model', 'vehicle_type', 'capacity', 'volume',
-            'status', 'current_warehouse', 'current_warehouse_details',
+            'status', 'current_warehouse',
             'cargo_recipient', 'cargo_description', 'cargo_volume',
             'is_active', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        expandable_fields = {
+            'current_warehouse': WarehouseSerializer,
+        }
+
+    def validate_license_plate(self, value):
+        normalized_plate = normalize_plate(value)
+        if not normalized_plate:
+            raise serializers.ValidationError("Некорректный госномер.")
+
+        vehicles = Vehicle.objects.filter(normalized_plate=normalized_plate)
+        if self.instance is not None:
+            vehicles = vehicles.exclude(pk=self.instance.pk)
+        if vehicles.exists():
+            raise serializers.ValidationError(DUPLICATE_PLATE_MESSAGE)
+        return value
+
+    def save(self, **kwargs):
+        # Проверка выше не защищает от параллельной записи того же номера:
+        # ее ловит уникальный индекс normalized_plate
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError:
+            raise serializers.ValidationError({'license_plate': [DUPLICATE_PLATE_MESSAGE]})
 
     def validate_capacity(self, value):
         if value and value <= 0:
@@ -26,18 +54,20 @@ class VehicleSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Объем должен быть положительным числом.")
         return value
 
-class DriverSerializer(serializers.ModelSerializer):
-    user_details = UserProfileSerializer(source='user', read_only=True)
-    vehicle_details = VehicleSerializer(source='vehicle', read_only=True)
+class DriverSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Driver
         fields = [
-            'id', 'user', 'user_details', 'license_number', 'license_category',
-            'license_expiry', 'phone_number', 'vehicle', 'vehicle_details',
+            'id', 'user', 'license_number', 'license_category',
+            'license_expiry', 'phone_number', 'vehicle',
             'is_active', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        expandable_fields = {
+            'user': UserProfileSerializer,
+            'vehicle': VehicleSerializer,
+        }
 
     def validate_user(self, value):
         if value.role != 'DRIVER':
@@ -46,12 +76,28 @@ class DriverSerializer(serializers.ModelSerializer):
 
 class VehicleImportSerializer(serializers.Serializer):
     file = serializers.FileField()
+    chunk_size = serializers.IntegerField(required=False, min_value=1, max_value=5000)
+    mode = serializers.ChoiceField(choices=VehicleImportJob.MODE_CHOICES, default='upsert')
 
     def validate_file(self, value):
         if not value.name.endswith(('.xlsx', '.xls')):
             raise serializers.ValidationError("Поддерживаются только Excel файлы")
         return value
 
+class VehicleImportJobSerializer(serializers.ModelSerializer):
+    duration_seconds = serializers.ReadOnlyField()
+    rows_per_second = serializers.ReadOnlyField()
+
+    class Meta:
+        model = VehicleImportJob
+        fields = [
+            'id', 'file_name', 'status', 'mode', 'chunk_size', 'rows_total', 'rows_processed',
+            'vehicles_created', 'vehicles_updated', 'vehicles_unchanged', 'vehicles_deactivated', 'errors', 'errors_total', 'error_message', 'created_by',
+            'duration_seconds', 'rows_per_second', 'started_at', 'finished_at',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
 class AssignVehicleSerializer(serializers.Serializer):
     vehicle_id = serializers.IntegerField()
     driver_id = serializers.IntegerField()
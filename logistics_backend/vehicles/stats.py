@@ -0,0 +1,12 @@
+from django.db.models import Count, Q
+
+
+def vehicle_stats(queryset):
+    result = queryset.order_by().aggregate(
+        total_vehicles=Count('id'),
+        # Деактивированные импортом ТС сохраняют статус, но не назначаются
+        available_vehicles=Count('id', filter=Q(status='AVAILABLE', is_active=True)),
+        in_use_vehicles=Count('id', filter=Q(status='IN_USE')),
+        inactive_vehicles=Count('id', filter=Q(is_active=False)),
+    )
+    return result
@@ -1,3 +1,451 @@
-from django.test import TestCase
+import io
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from cargo.assignment import find_conflicts
+from cargo.models import Shipment
+from core.models import User
+from core.testing import PerformanceTestCase
+from warehouses.geo import get_spatial_index
+from warehouses.models import Warehouse
+from .importers import FleetImporter, HEADER_ROWS, MODEL_COLUMN, PLATE_COLUMN, SHEET_NAME
+from . import assignment as assign_module
+from .assignment import VEHICLE_UNAVAILABLE, AssignmentConflict, assign_vehicle
+from .jobs import run_import_job
+from .management.commands.benchmark_fleet_parsing import generate_sheet
+from .models import Driver, Vehicle, VehicleImportJob
+from .plates import normalize_plate, normalize_plate_column, plate_prefix_range
+from .stats import vehicle_stats
+
+
+class PlateNormalizationTests(SimpleTestCase):
+
+    def test_spellings_of_one_plate_match(self):
+        for value in ['А123ВС77', 'a123bc77', 'A 123 BC 77', 'а123вс 77 RUS', ' A-123-ВС-77 ']:
+            self.assertEqual(normalize_plate(value), 'А123ВС77', value)
+
+    def test_non_plate_values(self):
+        self.assertEqual(normalize_plate(None), '')
+        self.assertEqual(normalize_plate(' - '), '')
+        self.assertEqual(normalize_plate('ё1'), 'Е1')
+
+    def test_column_matches_scalar(self):
+        values = ['a123bc77', 'Х 001 ХХ 199 rus', '  ', 'ВЁ12']
+        self.assertEqual(
+            normalize_plate_column(pd.Series(values)).tolist(), [normalize_plate(value) for value in values]
+        )
+
+    def test_prefix_range(self):
+        self.assertEqual(plate_prefix_range('a12'), ('А12', 'А13'))
+        self.assertIsNone(plate_prefix_range(' '))
+
+
+class PlateLookupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        cls.vehicle = Vehicle.objects.create(license_plate='А123ВС77', model='КАМАЗ 65115', capacity=20, volume=80)
+        Vehicle.objects.create(license_plate='А124ВС77', model='КАМАЗ 65115', capacity=20, volume=80)
+        Vehicle.objects.create(license_plate='В456ОР50', model='Volvo FH', capacity=20, volume=80)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+
+    def test_normalized_plate_is_saved(self):
+        vehicle = Vehicle.objects.get(pk=self.vehicle.pk)
+        vehicle.license_plate = 'b457op50'
+        vehicle.save(update_fields=['license_plate'])
+        vehicle.refresh_from_db()
+        self.assertEqual(vehicle.normalized_plate, 'В457ОР50')
+
+    def test_by_plate(self):
+        response = self.client.get('/api/vehicles/vehicles/by-plate/', {'plate': 'a 123 bc 77 rus'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.vehicle.pk)
+
+        response = self.client.get('/api/vehicles/vehicles/by-plate/', {'plate': 'А999ВС77'})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get('/api/vehicles/vehicles/by-plate/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_plate_prefix(self):
+        response = self.client.get('/api/vehicles/vehicles/plate-prefix/', {'prefix': 'a12'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['license_plate'] for item in response.data], ['А123ВС77', 'А124ВС77'])
+
+    def test_plate_lookups_use_index(self):
+        low, high = plate_prefix_range('А12')
+        plan = Vehicle.objects.filter(normalized_plate__gte=low, normalized_plate__lt=high).explain()
+        self.assertIn('USING INDEX', plan)
+        self.assertNotRegex(plan, r'SCAN vehicles_vehicle\b')
+
+    def test_create_rejects_homoglyph_duplicate(self):
+        response = self.client.post('/api/vehicles/vehicles/', {
+            'license_plate': 'A123BC77', 'model': 'Volvo FH', 'capacity': 20, 'volume': 80
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('license_plate', response.data)
+
+    def test_homoglyph_spelling_violates_unique_plate(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vehicle.objects.bulk_create([Vehicle(
+                license_plate='A123BC77', normalized_plate=normalize_plate('A123BC77'),
+                model='Volvo FH', capacity=20, volume=80
+            )])
+
+    def test_migration_reports_homoglyph_collisions(self):
+        find_plate_collisions = import_module(
+            'vehicles.migrations.0010_vehicle_normalized_plate_unique'
+        ).find_plate_collisions
+        rows = [(1, 'A123BC77'), (2, 'А123ВС77'), (3, 'а 123 вс 77 RUS'), (4, 'В456ОР50')]
+        self.assertEqual(find_plate_collisions(rows), {
+            'А123ВС77': [(1, 'A123BC77'), (2, 'А123ВС77'), (3, 'а 123 вс 77 RUS')],
+        })
+
+    def test_importer_matches_latin_spelling(self):
+        rows = [[None] * 24 for _ in range(HEADER_ROWS + 3)]
+        for row, plate in zip(rows[HEADER_ROWS:], ['A123BC77', 'а 123 вс 77', 'А777АА77']):
+            row[MODEL_COLUMN] = 'КАМАЗ 5490'
+            row[PLATE_COLUMN] = plate
+        content = io.BytesIO()
+        pd.DataFrame(rows).to_excel(content, sheet_name=SHEET_NAME, index=False)
+        content.seek(0)
+
+        importer = FleetImporter(mode=FleetImporter.MODE_UPSERT)
+        result = importer.run(content)
+
+        self.assertEqual(result['vehicles_created'], 1)
+        self.assertEqual(result['vehicles_updated'], 1)
+        self.assertTrue(any('дубликат госномера а 123 вс 77' in error for error in importer.errors))
+        self.assertEqual(Vehicle.objects.filter(normalized_plate='А123ВС77').count(), 1)
+
+
+def fleet_sheet(plates, models=None):
+    rows = [[None] * 24 for _ in range(HEADER_ROWS + len(plates))]
+    for index, (row, plate) in enumerate(zip(rows[HEADER_ROWS:], plates)):
+        row[MODEL_COLUMN] = models[index] if models else 'КАМАЗ 5490'
+        row[PLATE_COLUMN] = plate
+    content = io.BytesIO()
+    pd.DataFrame(rows).to_excel(content, sheet_name=SHEET_NAME, index=False)
+    return content.getvalue()
+
+
+class FleetImportJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for plate in ['А001АА77', 'А002АА77']:
+            Vehicle.objects.create(license_plate=plate, model='Volvo FH', capacity=20, volume=80)
+
+    def plates(self):
+        return sorted(Vehicle.objects.values_list('normalized_plate', flat=True))
+
+    def test_replace_failure_keeps_fleet(self):
+        job = VehicleImportJob.objects.create(file_name='fleet.xlsx', mode='replace', chunk_size=1)
+        bulk_create = Vehicle.objects.bulk_create
+        calls = []
+
+        def failing_bulk_create(objs, **kwargs):
+            calls.append(len(objs))
+            if len(calls) == 2:
+                raise RuntimeError('обрыв соединения')
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(Vehicle.objects, 'bulk_create', side_effect=failing_bulk_create):
+            run_import_job(job.pk, fleet_sheet(['В001ВВ77', 'В002ВВ77', 'В003ВВ77']))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertIn('обрыв соединения', job.error_message)
+        self.assertEqual(self.plates(), ['А001АА77', 'А002АА77'])
+
+    def test_replace_job_reports_progress(self):
+        states = []
+        importer = FleetImporter(
+            chunk_size=2, mode=FleetImporter.MODE_REPLACE, progress=lambda errors, **state: states.append(state)
+        )
+        importer.run(io.BytesIO(fleet_sheet(['В001ВВ77', 'В002ВВ77', 'В003ВВ77'])))
+        self.assertEqual(states, [
+            {'rows_total': 3},
+            {'rows_processed': 2, 'vehicles_created': 2},
+            {'rows_processed': 3, 'vehicles_created': 3},
+        ])
+
+        job = VehicleImportJob.objects.create(file_name='fleet.xlsx', mode='replace', chunk_size=2)
+        run_import_job(job.pk, fleet_sheet(['В001ВВ77', 'В002ВВ77', 'В003ВВ77', 'В003ВВ77']))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'COMPLETED', job.error_message)
+        self.assertEqual(
+            (job.rows_total, job.rows_processed, job.vehicles_created, job.errors_total), (3, 3, 3, 1)
+        )
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(self.plates(), ['В001ВВ77', 'В002ВВ77', 'В003ВВ77'])
+
+
+class FleetUpsertTests(TestCase):
+
+    def upsert(self, plates, models=None):
+        importer = FleetImporter(chunk_size=2, mode=FleetImporter.MODE_UPSERT)
+        return importer, importer.run(io.BytesIO(fleet_sheet(plates, models)))
+
+    def test_upsert_sets_and_deactivated_vehicles(self):
+        self.upsert(['В001ВВ77', 'В002ВВ77', 'В003ВВ77'])
+        pks = dict(Vehicle.objects.values_list('normalized_plate', 'pk'))
+
+        importer, result = self.upsert(
+            ['В001ВВ77', 'В002ВВ77', 'В004ВВ77'], ['КАМАЗ 5490', 'Volvo FH', 'КАМАЗ 5490']
+        )
+        counts = ('vehicles_created', 'vehicles_updated', 'vehicles_unchanged', 'vehicles_deactivated')
+        self.assertEqual([result[key] for key in counts], [1, 1, 1, 1])
+        created = Vehicle.objects.get(normalized_plate='В004ВВ77')
+        self.assertEqual(
+            sorted(importer.changed_pks), sorted([pks['В002ВВ77'], pks['В003ВВ77'], created.pk])
+        )
+        self.assertEqual(Vehicle.objects.get(pk=pks['В002ВВ77']).model, 'Volvo FH')
+        self.assertEqual(
+            sorted(Vehicle.objects.filter(is_active=False).values_list('normalized_plate', flat=True)), ['В003ВВ77']
+        )
+
+        # Деактивированное ТС сохраняет статус AVAILABLE, но не считается
+        # свободным и не назначается
+        stats = vehicle_stats(Vehicle.objects.all())
+        self.assertEqual((stats['available_vehicles'], stats['inactive_vehicles']), (3, 1))
+        conflicts = find_conflicts(
+            [{'shipment_id': 1, 'vehicle_id': pks['В003ВВ77'], 'driver_id': 1}],
+            {1: Shipment(pk=1, status='PLANNED')},
+            Vehicle.objects.in_bulk([pks['В003ВВ77']]),
+            {1: Driver(pk=1, vehicle_id=pks['В003ВВ77'])}
+        )
+        self.assertEqual(conflicts, [{'index': 0, 'error': VEHICLE_UNAVAILABLE}])
+
+        # Вернувшееся в лист ТС снова активно
+        _, result = self.upsert(
+            ['В001ВВ77', 'В002ВВ77', 'В003ВВ77', 'В004ВВ77'], ['КАМАЗ 5490', 'Volvo FH', 'КАМАЗ 5490', 'КАМАЗ 5490']
+        )
+        self.assertEqual((result['vehicles_updated'], result['vehicles_unchanged']), (1, 3))
+        self.assertFalse(Vehicle.objects.filter(is_active=False).exists())
+
+
+class VehicleAssignmentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        cls.vehicle = Vehicle.objects.create(license_plate='А123ВС77', model='КАМАЗ 65115', capacity=20, volume=80)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+
+    def test_assign_busy_vehicle_conflicts(self):
+        driver = Driver.objects.create(
+            user=User.objects.create_user('driver', password='x', role='DRIVER'),
+            license_number='77 00 000000', license_category='C', license_expiry='2030-01-01',
+            phone_number='79990000000'
+        )
+        url = f'/api/vehicles/drivers/{driver.pk}/assign_vehicle/'
+        data = {'vehicle_id': self.vehicle.pk, 'driver_id': driver.pk}
+        self.assertEqual(self.client.post(url, data).status_code, 200)
+        self.assertEqual(Vehicle.objects.get(pk=self.vehicle.pk).status, 'IN_USE')
+
+        response = self.client.post(f'/api/vehicles/vehicles/{self.vehicle.pk}/assign_driver/', data)
+        self.assertEqual(response.status_code, 409)
+
+    def create_driver(self, index=0, **fields):
+        return Driver.objects.create(
+            user=User.objects.create_user(f'driver{index}', password='x', role='DRIVER'),
+            license_number=f'77 00 00000{index}', license_category='C', license_expiry='2030-01-01',
+            phone_number='79990000000', **fields
+        )
+
+    def test_concurrent_driver_change_conflicts(self):
+        driver = self.create_driver()
+        other = Vehicle.objects.create(license_plate='В456ОР50', model='Volvo FH', capacity=20, volume=80)
+        reserve = assign_module.reserve_vehicles
+
+        def reserve_after_concurrent_assignment(vehicle_ids, now):
+            # Другой запрос успел закрепить за водителем свое ТС
+            Driver.objects.filter(pk=driver.pk).update(vehicle=other)
+            reserve(vehicle_ids, now)
+
+        with mock.patch.object(assign_module, 'reserve_vehicles', side_effect=reserve_after_concurrent_assignment):
+            with self.assertRaises(AssignmentConflict):
+                assign_vehicle(driver, self.vehicle)
+
+        self.assertEqual(Vehicle.objects.get(pk=self.vehicle.pk).status, 'AVAILABLE')
+
+    def test_inactive_vehicle_and_driver_conflict(self):
+        driver = self.create_driver()
+        url = f'/api/vehicles/drivers/{driver.pk}/assign_vehicle/'
+        data = {'vehicle_id': self.vehicle.pk, 'driver_id': driver.pk}
+
+        Vehicle.objects.filter(pk=self.vehicle.pk).update(is_active=False)
+        self.assertEqual(self.client.post(url, data).status_code, 409)
+
+        Vehicle.objects.filter(pk=self.vehicle.pk).update(is_active=True)
+        Driver.objects.filter(pk=driver.pk).update(is_active=False)
+        self.assertEqual(self.client.post(url, data).status_code, 409)
+        self.assertEqual(Vehicle.objects.get(pk=self.vehicle.pk).status, 'AVAILABLE')
+
+
+class NearestAvailableTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        cls.moscow, cls.tver, cls.spb = [
+            Warehouse.objects.create(
+                name=name, address=name, capacity=1000, latitude=latitude, longitude=longitude
+            )
+            for name, latitude, longitude in [
+                ('Москва', '55.755826', '37.617300'), ('Тверь', '56.858721', '35.917596'),
+                ('Санкт-Петербург', '59.938630', '30.314130'),
+            ]
+        ]
+        cls.vehicles = {
+            key: Vehicle.objects.create(
+                license_plate=plate, model='КАМАЗ 65115', capacity=20, volume=80,
+                status=vehicle_status, current_warehouse=warehouse
+            )
+            for key, plate, vehicle_status, warehouse in [
+                ('spb', 'А001ВС77', 'AVAILABLE', cls.spb),
+                ('tver', 'А002ВС77', 'AVAILABLE', cls.tver),
+                ('moscow_busy', 'А003ВС77', 'IN_USE', cls.moscow),
+                ('no_warehouse', 'А004ВС77', 'AVAILABLE', None),
+            ]
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+
+    def nearest(self, **params):
+        response = self.client.get('/api/vehicles/vehicles/nearest-available/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [(item['vehicle']['id'], round(item['distance_km'])) for item in response.data]
+
+    def test_ranked_by_warehouse_distance(self):
+        self.assertEqual(self.nearest(warehouse=self.moscow.pk), [
+            (self.vehicles['tver'].pk, 161), (self.vehicles['spb'].pk, 634)
+        ])
+        self.assertEqual(self.nearest(warehouse=self.spb.pk, k=1), [(self.vehicles['spb'].pk, 0)])
+
+    def test_search_ring_grows(self):
+        with mock.patch('vehicles.nearest.FIRST_RING', 1):
+            self.assertEqual(self.nearest(warehouse=self.moscow.pk, k=2), [
+                (self.vehicles['tver'].pk, 161), (self.vehicles['spb'].pk, 634)
+            ])
+
+    def test_unknown_warehouse(self):
+        response = self.client.get('/api/vehicles/vehicles/nearest-available/', {'warehouse': 0})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get('/api/vehicles/vehicles/nearest-available/')
+        self.assertEqual(response.status_code, 400)
+
+
+class VehicleApiPerformanceTests(PerformanceTestCase):
+
+    def test_list(self):
+        self.assertWithinBudget('vehicles-list', 'get', '/api/vehicles/vehicles/', {'page_size': 100})
+
+    def test_list_expanded(self):
+        self.assertWithinBudget(
+            'vehicles-list-expanded', 'get', '/api/vehicles/vehicles/',
+            {'page_size': 100, 'expand': 'current_warehouse'}
+        )
+
+    def test_list_not_modified(self):
+        etag = self.client.get('/api/vehicles/vehicles/')['ETag']
+        self.assertWithinBudget(
+            'vehicles-list-not-modified', 'get', '/api/vehicles/vehicles/',
+            expected_status=304, HTTP_IF_NONE_MATCH=etag
+        )
+
+    def test_retrieve(self):
+        vehicle = self.data['vehicles'][0]
+        self.assertWithinBudget(
+            'vehicles-retrieve', 'get', f'/api/vehicles/vehicles/{vehicle.pk}/', {'expand': 'current_warehouse'}
+        )
+
+    def test_search(self):
+        response = self.assertWithinBudget('vehicles-search', 'get', '/api/vehicles/vehicles/', {'search': '00012'})
+        self.assertEqual(response.data['results'][0]['license_plate'], 'А00012ВС77')
+
+    def test_stats(self):
+        self.assertWithinBudget('vehicles-stats', 'get', '/api/vehicles/vehicles/stats/')
+
+    def test_by_plate(self):
+        response = self.assertWithinBudget(
+            'vehicles-by-plate', 'get', '/api/vehicles/vehicles/by-plate/',
+            {'plate': 'a01234bc77', 'expand': 'current_warehouse'}
+        )
+        self.assertEqual(response.data['license_plate'], 'А01234ВС77')
+
+    def test_plate_prefix(self):
+        response = self.assertWithinBudget(
+            'vehicles-plate-prefix', 'get', '/api/vehicles/vehicles/plate-prefix/',
+            {'prefix': 'a0123', 'expand': 'current_warehouse'}
+        )
+        self.assertEqual(len(response.data), 10)
+
+    @override_settings(VEHICLE_IMPORT_RUN_INLINE=True)
+    def test_upload_excel(self):
+        content = io.BytesIO()
+        generate_sheet(1000).to_excel(content, sheet_name=SHEET_NAME, index=False, header=False)
+        content.seek(0)
+        content.name = 'fleet.xlsx'
+
+        response = self.assertWithinBudget(
+            'vehicles-upload-excel', 'post', '/api/vehicles/vehicles/upload-excel/',
+            {'file': content}, expected_status=202, format='multipart'
+        )
+        job = VehicleImportJob.objects.get(pk=response.data['id'])
+        self.assertEqual(job.status, 'COMPLETED', job.error_message)
+
+    def test_nearest_available(self):
+        cache.clear()
+        get_spatial_index()
+        warehouse = next(warehouse for warehouse in self.data['warehouses'] if warehouse.is_active)
+        response = self.assertWithinBudget(
+            'vehicles-nearest-available', 'get', '/api/vehicles/vehicles/nearest-available/',
+            {'warehouse': warehouse.pk, 'k': 20, 'expand': 'current_warehouse'}
+        )
+        self.assertEqual(len(response.data), 20)
+        distances = [item['distance_km'] for item in response.data]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_assign_driver(self):
+        vehicle = Vehicle.objects.filter(status='AVAILABLE').first()
+        driver = Driver.objects.filter(vehicle__isnull=True).first()
+        self.assertWithinBudget(
+            'vehicles-assign-driver', 'post', f'/api/vehicles/vehicles/{vehicle.pk}/assign_driver/',
+            {'vehicle_id': vehicle.pk, 'driver_id': driver.pk}
+        )
+
+
+class DriverApiPerformanceTests(PerformanceTestCase):
+
+    def test_list(self):
+        self.assertWithinBudget(
+            'drivers-list', 'get', '/api/vehicles/drivers/', {'expand': 'user,vehicle.current_warehouse'}
+        )
+
+    def test_available(self):
+        self.assertWithinBudget('drivers-available', 'get', '/api/vehicles/drivers/available/', {'expand': 'user'})
+
+    def test_assign_vehicle(self):
+        vehicle = Vehicle.objects.filter(status='AVAILABLE').first()
+        driver = Driver.objects.filter(vehicle__isnull=True).first()
+        self.assertWithinBudget(
+            'drivers-assign-vehicle', 'post', f'/api/vehicles/drivers/{driver.pk}/assign_vehicle/',
+            {'vehicle_id': vehicle.pk, 'driver_id': driver.pk}
+        )
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import VehicleViewSet, DriverViewSet
+from .views import VehicleViewSet, DriverViewSet, VehicleImportJobViewSet
 
 router = DefaultRouter()
 router.register(r'vehicles', VehicleViewSet, basename='vehicles')
 router.register(r'drivers', DriverViewSet, basename='drivers')
+router.register(r'imports', VehicleImportJobViewSet, basename='vehicle-imports')
 
 urlpatterns = [
     path('', include(router.urls)),
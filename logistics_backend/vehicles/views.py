@@ -1,16 +1,22 @@
-import pandas as pd
-import re
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db import transaction, models
-from .models import Vehicle, Driver
+from core.conditional import ConditionalGetMixin
+from core.pagination import KeysetPaginationMixin
+from core.query_plan import QueryPlanMixin
+from search.query import apply_search
+from .models import Vehicle, Driver, VehicleImportJob
 from .serializers import (
-    VehicleSerializer, DriverSerializer, VehicleImportSerializer, AssignVehicleSerializer
+    VehicleSerializer, DriverSerializer, VehicleImportSerializer, AssignVehicleSerializer,
+    VehicleImportJobSerializer
 )
-from warehouses.models import Warehouse
+from .assignment import AssignmentConflict, assign_vehicle
+from .jobs import submit_import_job
+from .nearest import nearest_available
+from .plates import normalize_plate, plate_prefix_range
+from .stats import vehicle_stats
 
-class VehicleViewSet(viewsets.ModelViewSet):
+class VehicleViewSet(ConditionalGetMixin, QueryPlanMixin, KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Vehicle.objects.all()
     serializer_class = VehicleSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -28,179 +34,104 @@ class VehicleViewSet(viewsets.ModelViewSet):
             
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                models.Q(license_plate__icontains=search) |
-                models.Q(model__icontains=search) |
-                models.Q(cargo_recipient__icontains=search)
-            )
-            
-        return queryset
-
-    def parse_volume(self, volume_str):
-        if pd.isna(volume_str) or volume_str == '':
-            return None
-        
-        try:
-            str_value = str(volume_str).strip().replace(',', '.')
-            str_value = re.sub(r'[^\d.-]', '', str_value)
-            return float(str_value) if str_value else None
-        except (ValueError, TypeError):
-            return None
-
-    def extract_warehouse_number(self, warehouse_info):
-        if pd.isna(warehouse_info) or not warehouse_info:
-            return None
-        
-        warehouse_str = str(warehouse_info)
-        patterns = [
-            r'№\s*(\d+)',
-            r'склад\s*№\s*(\d+)',
-            r'база\s*скл\.?\s*№\s*(\d+)',
-            r'(\d+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, warehouse_str, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        
-        return None
-
-    def get_or_create_warehouse(self, warehouse_number):
-        """Находит или создает склад по номеру"""
-        if not warehouse_number:
-            return None
-        
-        try:
-            warehouse = Warehouse.objects.filter(
-                models.Q(name__icontains=warehouse_number) |
-                models.Q(address__icontains=warehouse_number)
-            ).first()
+            queryset = apply_search(queryset, 'vehicle', search)
             
-            if not warehouse:
-                warehouse = Warehouse.objects.create(
-                    name=f'Склад {warehouse_number}',
-                    address=f'Адрес склада {warehouse_number}',
-                    capacity=1000,
-                    current_load=0,
-                    is_active=True
-                )
-            
-            return warehouse
-        except Exception:
-            return None
+        return self.optimize_queryset(queryset)
 
     @action(detail=False, methods=['post'], url_path='upload-excel')
     def upload_excel(self, request):
+        """Ставит импорт в очередь и сразу возвращает задачу, прогресс
+        доступен по /api/vehicles/imports/<id>/"""
         serializer = VehicleImportSerializer(data=request.data)
-        
+
         if serializer.is_valid():
             excel_file = serializer.validated_data['file']
-            
-            try:
-                df = pd.read_excel(excel_file, sheet_name='14.09.2023')
-
-                data_df = df.iloc[4:].reset_index(drop=True)
-                
-                vehicles_created = 0
-                errors = []
-                processed_license_plates = set()
 
-                vehicle_data_list = []
-                
-                for index, row in data_df.iterrows():
-                    try:
+            job = VehicleImportJob.objects.create(
+                file_name=excel_file.name,
+                mode=serializer.validated_data['mode'],
+                chunk_size=serializer.validated_data.get('chunk_size'),
+                created_by=request.user
+            )
+            submit_import_job(job, excel_file.read())
+            job.refresh_from_db()
 
-                        if pd.isna(row.iloc[3]) or pd.isna(row.iloc[4]):
-                            continue
+            return Response(
+                VehicleImportJobSerializer(job).data,
+                status=status.HTTP_202_ACCEPTED
+            )
 
-                        cargo_recipient = str(row.iloc[1]) if not pd.isna(row.iloc[1]) else ""
-                        vehicle_model = str(row.iloc[3])
-                        license_plate = str(row.iloc[4]).strip()
-                        warehouse_info = str(row.iloc[5]) if not pd.isna(row.iloc[5]) else ""
-                        cargo_description = str(row.iloc[23]) if not pd.isna(row.iloc[23]) else ""
-                        cargo_volume = self.parse_volume(row.iloc[22])
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-                        if license_plate in processed_license_plates:
-                            errors.append(f"Строка {index + 5}: дубликат госномера {license_plate}")
-                            continue
-                        
-                        processed_license_plates.add(license_plate)
-                        
-                        vehicle_data_list.append({
-                            'cargo_recipient': cargo_recipient,
-                            'vehicle_model': vehicle_model,
-                            'license_plate': license_plate,
-                            'warehouse_info': warehouse_info,
-                            'cargo_description': cargo_description,
-                            'cargo_volume': cargo_volume,
-                            'row_index': index + 5
-                        })
-                        
-                    except Exception as e:
-                        errors.append(f"Строка {index + 5}: ошибка чтения данных - {str(e)}")
-                        continue
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        return Response(vehicle_stats(Vehicle.objects.all()))
+
+    @action(detail=False, methods=['get'], url_path='by-plate')
+    def by_plate(self, request):
+        """ТС по госномеру в любом написании: "a123bc 77", "А 123 ВС 77 RUS" """
+        normalized_plate = normalize_plate(request.query_params.get('plate'))
+        if not normalized_plate:
+            return Response(
+                {'error': 'Параметр plate обязателен'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-                with transaction.atomic():
-                    Vehicle.objects.all().delete()
-                    
-                    for vehicle_data in vehicle_data_list:
-                        try:
-                            license_plate = vehicle_data['license_plate']
+        vehicle = self.optimize_queryset(Vehicle.objects.filter(normalized_plate=normalized_plate)).first()
+        if vehicle is None:
+            return Response(
+                {'error': 'Транспортное средство не найдено'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(self.get_serializer(vehicle).data)
+
+    @action(detail=False, methods=['get'], url_path='plate-prefix')
+    def plate_prefix(self, request):
+        """ТС, госномер которых начинается с prefix (не больше limit, по умолчанию 20)"""
+        plate_range = plate_prefix_range(request.query_params.get('prefix'))
+        if plate_range is None:
+            return Response(
+                {'error': 'Параметр prefix обязателен'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response(
+                {'error': 'Некорректное значение limit'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-                            if Vehicle.objects.filter(license_plate=license_plate).exists():
-                                errors.append(f"Строка {vehicle_data['row_index']}: госномер {license_plate} уже существует в БД")
-                                continue
+        low, high = plate_range
+        vehicles = self.optimize_queryset(Vehicle.objects.filter(
+            normalized_plate__gte=low, normalized_plate__lt=high
+        ).order_by('normalized_plate'))[:limit]
+        return Response(self.get_serializer(vehicles, many=True).data)
 
-                            warehouse_number = self.extract_warehouse_number(vehicle_data['warehouse_info'])
-                            warehouse = self.get_or_create_warehouse(warehouse_number)
+    @action(detail=False, methods=['get'], url_path='nearest-available')
+    def nearest_available(self, request):
+        """Свободные ТС, ближайшие к складу warehouse (не больше k, по умолчанию 10)"""
+        try:
+            warehouse_id = int(request.query_params.get('warehouse', ''))
+            k = min(max(int(request.query_params.get('k', 10)), 1), 100)
+        except ValueError:
+            return Response(
+                {'error': 'Параметр warehouse обязателен, warehouse и k - целые числа'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-                            Vehicle.objects.create(
-                                license_plate=license_plate,
-                                model=vehicle_data['vehicle_model'],
-                                vehicle_type='TRUCK',
-                                current_warehouse=warehouse,
-                                cargo_recipient=vehicle_data['cargo_recipient'],
-                                cargo_description=vehicle_data['cargo_description'],
-                                cargo_volume=vehicle_data['cargo_volume'],
-                                status='AVAILABLE'
-                            )
-                            
-                            vehicles_created += 1
-                            
-                        except Exception as e:
-                            errors.append(f"Строка {vehicle_data['row_index']}: ошибка создания - {str(e)}")
-                            continue
-                
-                response_data = {
-                    'message': f'Успешно создано {vehicles_created} записей',
-                    'vehicles_created': vehicles_created
-                }
-                
-                if errors:
-                    response_data['errors'] = errors[:10]
-                
-                return Response(response_data, status=status.HTTP_201_CREATED)
-                
-            except Exception as e:
-                return Response(
-                    {'error': f'Ошибка обработки файла: {str(e)}'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            found = nearest_available(warehouse_id, k)
+        except KeyError:
+            return Response(
+                {'error': 'Склад не найден, не активен или не имеет координат'},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
-    @action(detail=False, methods=['get'])
-    def stats(self, request):
-        total_vehicles = Vehicle.objects.count()
-        available_vehicles = Vehicle.objects.filter(status='AVAILABLE').count()
-        in_use_vehicles = Vehicle.objects.filter(status='IN_USE').count()
-        
-        return Response({
-            'total_vehicles': total_vehicles,
-            'available_vehicles': available_vehicles,
-            'in_use_vehicles': in_use_vehicles,
-        })
+        vehicles = self.optimize_queryset(Vehicle.objects.all()).in_bulk([vehicle_id for vehicle_id, _ in found])
+        found = [(vehicles[vehicle_id], km) for vehicle_id, km in found if vehicle_id in vehicles]
+        data = self.get_serializer([vehicle for vehicle, _ in found], many=True).data
+        return Response([{'distance_km': km, 'vehicle': item} for (_, km), item in zip(found, data)])
 
     @action(detail=True, methods=['post'])
     def assign_driver(self, request, pk=None):
@@ -208,20 +139,17 @@ class VehicleViewSet(viewsets.ModelViewSet):
         serializer = AssignVehicleSerializer(data=request.data)
         
         if serializer.is_valid():
-            driver = serializer.validated_data['driver']
-
-            vehicle.driver = driver
-            vehicle.status = 'IN_USE'
-            vehicle.save()
+            try:
+                assign_vehicle(serializer.validated_data['driver'], vehicle)
+            except AssignmentConflict as e:
+                return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
 
-            driver.vehicle = vehicle
-            driver.save()
-            
-            return Response(VehicleSerializer(vehicle).data)
+            vehicle = self.optimize_queryset(Vehicle.objects.all()).get(pk=vehicle.pk)
+            return Response(self.get_serializer(vehicle).data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class DriverViewSet(viewsets.ModelViewSet):
+class DriverViewSet(ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Driver.objects.all()
     serializer_class = DriverSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -237,14 +165,15 @@ class DriverViewSet(viewsets.ModelViewSet):
         if vehicle_filter:
             queryset = queryset.filter(vehicle_id=vehicle_filter)
             
-        return queryset.select_related('user', 'vehicle')
+        return self.optimize_queryset(queryset)
 
     @action(detail=False, methods=['get'])
     def available(self, request):
         available_drivers = Driver.objects.filter(
             vehicle__isnull=True,
             is_active=True
-        ).select_related('user')
+        )
+        available_drivers = self.optimize_queryset(available_drivers)
         
         serializer = self.get_serializer(available_drivers, many=True)
         return Response(serializer.data)
@@ -255,20 +184,17 @@ class DriverViewSet(viewsets.ModelViewSet):
         serializer = AssignVehicleSerializer(data=request.data)
         
         if serializer.is_valid():
-            vehicle = serializer.validated_data['vehicle']
+            try:
+                assign_vehicle(driver, serializer.validated_data['vehicle'])
+            except AssignmentConflict as e:
+                return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
 
-            if vehicle.status != 'AVAILABLE':
-                return Response(
-                    {'error': 'Транспортное средство недоступно'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            driver.vehicle = vehicle
-            driver.save()
-            
-            vehicle.status = 'IN_USE'
-            vehicle.save()
-            
-            return Response(DriverSerializer(driver).data)
+            driver = self.optimize_queryset(Driver.objects.all()).get(pk=driver.pk)
+            return Response(self.get_serializer(driver).data)
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class VehicleImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = VehicleImportJob.objects.all()
+    serializer_class = VehicleImportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
@@ -1,6 +1,10 @@
 from django.apps import AppConfig
 
+
 class WarehousesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'warehouses'
-    verbose_name = 'Склады'
\ No newline at end of file
+    verbose_name = 'Склады'
+
+    def ready(self):
+        from . import signals  # noqa: F401
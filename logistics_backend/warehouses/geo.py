@@ -0,0 +1,365 @@
+import hashlib
+import math
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from scipy.spatial import cKDTree
+
+from .models import Warehouse
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: запись блокируется только между потоками одного процесса
+    fcntl = None
+
+EARTH_RADIUS_KM = 6371.0088
+# Строк матрицы за один проход: промежуточные массивы float64 для 5000
+# складов занимают ~20 МБ вместо ~200 МБ на всю матрицу сразу
+CHUNK_ROWS = 512
+CURRENT_FILE = 'current'
+LOCK_FILE = 'lock'
+PENDING_PREFIX = 'pending-'
+# Отметка pending: пересчитать матрицу целиком
+REBUILD = 'all'
+SPATIAL_VERSION_KEY = 'warehouses:spatial:version'
+
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+_loaded = {}
+_spatial = {}
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Расстояние по дуге большого круга в км; аргументы в градусах,
+    массивы любой совместимой формы"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def load_coordinates():
+    """Активные склады с координатами: (ids, массив n x 2 [широта, долгота])"""
+    rows = list(
+        Warehouse.objects.filter(is_active=True, latitude__isnull=False, longitude__isnull=False)
+        .order_by('pk').values_list('pk', 'latitude', 'longitude')
+    )
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    coords = np.array([row[1:] for row in rows], dtype=np.float64).reshape(-1, 2)
+    return ids, coords
+
+
+class DistanceMatrix:
+    """Матрица расстояний между активными складами.
+
+    Хранится в каталоге WAREHOUSE_DISTANCE_DIR (отдельном для каждой базы)
+    тремя файлами .npy одной версии: ids, координаты и матрица float32,
+    которая открывается через memmap, поэтому запрос читает одно значение,
+    а не загружает матрицу. Файлы версии после записи не меняются: любое
+    изменение пишет новую версию и атомарно переключает на нее файл
+    current, поэтому читатели не видят частично записанных строк.
+
+    Сохранение склада только отмечает его в файле pending-*; изменения
+    применяются при следующем чтении под межпроцессной блокировкой записи:
+    новый склад - полный пересчет, изменение координат - копия матрицы с
+    пересчитанными строкой и столбцом."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.pointer = str(self.directory / CURRENT_FILE)
+
+    @classmethod
+    def default(cls):
+        database = str(connection.settings_dict['NAME'])
+        return cls(Path(settings.WAREHOUSE_DISTANCE_DIR) / hashlib.md5(database.encode()).hexdigest()[:12])
+
+    def path(self, version, name):
+        return self.directory / f'{name}-{version}.npy'
+
+    def current_version(self):
+        try:
+            return (self.directory / CURRENT_FILE).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def locked(self):
+        """Блокировка записи между процессами (flock) и потоками"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with _write_lock, open(self.directory / LOCK_FILE, 'a') as lock_file:
+            if fcntl is not None:
+                # Снимается при закрытии файла
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def pending_files(self):
+        try:
+            return sorted(
+                entry.path for entry in os.scandir(self.directory) if entry.name.startswith(PENDING_PREFIX)
+            )
+        except FileNotFoundError:
+            return []
+
+    def mark_changed(self, pks=None):
+        """Отмечает склады pks (None - все) для пересчета при следующем
+        чтении. Каждая отметка - отдельный файл, записанный атомарно: ее не
+        потеряет пересчет, идущий в это время в другом процессе."""
+        if self.current_version() is None:
+            # Матрица еще не построена: построится при первом чтении
+            return
+        name = f'{PENDING_PREFIX}{uuid.uuid4().hex}'
+        temporary = self.directory / f'.{name}'
+        temporary.write_text(REBUILD if pks is None else ' '.join(str(pk) for pk in pks))
+        os.replace(temporary, self.directory / name)
+
+    def build(self):
+        """Полный пересчет по активным складам из базы"""
+        with self.locked():
+            return self._build()
+
+    def _build(self):
+        # Отметки читаются до координат: все, что они отмечают, уже в базе
+        pending = self.pending_files()
+        count = self._write(*load_coordinates())
+        self._clear(pending)
+        return count
+
+    def write(self, ids, coords):
+        with self.locked():
+            return self._write(ids, coords)
+
+    def _write(self, ids, coords):
+        """Записывает новую версию матрицы одним векторным проходом по
+        блокам строк и делает ее текущей"""
+        version = uuid.uuid4().hex
+        np.save(self.path(version, 'ids'), ids)
+        np.save(self.path(version, 'coords'), coords)
+        matrix = np.lib.format.open_memmap(
+            self.path(version, 'distances'), mode='w+', dtype=np.float32, shape=(len(ids), len(ids))
+        )
+        for start in range(0, len(ids), CHUNK_ROWS):
+            block = coords[start:start + CHUNK_ROWS]
+            matrix[start:start + len(block)] = haversine(
+                block[:, :1], block[:, 1:], coords[:, 0], coords[:, 1]
+            )
+        matrix.flush()
+        del matrix
+        self._switch(version)
+        return len(ids)
+
+    def _switch(self, version):
+        previous = self.current_version()
+        temporary = self.directory / f'{CURRENT_FILE}.{version}'
+        temporary.write_text(version)
+        os.replace(temporary, self.directory / CURRENT_FILE)
+        if previous:
+            # Уже открытые memmap продолжают работать с удаленными файлами
+            for name in ('ids', 'coords', 'distances'):
+                self.path(previous, name).unlink(missing_ok=True)
+
+    def _clear(self, pending):
+        for path in pending:
+            Path(path).unlink(missing_ok=True)
+
+    def refresh(self):
+        """Строит матрицу, если ее нет, и применяет отметки pending"""
+        with self.locked():
+            version = self.current_version()
+            pending = self.pending_files()
+            if version is None:
+                self._build()
+                return
+            if not pending:
+                return
+
+            pks = set()
+            for path in pending:
+                content = Path(path).read_text()
+                if content == REBUILD:
+                    self._build()
+                    return
+                pks.update(int(pk) for pk in content.split())
+            self._update(version, pks)
+            self._clear(pending)
+
+    def _update(self, version, pks):
+        """Пересчитывает строки и столбцы складов pks. Если склад появился
+        в выборке (новый, активирован, получил координаты), матрица
+        перестраивается целиком: ее размер меняется."""
+        ids = np.load(self.path(version, 'ids'))
+        index = {pk: position for position, pk in enumerate(ids.tolist())}
+        current = {
+            row[0]: row[1:] for row in Warehouse.objects.filter(pk__in=pks).values_list(
+                'pk', 'is_active', 'latitude', 'longitude'
+            )
+        }
+
+        changed = {}
+        for pk in pks:
+            is_active, latitude, longitude = current.get(pk, (False, None, None))
+            present = is_active and latitude is not None and longitude is not None
+            if pk not in index:
+                if present:
+                    self._write(*load_coordinates())
+                    return
+                continue
+            changed[index[pk]] = (float(latitude), float(longitude)) if present else (np.nan, np.nan)
+        if changed:
+            self._patch(version, changed)
+
+    def patch(self, changed):
+        with self.locked():
+            self._patch(self.current_version(), changed)
+
+    def _patch(self, version, changed):
+        """Новая версия - копия текущей с пересчитанными строками и
+        столбцами {номер строки: (широта, долгота)}"""
+        coords = np.load(self.path(version, 'coords'))
+        changed = {
+            position: point for position, point in changed.items()
+            if not np.array_equal(coords[position], point, equal_nan=True)
+        }
+        if not changed:
+            return
+
+        patched = uuid.uuid4().hex
+        shutil.copyfile(self.path(version, 'ids'), self.path(patched, 'ids'))
+        shutil.copyfile(self.path(version, 'distances'), self.path(patched, 'distances'))
+        matrix = np.load(self.path(patched, 'distances'), mmap_mode='r+')
+        for position, point in changed.items():
+            coords[position] = point
+            # Удаленный или выключенный склад остается в матрице строкой
+            # NaN до следующего полного пересчета
+            row = haversine(point[0], point[1], coords[:, 0], coords[:, 1]).astype(np.float32)
+            matrix[position, :] = row
+            matrix[:, position] = row
+        matrix.flush()
+        del matrix
+        np.save(self.path(patched, 'coords'), coords)
+        self._switch(patched)
+
+    def load(self):
+        """(ids -> номер строки, матрица) текущей версии; перед чтением
+        применяются отметки pending, при отсутствии матрица строится"""
+        if not os.path.exists(self.pointer) or self.pending_files():
+            self.refresh()
+
+        for attempt in range(2):
+            stat = os.stat(self.pointer)
+            # Файл current заменяется через os.replace, поэтому смена версии
+            # видна по stat без чтения файла на каждый запрос
+            marker = (stat.st_ino, stat.st_mtime_ns)
+            loaded = _loaded.get(self.pointer)
+            if loaded is not None and loaded[0] == marker:
+                break
+            try:
+                version = self.current_version()
+                ids = np.load(self.path(version, 'ids'))
+                # view без подкласса memmap: индексация по нему заметно быстрее
+                matrix = np.load(self.path(version, 'distances'), mmap_mode='r').view(np.ndarray)
+            except FileNotFoundError:
+                # Версию между чтением current и открытием файлов сменил
+                # другой процесс
+                if attempt:
+                    raise
+                continue
+            loaded = (marker, {pk: index for index, pk in enumerate(ids.tolist())}, matrix)
+            _loaded[self.pointer] = loaded
+            break
+        return loaded[1], loaded[2]
+
+    def distances(self, from_id, to_ids):
+        """{to_id: км}; KeyError с id склада, которого нет в матрице"""
+        index, matrix = self.load()
+        if from_id not in index or math.isnan(matrix[index[from_id], index[from_id]]):
+            raise KeyError(from_id)
+        row = matrix[index[from_id]]
+
+        distances = {}
+        for to_id in to_ids:
+            # NaN - склад удален или выключен после последнего пересчета
+            value = float(row[index[to_id]]) if to_id in index else math.nan
+            if math.isnan(value):
+                raise KeyError(to_id)
+            distances[to_id] = round(value, 3)
+        return distances
+
+
+def get_distance_matrix():
+    return DistanceMatrix.default()
+
+
+def unit_vectors(coords):
+    """Широта и долгота в градусах -> точки на единичной сфере"""
+    lat, lon = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+class SpatialIndex:
+    """KD-дерево по активным складам с координатами.
+
+    Склады хранятся точками на единичной сфере: длина хорды монотонна по
+    расстоянию по дуге, поэтому k ближайших по хорде совпадают с k
+    ближайшими по поверхности Земли, а хорда переводится в км точно."""
+
+    def __init__(self, ids, coords):
+        self.ids = ids
+        self.coords = coords
+        self.positions = {pk: position for position, pk in enumerate(ids.tolist())}
+        self.tree = cKDTree(unit_vectors(coords)) if len(ids) else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def coordinates(self, pk):
+        """(широта, долгота) склада; KeyError, если его нет в индексе"""
+        latitude, longitude = self.coords[self.positions[pk]]
+        return float(latitude), float(longitude)
+
+    def nearest(self, latitude, longitude, k):
+        """k ближайших складов к точке: [(id, км)] по возрастанию расстояния"""
+        k = min(k, len(self))
+        if not k:
+            return []
+        chords, positions = self.tree.query(unit_vectors(np.array([[latitude, longitude]]))[0], k=k)
+        kilometers = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.atleast_1d(chords) / 2, 0, 1))
+        return [
+            (pk, round(km, 3)) for pk, km in zip(
+                self.ids[np.atleast_1d(positions)].tolist(), kilometers.tolist()
+            )
+        ]
+
+
+def spatial_version():
+    cache.add(SPATIAL_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    return cache.get(SPATIAL_VERSION_KEY)
+
+
+def invalidate_spatial_index():
+    """Версия общая для процессов через кэш. Случайная, а не счетчик: после
+    очистки кэша процесс не примет старое дерево за актуальное."""
+    cache.set(SPATIAL_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def get_spatial_index():
+    """Индекс текущего процесса; перестраивается при смене версии"""
+    version = spatial_version()
+    loaded = _spatial.get('index')
+    if loaded is None or loaded[0] != version:
+        with _lock:
+            loaded = _spatial.get('index')
+            if loaded is None or loaded[0] != version:
+                loaded = (version, SpatialIndex(*load_coordinates()))
+                _spatial['index'] = loaded
+    return loaded[1]
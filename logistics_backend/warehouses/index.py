@@ -0,0 +1,129 @@
+import re
+from collections import defaultdict
+
+from core.signals import bulk_changed
+from .models import Warehouse
+
+WAREHOUSE_NUMBER_PATTERNS = [
+    r'№\s*(\d+)',
+    r'склад\s*№\s*(\d+)',
+    r'база\s*скл\.?\s*№\s*(\d+)',
+    r'(\d+)'
+]
+
+# Номер склада в адресе учитывается только с явной пометкой, чтобы
+# не путать его с номером дома
+ADDRESS_NUMBER_PATTERN = re.compile(r'(?:№|склад[а-я]*)\s*№?\s*(\d+)', re.IGNORECASE)
+TOKEN_PATTERN = re.compile(r'[0-9a-zа-яё]+', re.IGNORECASE)
+STOP_TOKENS = {'склад', 'склада', 'база', 'скл', 'no'}
+
+
+def normalize_number(number):
+    """'007' и '7' обозначают один и тот же склад"""
+    if number is None:
+        return None
+    return str(int(number))
+
+
+def extract_warehouse_number(text):
+    # text != text отсекает NaN из pandas
+    if text is None or text != text or text == '':
+        return None
+
+    for pattern in WAREHOUSE_NUMBER_PATTERNS:
+        match = re.search(pattern, str(text), re.IGNORECASE)
+        if match:
+            return normalize_number(match.group(1))
+
+    return None
+
+
+def tokenize(text):
+    return {
+        token for token in TOKEN_PATTERN.findall(text.lower().replace('ё', 'е'))
+        if token not in STOP_TOKENS and not token.isdigit()
+    }
+
+
+class WarehouseIndex:
+    """Индекс складов в памяти для сопоставления свободного текста со складом.
+
+    Строится одним запросом; номер склада ищется точным совпадением целого
+    числа (поэтому "1" не совпадает со "Склад 12"), остальное - по словам
+    названия. При равенстве побеждает склад с меньшим id."""
+
+    def __init__(self, warehouses=()):
+        self.by_id = {}
+        self.by_name_number = {}
+        self.by_address_number = {}
+        self.by_token = defaultdict(set)
+        for warehouse in sorted(warehouses, key=lambda w: w.pk):
+            self.add(warehouse)
+
+    @classmethod
+    def build(cls, queryset=None):
+        if queryset is None:
+            queryset = Warehouse.objects.all()
+        return cls(queryset.only('id', 'name', 'address'))
+
+    def add(self, warehouse):
+        self.by_id[warehouse.pk] = warehouse
+
+        for number in re.findall(r'\d+', warehouse.name):
+            self.by_name_number.setdefault(normalize_number(number), warehouse)
+        for number in ADDRESS_NUMBER_PATTERN.findall(warehouse.address or ''):
+            self.by_address_number.setdefault(normalize_number(number), warehouse)
+
+        for token in tokenize(warehouse.name):
+            self.by_token[token].add(warehouse.pk)
+
+    def get_by_number(self, number):
+        number = normalize_number(number)
+        return self.by_name_number.get(number) or self.by_address_number.get(number)
+
+    def resolve(self, text):
+        """Находит склад по свободному тексту вида "База скл. №3" или "Центральный" """
+        number = extract_warehouse_number(text)
+        if number is not None:
+            return self.get_by_number(number)
+
+        scores = defaultdict(int)
+        for token in tokenize(text or ''):
+            for warehouse_id in self.by_token.get(token, ()):
+                scores[warehouse_id] += 1
+
+        if not scores:
+            return None
+        best_id = min(scores, key=lambda warehouse_id: (-scores[warehouse_id], warehouse_id))
+        return self.by_id[best_id]
+
+    def get_or_create_many(self, numbers, batch_size=None):
+        """Возвращает {номер: склад}, недостающие склады создаются одним bulk_create"""
+        resolved = {}
+        missing = []
+        for number in sorted({normalize_number(n) for n in numbers if n is not None}, key=int):
+            warehouse = self.get_by_number(number)
+            if warehouse:
+                resolved[number] = warehouse
+            else:
+                missing.append(number)
+
+        created = Warehouse.objects.bulk_create([
+            Warehouse(
+                name=f'Склад {number}',
+                address=f'Адрес склада {number}',
+                capacity=1000,
+                current_load=0,
+                is_active=True
+            )
+            for number in missing
+        ], batch_size=batch_size)
+
+        for number, warehouse in zip(missing, created):
+            self.add(warehouse)
+            resolved[number] = warehouse
+
+        if created:
+            bulk_changed.send(sender=Warehouse, pks=[warehouse.pk for warehouse in created])
+
+        return resolved
@@ -0,0 +1,59 @@
+import math
+import random
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from warehouses.geo import EARTH_RADIUS_KM, DistanceMatrix
+
+
+def python_haversine(lat1, lon1, lat2, lon2):
+    """Расчет на каждый запрос, с которым сравнивается матрица"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class Command(BaseCommand):
+    help = 'Замеряет построение и обновление матрицы расстояний и поиск по ней на синтетических складах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--warehouses', type=int, default=5000)
+        parser.add_argument('--lookups', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        count = options['warehouses']
+        ids = np.arange(1, count + 1, dtype=np.int64)
+        coords = np.array([(rnd.uniform(41, 70), rnd.uniform(20, 180)) for _ in range(count)])
+        pairs = [(rnd.randrange(count) + 1, rnd.randrange(count) + 1) for _ in range(options['lookups'])]
+
+        with tempfile.TemporaryDirectory() as directory:
+            matrix = DistanceMatrix(directory)
+
+            started = time.perf_counter()
+            matrix.write(ids, coords)
+            seconds = time.perf_counter() - started
+            size = matrix.path(matrix.current_version(), 'distances').stat().st_size
+            self.stdout.write(f'Складов: {count}, построение: {seconds:.3f} с, файл {size / 2 ** 20:.0f} МБ')
+
+            started = time.perf_counter()
+            matrix.patch({0: (55.75, 37.62)})
+            self.stdout.write(f'Новая версия с обновленной строкой и столбцом: {(time.perf_counter() - started) * 1000:.1f} мс')
+            coords[0] = (55.75, 37.62)
+
+            matrix.load()
+            started = time.perf_counter()
+            for from_id, to_id in pairs:
+                matrix.distances(from_id, [to_id])
+            seconds = time.perf_counter() - started
+            self.stdout.write(f'Поиск по матрице: {len(pairs)} за {seconds:.3f} с')
+
+        started = time.perf_counter()
+        for from_id, to_id in pairs:
+            python_haversine(*coords[from_id - 1], *coords[to_id - 1])
+        seconds = time.perf_counter() - started
+        self.stdout.write(f'Расчет на каждый запрос: {len(pairs)} за {seconds:.3f} с')
@@ -0,0 +1,41 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from warehouses.geo import SpatialIndex, haversine
+
+
+class Command(BaseCommand):
+    help = 'Замеряет поиск ближайших складов по KD-дереву на синтетических координатах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--warehouses', type=int, default=10000)
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        count, k = options['warehouses'], options['k']
+        ids = np.arange(1, count + 1, dtype=np.int64)
+        coords = np.array([(rnd.uniform(41, 70), rnd.uniform(20, 180)) for _ in range(count)])
+        points = [(rnd.uniform(41, 70), rnd.uniform(20, 180)) for _ in range(options['queries'])]
+
+        started = time.perf_counter()
+        index = SpatialIndex(ids, coords)
+        self.stdout.write(f'Складов: {count}, построение индекса: {(time.perf_counter() - started) * 1000:.1f} мс')
+
+        started = time.perf_counter()
+        for latitude, longitude in points:
+            index.nearest(latitude, longitude, k)
+        seconds = time.perf_counter() - started
+        self.stdout.write(f'KD-дерево: {len(points)} запросов k={k}, {seconds / len(points) * 1000:.3f} мс на запрос')
+
+        started = time.perf_counter()
+        for latitude, longitude in points:
+            distances = haversine(latitude, longitude, coords[:, 0], coords[:, 1])
+            np.argpartition(distances, k)[:k]
+        seconds = time.perf_counter() - started
+        self.stdout.write(f'Полный перебор NumPy: {seconds / len(points) * 1000:.3f} мс на запрос')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from warehouses.geo import get_distance_matrix
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересчитывает матрицу расстояний между активными складами'
+
+    def handle(self, *args, **options):
+        matrix = get_distance_matrix()
+        count = matrix.build()
+        self.stdout.write(self.style.SUCCESS(f'Матрица построена: {count} складов, {matrix.directory}'))
@@ -0,0 +1,19 @@
+# Generated by Django 5.1 on 2026-10-18 00:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouses', '0002_alter_warehouse_contact_person'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='warehouse',
+            index=models.Index(fields=['updated_at'], name='warehouse_updated_idx'),
+        ),
+    ]
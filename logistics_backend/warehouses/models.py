@@ -1,8 +1,9 @@
 from django.db import models
 from django.core.exceptions import ValidationError
 from core.models import User
+from core.validation import SaveValidationMixin
 
-class Warehouse(models.Model):
+class Warehouse(SaveValidationMixin, models.Model):
     name = models.CharField(max_length=200, verbose_name='Название склада')
     address = models.TextField(verbose_name='Адрес')
     capacity = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Вместимость (м³)')
@@ -27,16 +28,23 @@ class Warehouse(models.Model):
     class Meta:
         verbose_name = 'Склад'
         verbose_name_plural = 'Склады'
+        indexes = [
+            # Max(updated_at) для ETag списка (core.conditional)
+            models.Index(fields=['updated_at'], name='warehouse_updated_idx'),
+        ]
 
-    def clean(self):
-        if self.contact_person and self.contact_person.role not in ['LOGISTICS_MANAGER', 'DISPATCHER']:
-            raise ValidationError({
-                'contact_person': 'Ответственным лицом может быть только Логист или Диспетчер'
-            })
+    def validate_written(self, fields):
+        if self.writes(fields, 'contact_person', 'contact_person_id') and self.contact_person_id:
+            if self.get_contact_person_role() not in ['LOGISTICS_MANAGER', 'DISPATCHER']:
+                raise ValidationError({
+                    'contact_person': 'Ответственным лицом может быть только Логист или Диспетчер'
+                })
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
+    def get_contact_person_role(self):
+        """Роль ответственного; запрос - только если пользователь не загружен"""
+        if Warehouse.contact_person.is_cached(self):
+            return self.contact_person.role
+        return User.objects.filter(pk=self.contact_person_id).values_list('role', flat=True).first()
 
     def __str__(self):
         return self.name
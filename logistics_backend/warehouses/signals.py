@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.signals import bulk_changed
+
+from .geo import get_distance_matrix, invalidate_spatial_index
+from .models import Warehouse
+
+# Поля, от которых зависят матрица расстояний и пространственный индекс
+COORDINATE_FIELDS = {'latitude', 'longitude', 'is_active'}
+
+
+def coordinates_changed(pks):
+    # Индекс и матрица пересчитываются при следующем чтении, а не в запросе,
+    # сохранившем склад. Версия индекса и отметка матрицы меняются после
+    # фиксации транзакции, чтобы пересчет в другом процессе прочитал уже
+    # новые координаты, а не закэшировал под новой версией старые.
+    def on_commit():
+        invalidate_spatial_index()
+        get_distance_matrix().mark_changed(pks)
+    transaction.on_commit(on_commit)
+
+
+@receiver(post_save, sender=Warehouse)
+def warehouse_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not COORDINATE_FIELDS.intersection(update_fields):
+        return
+    coordinates_changed([instance.pk])
+
+
+@receiver(post_delete, sender=Warehouse)
+def warehouse_deleted(sender, instance, **kwargs):
+    coordinates_changed([instance.pk])
+
+
+@receiver(bulk_changed, sender=Warehouse)
+def warehouses_bulk_changed(sender, pks=None, fields=None, **kwargs):
+    if fields is not None and not COORDINATE_FIELDS.intersection(fields):
+        return
+    coordinates_changed(None if pks is None else list(pks))
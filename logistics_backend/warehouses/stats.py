@@ -0,0 +1,52 @@
+from django.db.models import Avg, Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+
+UTILIZATION = Case(
+    When(
+        capacity__gt=0,
+        then=Cast('current_load', FloatField()) * 100 / Cast('capacity', FloatField())
+    ),
+    default=Value(0.0),
+    output_field=FloatField()
+)
+
+UTILIZATION_BUCKETS = {
+    'under_50': Q(utilization__lt=50),
+    '50_80': Q(utilization__gte=50, utilization__lte=80),
+    'over_80': Q(utilization__gt=80),
+}
+
+
+def warehouse_stats(queryset, top=5):
+    """Сводка по складам: одна агрегирующая выборка и выборка top-N
+    самых загруженных складов, загруженность считается в БД"""
+    queryset = queryset.order_by().annotate(utilization=UTILIZATION)
+
+    aggregates = {
+        'total_warehouses': Count('id'),
+        'active_warehouses': Count('id', filter=Q(is_active=True)),
+        'total_capacity': Sum('capacity'),
+        'average_utilization': Avg('utilization'),
+    }
+    for bucket, condition in UTILIZATION_BUCKETS.items():
+        aggregates[f'bucket_{bucket}'] = Count('id', filter=condition)
+
+    result = queryset.aggregate(**aggregates)
+
+    most_loaded = queryset.order_by('-utilization', 'id').values(
+        'id', 'name', 'capacity', 'current_load', 'utilization'
+    )[:top]
+
+    return {
+        'total_warehouses': result['total_warehouses'],
+        'active_warehouses': result['active_warehouses'],
+        'total_capacity': result['total_capacity'] or 0,
+        'average_utilization': round(result['average_utilization'] or 0, 2),
+        'utilization_buckets': {
+            bucket: result[f'bucket_{bucket}'] for bucket in UTILIZATION_BUCKETS
+        },
+        'most_loaded': [
+            {**warehouse, 'utilization': round(warehouse['utilization'], 2)}
+            for warehouse in most_loaded
+        ],
+    }
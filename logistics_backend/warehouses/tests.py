@@ -1,3 +1,246 @@
-from django.test import TestCase
+import tempfile
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.models import User
+from core.testing import PerformanceTestCase
+from .geo import SpatialIndex, get_distance_matrix, get_spatial_index, haversine, spatial_version
+from .models import Warehouse
+
+
+def use_temporary_distance_dir(test):
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    settings_override = override_settings(WAREHOUSE_DISTANCE_DIR=directory.name)
+    settings_override.enable()
+    test.addCleanup(settings_override.disable)
+
+
+class WarehouseSaveValidationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        cls.driver = User.objects.create_user('driver', password='x', role='DRIVER')
+        cls.warehouse = Warehouse.objects.create(
+            name='Склад 1', address='Адрес 1', capacity=1000, contact_person=cls.manager
+        )
+
+    def test_load_update_is_single_query(self):
+        warehouse = Warehouse.objects.get(pk=self.warehouse.pk)
+        warehouse.current_load = 10
+        with self.assertNumQueries(1):
+            warehouse.save(update_fields=['current_load', 'updated_at'])
+
+    def test_written_fields_are_validated(self):
+        warehouse = Warehouse.objects.get(pk=self.warehouse.pk)
+        warehouse.current_load = 10 ** 10
+        with self.assertRaises(ValidationError) as context:
+            warehouse.save(update_fields=['current_load'])
+        self.assertIn('current_load', context.exception.message_dict)
+
+    def test_contact_person_role(self):
+        warehouse = Warehouse.objects.get(pk=self.warehouse.pk)
+        warehouse.contact_person_id = self.driver.pk
+        with self.assertRaises(ValidationError) as context:
+            warehouse.save()
+        self.assertIn('contact_person', context.exception.message_dict)
+        with self.assertRaises(ValidationError):
+            warehouse.full_clean()
+
+
+class SpatialIndexTests(SimpleTestCase):
+
+    def test_nearest_matches_brute_force(self):
+        rnd = np.random.default_rng(0)
+        coords = np.column_stack((rnd.uniform(-80, 80, 2000), rnd.uniform(-180, 180, 2000)))
+        index = SpatialIndex(np.arange(2000, dtype=np.int64), coords)
+
+        for latitude, longitude in [(55.75, 37.62), (-33.9, 151.2), (0, 179.9)]:
+            distances = haversine(latitude, longitude, coords[:, 0], coords[:, 1])
+            found = index.nearest(latitude, longitude, 5)
+            self.assertEqual([pk for pk, _ in found], np.argsort(distances)[:5].tolist())
+            self.assertAlmostEqual(found[0][1], distances.min(), places=2)
+
+    def test_small_index(self):
+        index = SpatialIndex(np.array([7], dtype=np.int64), np.array([[55.75, 37.62]]))
+        self.assertEqual(index.nearest(55.75, 37.62, 10), [(7, 0.0)])
+        self.assertEqual(SpatialIndex(np.zeros(0, dtype=np.int64), np.zeros((0, 2))).nearest(0, 0, 3), [])
+
+
+class WarehouseDistanceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='LOGISTICS_MANAGER')
+        cls.moscow = Warehouse.objects.create(
+            name='Москва', address='Адрес 1', capacity=1000, latitude='55.755826', longitude='37.617300'
+        )
+        cls.spb = Warehouse.objects.create(
+            name='Санкт-Петербург', address='Адрес 2', capacity=1000, latitude='59.938630', longitude='30.314130'
+        )
+        cls.no_coordinates = Warehouse.objects.create(name='Без координат', address='Адрес 3', capacity=1000)
+
+    def setUp(self):
+        cache.clear()
+        use_temporary_distance_dir(self)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.manager)
+
+    def distances(self, to_ids, from_id=None, expected_status=200):
+        response = self.client.get('/api/warehouses/warehouses/distances/', {
+            'from': from_id or self.moscow.pk, 'to': ','.join(str(pk) for pk in to_ids)
+        })
+        self.assertEqual(response.status_code, expected_status, response.data)
+        return {item['to']: item['distance_km'] for item in response.data.get('distances', [])}
+
+    def test_distances(self):
+        distances = self.distances([self.spb.pk, self.moscow.pk])
+        self.assertAlmostEqual(distances[self.spb.pk], 634, delta=2)
+        self.assertEqual(distances[self.moscow.pk], 0)
+
+    def test_coordinates_change_is_applied_on_read(self):
+        self.distances([self.spb.pk])
+        matrix = get_distance_matrix()
+        version = matrix.current_version()
+
+        self.spb.latitude, self.spb.longitude = Decimal('55.796127'), Decimal('49.106414')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spb.save(update_fields=['latitude', 'longitude', 'updated_at'])
+
+        # Сохранение только отмечает склад, матрица не пересчитывается
+        self.assertEqual(matrix.current_version(), version)
+        self.assertEqual(len(matrix.pending_files()), 1)
+
+        self.assertAlmostEqual(self.distances([self.spb.pk])[self.spb.pk], 719, delta=2)
+        self.assertAlmostEqual(self.distances([self.moscow.pk], from_id=self.spb.pk)[self.moscow.pk], 719, delta=2)
+        self.assertNotEqual(matrix.current_version(), version)
+        self.assertEqual(matrix.pending_files(), [])
+        self.assertFalse(matrix.path(version, 'distances').exists())
+
+    def test_new_warehouse_rebuilds_matrix_on_read(self):
+        self.distances([self.spb.pk])
+        matrix = get_distance_matrix()
+        version = matrix.current_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            kazan = Warehouse.objects.create(
+                name='Казань', address='Адрес 4', capacity=1000, latitude='55.796127', longitude='49.106414'
+            )
+
+        self.assertEqual(matrix.current_version(), version)
+        self.assertAlmostEqual(self.distances([kazan.pk])[kazan.pk], 719, delta=2)
+        self.assertNotEqual(matrix.current_version(), version)
+
+    def test_marks_are_not_applied_before_commit(self):
+        self.distances([self.spb.pk])
+        self.spb.latitude = Decimal('55.796127')
+        self.spb.save(update_fields=['latitude', 'updated_at'])
+        self.assertEqual(get_distance_matrix().pending_files(), [])
+
+    def test_old_version_stays_readable_after_switch(self):
+        matrix = get_distance_matrix()
+        index, old = matrix.load()
+        matrix.mark_changed(None)
+        matrix.mark_changed([self.spb.pk])
+        matrix.load()
+        self.assertEqual(matrix.pending_files(), [])
+        self.assertAlmostEqual(float(old[index[self.moscow.pk], index[self.spb.pk]]), 634, delta=2)
+
+    def test_unavailable_warehouses_are_not_found(self):
+        self.distances([self.no_coordinates.pk], expected_status=404)
+        self.spb.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spb.save(update_fields=['is_active', 'updated_at'])
+        self.distances([self.spb.pk], expected_status=404)
+        self.distances([self.moscow.pk], from_id=self.spb.pk, expected_status=404)
+
+    def test_invalid_params(self):
+        for params in ({'to': self.spb.pk}, {'from': self.moscow.pk}, {'from': 'x', 'to': self.spb.pk}):
+            response = self.client.get('/api/warehouses/warehouses/distances/', params)
+            self.assertEqual(response.status_code, 400)
+
+    def test_nearest(self):
+        response = self.client.get('/api/warehouses/warehouses/nearest/', {'lat': 56.86, 'lon': 35.9, 'k': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['warehouse']['id'] for item in response.data], [self.moscow.pk, self.spb.pk])
+        self.assertAlmostEqual(response.data[0]['distance_km'], 160, delta=5)
+
+        # Сохранение координат сбрасывает индекс после фиксации транзакции
+        version = spatial_version()
+        self.spb.latitude, self.spb.longitude = Decimal('56.858721'), Decimal('35.917596')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.spb.save(update_fields=['latitude', 'longitude', 'updated_at'])
+        self.assertEqual(spatial_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(spatial_version(), version)
+        response = self.client.get('/api/warehouses/warehouses/nearest/', {'lat': 56.86, 'lon': 35.9, 'k': 1})
+        self.assertEqual([item['warehouse']['id'] for item in response.data], [self.spb.pk])
+
+    def test_nearest_invalid_params(self):
+        for params in ({'lat': 56}, {'lat': 'x', 'lon': 35}, {'lat': 91, 'lon': 35}):
+            response = self.client.get('/api/warehouses/warehouses/nearest/', params)
+            self.assertEqual(response.status_code, 400)
+
+
+class WarehouseApiPerformanceTests(PerformanceTestCase):
+
+    def test_list(self):
+        self.assertWithinBudget('warehouses-list', 'get', '/api/warehouses/warehouses/', {'page_size': 100})
+
+    def test_list_not_modified(self):
+        etag = self.client.get('/api/warehouses/warehouses/')['ETag']
+        self.assertWithinBudget(
+            'warehouses-list-not-modified', 'get', '/api/warehouses/warehouses/',
+            expected_status=304, HTTP_IF_NONE_MATCH=etag
+        )
+
+    def test_retrieve(self):
+        warehouse = self.data['warehouses'][0]
+        self.assertWithinBudget('warehouses-retrieve', 'get', f'/api/warehouses/warehouses/{warehouse.pk}/')
+
+    def test_search(self):
+        response = self.assertWithinBudget(
+            'warehouses-search', 'get', '/api/warehouses/warehouses/', {'search': 'адрес склада 17'}
+        )
+        self.assertEqual(response.data['results'][0]['name'], 'Склад 17')
+
+    def test_update_load(self):
+        warehouse = self.data['warehouses'][0]
+        response = self.assertWithinBudget(
+            'warehouses-update-load', 'post', f'/api/warehouses/warehouses/{warehouse.pk}/update_load/',
+            {'current_load': 100}
+        )
+        self.assertEqual(float(response.data['current_load']), 100)
+
+    def test_stats(self):
+        self.assertWithinBudget('warehouses-stats', 'get', '/api/warehouses/warehouses/stats/')
+
+    def test_available_managers(self):
+        self.assertWithinBudget(
+            'warehouses-available-managers', 'get', '/api/warehouses/warehouses/available_managers/'
+        )
+
+    def test_distances(self):
+        use_temporary_distance_dir(self)
+        get_distance_matrix().build()
+        warehouses = [warehouse for warehouse in self.data['warehouses'] if warehouse.is_active][:101]
+        response = self.assertWithinBudget(
+            'warehouses-distances', 'get', '/api/warehouses/warehouses/distances/',
+            {'from': warehouses[0].pk, 'to': ','.join(str(warehouse.pk) for warehouse in warehouses[1:])}
+        )
+        self.assertEqual(len(response.data['distances']), 100)
+
+    def test_nearest(self):
+        cache.clear()
+        get_spatial_index()
+        response = self.assertWithinBudget(
+            'warehouses-nearest', 'get', '/api/warehouses/warehouses/nearest/', {'lat': 55.75, 'lon': 37.62, 'k': 20}
+        )
+        self.assertEqual(len(response.data), 20)
@@ -1,12 +1,20 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
+from core.conditional import ConditionalGetMixin
+from core.serializers import parse_list_param
+from core.query_plan import QueryPlanMixin
+from search.query import apply_search
+from .geo import get_distance_matrix, get_spatial_index
 from .models import Warehouse
 from .serializers import WarehouseSerializer
+from .stats import warehouse_stats
 
+# Наибольшее число складов в параметре to
+MAX_DISTANCE_TARGETS = 1000
 
-class WarehouseViewSet(viewsets.ModelViewSet):
+
+class WarehouseViewSet(ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Warehouse.objects.all()
     serializer_class = WarehouseSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -14,7 +22,6 @@ class WarehouseViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = Warehouse.objects.all()
 
-
         is_active = self.request.query_params.get('is_active', None)
         if is_active is not None:
             queryset = queryset.filter(is_active=is_active.lower() == 'true')
@@ -25,12 +32,9 @@ class WarehouseViewSet(viewsets.ModelViewSet):
 
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(address__icontains=search)
-            )
+            queryset = apply_search(queryset, 'warehouse', search)
 
-        return queryset
+        return self.optimize_queryset(queryset)
 
     @action(detail=False, methods=['get'])
     def available_managers(self, request):
@@ -43,19 +47,71 @@ class WarehouseViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        total_warehouses = Warehouse.objects.count()
-        active_warehouses = Warehouse.objects.filter(is_active=True).count()
-        total_capacity = sum(warehouse.capacity for warehouse in Warehouse.objects.all())
-        avg_utilization = sum(warehouse.utilization_percentage() for warehouse in
-                              Warehouse.objects.all()) / total_warehouses if total_warehouses > 0 else 0
+        """Сводка по складам; параметр top - размер списка самых загруженных"""
+        try:
+            top = min(max(int(request.query_params.get('top', 5)), 0), 50)
+        except ValueError:
+            return Response(
+                {'error': 'Некорректное значение top'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(warehouse_stats(Warehouse.objects.all(), top=top))
 
+    @action(detail=False, methods=['get'])
+    def distances(self, request):
+        """Расстояния в км по дуге большого круга: from - id склада, to - id
+        складов через запятую. Значения берутся из матрицы расстояний."""
+        try:
+            from_id = int(request.query_params.get('from', ''))
+            to_ids = [int(value) for value in parse_list_param(request.query_params.get('to'))]
+        except ValueError:
+            return Response(
+                {'error': 'Параметры from и to должны содержать id складов'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not to_ids or len(to_ids) > MAX_DISTANCE_TARGETS:
+            return Response(
+                {'error': f'Параметр to должен содержать от 1 до {MAX_DISTANCE_TARGETS} складов'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            distances = get_distance_matrix().distances(from_id, to_ids)
+        except KeyError as e:
+            return Response(
+                {'error': f'Склад {e.args[0]} не найден, не активен или не имеет координат'},
+                status=status.HTTP_404_NOT_FOUND
+            )
         return Response({
-            'total_warehouses': total_warehouses,
-            'active_warehouses': active_warehouses,
-            'total_capacity': total_capacity,
-            'average_utilization': round(avg_utilization, 2)
+            'from': from_id,
+            'distances': [{'to': to_id, 'distance_km': km} for to_id, km in distances.items()],
         })
 
+    @action(detail=False, methods=['get'])
+    def nearest(self, request):
+        """Активные склады, ближайшие к точке lat, lon (не больше k, по умолчанию 10)"""
+        try:
+            latitude = float(request.query_params.get('lat', ''))
+            longitude = float(request.query_params.get('lon', ''))
+            k = min(max(int(request.query_params.get('k', 10)), 1), 100)
+        except ValueError:
+            return Response(
+                {'error': 'Параметры lat и lon обязательны, k - целое число'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return Response(
+                {'error': 'Координаты вне допустимого диапазона'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        found = get_spatial_index().nearest(latitude, longitude, k)
+        warehouses = self.optimize_queryset(Warehouse.objects.all()).in_bulk([pk for pk, _ in found])
+        found = [(warehouses[pk], km) for pk, km in found if pk in warehouses]
+        data = self.get_serializer([warehouse for warehouse, _ in found], many=True).data
+        return Response([{'distance_km': km, 'warehouse': item} for (_, km), item in zip(found, data)])
+
     @action(detail=True, methods=['post'])
     def update_load(self, request, pk=None):
         warehouse = self.get_object()
@@ -76,7 +132,7 @@ class WarehouseViewSet(viewsets.ModelViewSet):
                 )
 
             warehouse.current_load = new_load
-            warehouse.save()
+            warehouse.save(update_fields=['current_load', 'updated_at'])
 
             serializer = self.get_serializer(warehouse)
             return Response(serializer.data)
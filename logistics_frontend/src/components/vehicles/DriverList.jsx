@@ -14,7 +14,7 @@ const DriverList = () => {
   const fetchData = async () => {
     try {
       const [driversRes, usersRes, vehiclesRes] = await Promise.all([
-        api.get('/vehicles/drivers/'),
+        api.get('/vehicles/drivers/', { params: { expand: 'user,vehicle' } }),
         api.get('/auth/users/drivers/'),
         api.get('/vehicles/vehicles/')
       ]);
@@ -11,7 +11,7 @@ const VehicleList = () => {
 
   const fetchVehicles = async () => {
     try {
-      const response = await api.get('/vehicles/vehicles/');
+      const response = await api.get('/vehicles/vehicles/', { params: { expand: 'current_warehouse' } });
       setVehicles(Array.isArray(response.data) ? response.data : response.data.results || []);
     } catch (err) {
       setError('Не удалось загрузить данные транспорта');
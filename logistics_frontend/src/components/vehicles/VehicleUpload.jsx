@@ -26,11 +26,23 @@ const VehicleUpload = ({ onUploadComplete }) => {
         },
       });
 
-      setMessage(`Успешно загружено ${response.data.vehicles_created} транспортных средств`);
-      
-      if (response.data.errors && response.data.errors.length > 0) {
-        setDetailedErrors(response.data.errors);
-        setError(`Обнаружены ошибки в ${response.data.errors.length} строках`);
+      let job = response.data;
+      while (job.status === 'PENDING' || job.status === 'RUNNING') {
+        setMessage(`Обработано ${job.rows_processed} из ${job.rows_total || '?'} строк`);
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        job = (await api.get(`/vehicles/imports/${job.id}/`)).data;
+      }
+
+      if (job.status === 'FAILED') {
+        setMessage('');
+        setError('Ошибка при загрузке файла: ' + job.error_message);
+      } else {
+        setMessage(`Успешно загружено ${job.vehicles_created} транспортных средств`);
+      }
+
+      if (job.errors && job.errors.length > 0) {
+        setDetailedErrors(job.errors);
+        setError(`Обнаружены ошибки в ${job.errors_total} строках`);
       }
 
       if (onUploadComplete) {
@@ -99,7 +111,7 @@ const VehicleUpload = ({ onUploadComplete }) => {
         <h3 className="font-medium mb-2">Требования к файлу:</h3>
         <ul className="text-sm text-gray-600 list-disc list-inside space-y-1">
           <li>Файл должен содержать колонки: Наименование грузополучателей, Модель авто, Гос.номер, Номер склада, Наименование ТМЦ, Объемы ТМЦ</li>
-          <li>Старые данные о транспорте будут удалены</li>
+          <li>Транспорт сопоставляется по госномеру: новые ТС добавляются, измененные обновляются, отсутствующие в файле деактивируются</li>
           <li>Поддерживается формат .xlsx и .xls</li>
           <li>Склады будут созданы автоматически если их нет в системе</li>
           <li>Числа с запятыми (1,896) автоматически конвертируются в формат с точками (1.896)</li>